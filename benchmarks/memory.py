@@ -0,0 +1,59 @@
+'''
+Bytes per relation and storage object, measured with tracemalloc: python -m benchmarks.memory [count]
+The baseline is the same measurement at 9a932df, before the relation model and the columnar storage were slotted
+'''
+from __future__ import annotations
+
+import gc
+import sys
+import tracemalloc
+from typing import Callable
+
+from src.relations import Relation, BinaryRelation, RelationStorage
+from src.storage import AtomTable, ColumnarStorage
+
+baseline = {
+	'Relation': 1648,
+	'BinaryRelation': 2928,
+	'IntersectionRelation': 2726,
+	'CompositionRelation': 3500,
+	'ConverseRelation': 3286,
+	'AtomTable': 281,
+	'ColumnarStorage': 954,
+	'ColumnarSnapshot': 161,
+}
+
+
+def measure(create: Callable[[int], object], count: int) -> float:
+	gc.collect()
+	tracemalloc.start()
+	before = tracemalloc.get_traced_memory()[0]
+	objects = [create(i) for i in range(count)]
+	after = tracemalloc.get_traced_memory()[0]
+	tracemalloc.stop()
+	del objects
+	return (after - before) / count
+
+
+def main(count: int = 10_000) -> None:
+	registry = RelationStorage()
+	is_parent = BinaryRelation('is_parent', space=(('Janina', 'Teresa'), ('Teresa', 'Ania')), registry=registry)
+	is_female = Relation('is_female', 1, space=('Janina', 'Teresa'), registry=registry)
+	columns = ColumnarStorage(2, members_layers=(('Janina', 'Teresa'), ))
+	cases = {
+		'Relation': lambda i: Relation('r', 1, registry=registry),
+		'BinaryRelation': lambda i: BinaryRelation('r', is_symmetric=True, registry=registry),
+		'IntersectionRelation': lambda i: is_parent & is_female,
+		'CompositionRelation': lambda i: is_parent * is_parent,
+		'ConverseRelation': lambda i: ~is_parent,
+		'AtomTable': lambda i: AtomTable(),
+		'ColumnarStorage': lambda i: ColumnarStorage(2),
+		'ColumnarSnapshot': lambda i: columns.get_snapshot(),
+	}
+	print(f'{"":<24}{"baseline":>10}{"now":>10}')
+	for name, create in cases.items():
+		print(f'{name:<24}{baseline[name]:>8} B{measure(create, count):>8.0f} B')
+
+
+if __name__ == '__main__':
+	main(*map(int, sys.argv[1:]))
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable
+
+from src.relations import Relation, DerivedRelation, RelationStorage
+
+
+class AsyncRelationStore:
+	'''
+	Asyncio front end of a relation storage. Concurrent requests are collected for a short window and answered by one batched
+	call per relation: membership questions by match_many, lookups by a single pass per position. Derived relations are
+	evaluated in an executor on the versions read when they start, so the event loop is never blocked by them and its adds
+	do not change the members under them
+	'''
+
+	def __init__(self, storage: RelationStorage, window: float = 0.001, max_batch: int = 1024, executor: Executor = None):
+		self._storage = storage
+		self._window = window
+		self._max_batch = max_batch
+		self._executor = executor if executor is not None else ThreadPoolExecutor()
+		self._matches: dict[str, list[tuple[tuple, asyncio.Future]]] = {}
+		self._lookups: dict[tuple[str, int], list[tuple[Any, asyncio.Future]]] = {}
+		self._flush_handle: asyncio.TimerHandle | None = None
+		self._pending = 0
+
+	@property
+	def storage(self) -> RelationStorage:
+		return self._storage
+
+	async def is_matched_by(self, name: str, *elems: Any) -> bool:
+		relation = self._storage.get_relation(name)
+		return await self._enqueue(self._matches.setdefault(name, []), relation._to_members(elems))
+
+	async def get_all_with_value_at(self, name: str, value: Any, n: int) -> list[tuple]:
+		self._storage.get_relation(name)
+		return await self._enqueue(self._lookups.setdefault((name, n), []), value)
+
+	async def get_members(self, name: str) -> list[tuple]:
+		return await self._run(self._storage.get_relation(name), list)
+
+	async def add(self, name: str, *to_adds: Any) -> None:
+		'''
+		Every argument is a member, a bare element being the member of a unary relation; nothing is added if one of them does not fit the arity
+		'''
+		relation = self._storage.get_relation(name)
+		members_layers = [relation._to_members((to_add, )) for to_add in to_adds]
+		bad = next((members for members in members_layers if len(members) != relation.arity), None)
+		if bad is not None:
+			raise ValueError(f'Expected members of {relation.arity} elements, got {bad}')
+		relation.add(*members_layers)
+
+	def _enqueue(self, queue: list, request: Any) -> asyncio.Future:
+		loop = asyncio.get_running_loop()
+		future = loop.create_future()
+		queue.append((request, future))
+		self._pending += 1
+		if self._pending >= self._max_batch:
+			self._flush()
+		elif self._flush_handle is None:
+			self._flush_handle = loop.call_later(self._window, self._flush)
+		return future
+
+	def _flush(self) -> None:
+		if self._flush_handle is not None:
+			self._flush_handle.cancel()
+			self._flush_handle = None
+		matches, self._matches = self._matches, {}
+		lookups, self._lookups = self._lookups, {}
+		self._pending = 0
+		for name, requests in matches.items():
+			self._answer(self._storage.get_relation(name), requests, self._match_many)
+		for (name, n), requests in lookups.items():
+			self._answer(self._storage.get_relation(name), requests, lambda relation, values, n=n: self._lookup_many(relation, values, n))
+
+	@classmethod
+	def _match_many(cls, relation: Relation, candidates: list[tuple]) -> list[bool]:
+		return [bool(is_matched) for is_matched in relation.match_many(candidates)]
+
+	@classmethod
+	def _lookup_many(cls, relation: Relation, values: list[Any], n: int) -> list[list[tuple]]:
+		'''
+		Every distinct value looked up once
+		'''
+		found = {value: list(relation.get_all_with_value_at(value, n)) for value in dict.fromkeys(values)}
+		return [found[value] for value in values]
+
+	def _answer(self, relation: Relation, requests: list[tuple[Any, asyncio.Future]], batch: Callable[[Relation, list], list]) -> None:
+		task = asyncio.ensure_future(self._run(relation, batch, [request for request, _ in requests]))
+		task.add_done_callback(lambda done: self._resolve(done, [future for _, future in requests]))
+
+	@classmethod
+	def _resolve(cls, done: asyncio.Future, futures: list[asyncio.Future]) -> None:
+		error = done.exception()
+		for i, future in enumerate(futures):
+			if future.done():
+				continue
+			if error is not None:
+				future.set_exception(error)
+			else:
+				future.set_result(done.result()[i])
+
+	async def _run(self, relation: Relation, function: Callable, *args: Any) -> Any:
+		'''
+		Derived relations are evaluated in the executor, stored ones in the event loop
+		'''
+		if isinstance(relation, DerivedRelation) and not relation._materialized:
+			return await asyncio.get_running_loop().run_in_executor(self._executor, self._read, function, relation, *args)
+		return function(relation, *args)
+
+	def _read(self, function: Callable, relation: Relation, *args: Any) -> Any:
+		'''
+		Evaluation in an executor thread on the versions pinned when it starts, the adds of the event loop go on meanwhile
+		'''
+		with self._storage.read():
+			return function(relation, *args)
+
+	async def handle(self, request: dict) -> dict:
+		'''
+		Answers a request of the server protocol: {"id", "op": "match" | "lookup" | "members" | "add", "relation", "args"}
+		'''
+		response = {'id': request.get('id')}
+		try:
+			name, args = request['relation'], request.get('args', [])
+			if request['op'] == 'match':
+				response['result'] = await self.is_matched_by(name, *args)
+			elif request['op'] == 'lookup':
+				response['result'] = await self.get_all_with_value_at(name, *args)
+			elif request['op'] == 'members':
+				response['result'] = await self.get_members(name)
+			elif request['op'] == 'add':
+				response['result'] = await self.add(name, *args)
+			else:
+				raise ValueError(f'Unknown op {request["op"]}')
+		except Exception as error:
+			response['error'] = f'{type(error).__name__}: {error}'
+		return response
+
+	async def serve_stream(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+		'''
+		JSON lines in, JSON lines out; the requests of a connection are answered concurrently, so they can be batched
+		together, and the responses carry the ids of the requests
+		'''
+		tasks = set()
+
+		async def respond(line: bytes) -> None:
+			try:
+				response = await self.handle(json.loads(line))
+			except json.JSONDecodeError as error:
+				response = {'id': None, 'error': f'{type(error).__name__}: {error}'}
+			writer.write(json.dumps(response).encode() + b'\n')
+			await writer.drain()
+
+		while line := await reader.readline():
+			if line.strip():
+				task = asyncio.ensure_future(respond(line))
+				tasks.add(task)
+				task.add_done_callback(tasks.discard)
+		if tasks:
+			await asyncio.gather(*tasks)
+		writer.close()
+
+	async def serve_unix(self, path: str) -> asyncio.AbstractServer:
+		return await asyncio.start_unix_server(self.serve_stream, path=path)
+
+	async def serve_stdio(self) -> None:
+		loop = asyncio.get_running_loop()
+		reader = asyncio.StreamReader()
+		await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+		await self.serve_stream(reader, _StdoutWriter())
+
+
+class _StdoutWriter:
+	'''
+	Writer of the responses to stdout, which may be a plain file, so it is written to directly
+	'''
+
+	def write(self, data: bytes) -> None:
+		sys.stdout.buffer.write(data)
+		sys.stdout.buffer.flush()
+
+	async def drain(self) -> None:
+		pass
+
+	def close(self) -> None:
+		pass
+
+
+async def _main(arguments: argparse.Namespace) -> None:
+	storage = RelationStorage.open(arguments.snapshot) if arguments.snapshot else RelationStorage()
+	store = AsyncRelationStore(storage, window=arguments.window)
+	if arguments.socket:
+		server = await store.serve_unix(arguments.socket)
+		async with server:
+			await server.serve_forever()
+	else:
+		await store.serve_stdio()
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Serves the relations of a snapshot over JSON lines, on stdio or a Unix socket')
+	parser.add_argument('--snapshot', help='snapshot written by RelationStorage.save')
+	parser.add_argument('--socket', help='path of the Unix socket, stdio when not given')
+	parser.add_argument('--window', type=float, default=0.001, help='seconds to collect the requests of a batch for')
+	asyncio.run(_main(parser.parse_args()))
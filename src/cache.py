@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Hashable
+
+
+class ResultCache:
+	'''
+	LRU cache of evaluated members keyed by the structural keys of derived relations. An entry is valid for the version it was
+	computed at and dropped when looked up at another one; the least recently used entries are evicted beyond the count of
+	entries or of members in all of them
+	'''
+
+	def __init__(self, max_entries: int = 256, max_members: int = 1 << 20):
+		self._max_entries = max_entries
+		self._max_members = max_members
+		self._entries: OrderedDict[Hashable, tuple[int, frozenset]] = OrderedDict()
+		self._size = 0
+		self._lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+
+	@property
+	def size(self) -> int:
+		'''
+		Count of the members in all the entries
+		'''
+		return self._size
+
+	def __len__(self) -> int:
+		return len(self._entries)
+
+	def get(self, key: Hashable, version: int) -> frozenset | None:
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is None or entry[0] != version:
+				if entry is not None:
+					self._drop(key)
+				self.misses += 1
+				return None
+			self._entries.move_to_end(key)
+			self.hits += 1
+			return entry[1]
+
+	def put(self, key: Hashable, version: int, members: frozenset) -> None:
+		if len(members) > self._max_members:
+			return
+		with self._lock:
+			if key in self._entries:
+				self._drop(key)
+			self._entries[key] = (version, members)
+			self._size += len(members)
+			while len(self._entries) > self._max_entries or self._size > self._max_members:
+				self._drop(next(iter(self._entries)))
+
+	def _drop(self, key: Hashable) -> None:
+		_, members = self._entries.pop(key)
+		self._size -= len(members)
+
+	def clear(self) -> None:
+		with self._lock:
+			self._entries.clear()
+			self._size = 0
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+from typing import Any, Iterable, Hashable
+
+from src.sparse import SparseBooleanMatrix
+from src.storage import AtomTable
+
+
+class TransitiveClosure:
+	'''
+	Transitive closure of a growing set of edges. The closure is computed with semi-naive evaluation on the first
+	membership test and then kept up to date edge by edge. Single reachability queries can be answered without it,
+	on the condensation of the strongly connected components
+	'''
+	_sparse_threshold = 1 << 12
+
+	def __init__(self, edges: Iterable[tuple[Hashable, Hashable]] = ()):
+		self._reset(edges)
+
+	def _reset(self, edges: Iterable[tuple[Hashable, Hashable]]) -> None:
+		self._successors: dict[Any, set] = {}
+		self._descendants: dict[Any, set] | None = None
+		self._ancestors: dict[Any, set] | None = None
+		self._components: dict[Any, int] | None = None
+		self._component_successors: list[set[int]] = []
+		self._component_descendants: dict[int, frozenset[int]] = {}
+		self._cyclic_components: set[int] = set()
+		for a, b in edges:
+			self._successors.setdefault(a, set()).add(b)
+
+	def is_built(self) -> bool:
+		return self._descendants is not None
+
+	def build(self) -> None:
+		'''
+		Semi-naive evaluation of T(a, c) :- E(a, c) | T(a, b), E(b, c): each round extends only the pairs found in the previous one.
+		Big graphs are closed as sparse boolean matrices instead
+		'''
+		edges = [(a, b) for a, successors in self._successors.items() for b in successors]
+		if len(edges) >= self._sparse_threshold and SparseBooleanMatrix.is_supported():
+			atoms = AtomTable()
+			self._set_closure(SparseBooleanMatrix.from_edges(edges, atoms).closure().decode(atoms))
+			return
+		closure = set(edges)
+		delta = closure
+		while delta:
+			delta = {(a, c) for a, b in delta for c in self._successors.get(b, ())} - closure
+			closure |= delta
+		self._set_closure(closure)
+
+	def _set_closure(self, closure: Iterable[tuple[Hashable, Hashable]]) -> None:
+		self._descendants, self._ancestors = {}, {}
+		for a, c in closure:
+			self._descendants.setdefault(a, set()).add(c)
+			self._ancestors.setdefault(c, set()).add(a)
+
+	def __contains__(self, pair: tuple[Hashable, Hashable]) -> bool:
+		if not self.is_built():
+			self.build()
+		a, c = pair
+		return c in self._descendants.get(a, ())
+
+	def __len__(self) -> int:
+		if not self.is_built():
+			self.build()
+		return sum(map(len, self._descendants.values()))
+
+	def __iter__(self):
+		if not self.is_built():
+			self.build()
+		return ((a, c) for a, descendants in list(self._descendants.items()) for c in list(descendants))
+
+	def get_descendants(self, a: Hashable) -> frozenset:
+		if not self.is_built():
+			self.build()
+		return frozenset(self._descendants.get(a, ()))
+
+	def add(self, *edges: tuple[Hashable, Hashable]) -> None:
+		for a, b in edges:
+			if b in self._successors.get(a, ()):
+				continue
+			self._successors.setdefault(a, set()).add(b)
+			self._components = None
+			if self.is_built() and b not in self._descendants.get(a, ()):
+				self._connect(a, b)
+
+	def _connect(self, a: Hashable, b: Hashable) -> None:
+		sources = self._ancestors.get(a, set()) | {a}
+		targets = self._descendants.get(b, set()) | {b}
+		for source in sources:
+			descendants = self._descendants.setdefault(source, set())
+			new = targets - descendants
+			descendants |= new
+			for target in new:
+				self._ancestors.setdefault(target, set()).add(source)
+
+	def _on_added(self, relation, added: tuple[tuple, ...] | None) -> None:
+		if added is None:
+			self._reset(relation.get_members())
+		else:
+			self.add(*added)
+
+	def reaches(self, a: Hashable, c: Hashable) -> bool:
+		'''
+		Whether c can be reached from a, answered from the closure when it is built and on the condensation otherwise
+		'''
+		if self.is_built():
+			return (a, c) in self
+		if self._components is None:
+			self._condense()
+		if a not in self._components or c not in self._components:
+			return False
+		a_component, c_component = self._components[a], self._components[c]
+		if a_component == c_component:
+			return a_component in self._cyclic_components
+		return c_component in self._get_component_descendants(a_component)
+
+	def _condense(self) -> None:
+		'''
+		Iterative Tarjan's algorithm, components are numbered in reverse topological order
+		'''
+		nodes = set(self._successors) | {b for successors in self._successors.values() for b in successors}
+		index, lowlink, on_stack, stack, components = {}, {}, set(), [], {}
+		counter, component = 0, 0
+		for root in nodes:
+			if root in index:
+				continue
+			work = [(root, iter(self._successors.get(root, ())))]
+			index[root] = lowlink[root] = counter
+			counter += 1
+			stack.append(root)
+			on_stack.add(root)
+			while work:
+				node, successors = work[-1]
+				for successor in successors:
+					if successor not in index:
+						index[successor] = lowlink[successor] = counter
+						counter += 1
+						stack.append(successor)
+						on_stack.add(successor)
+						work.append((successor, iter(self._successors.get(successor, ()))))
+						break
+					if successor in on_stack:
+						lowlink[node] = min(lowlink[node], index[successor])
+				else:
+					work.pop()
+					if work:
+						parent = work[-1][0]
+						lowlink[parent] = min(lowlink[parent], lowlink[node])
+					if lowlink[node] == index[node]:
+						while True:
+							member = stack.pop()
+							on_stack.discard(member)
+							components[member] = component
+							if member == node:
+								break
+						component += 1
+		self._components = components
+		self._component_successors = [set() for _ in range(component)]
+		self._cyclic_components = set()
+		for a, successors in self._successors.items():
+			for b in successors:
+				if components[a] == components[b]:
+					self._cyclic_components.add(components[a])
+				else:
+					self._component_successors[components[a]].add(components[b])
+		self._component_descendants = {}
+
+	def _get_component_descendants(self, component: int) -> frozenset[int]:
+		if component not in self._component_descendants:
+			for current in range(component + 1):
+				if current in self._component_descendants:
+					continue
+				successors = self._component_successors[current]
+				self._component_descendants[current] = frozenset(successors).union(*(self._component_descendants[successor] for successor in successors))
+		return self._component_descendants[component]
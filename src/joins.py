@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+from functools import lru_cache, reduce
+from operator import itemgetter
+from typing import Iterable, Iterator, Callable, NamedTuple, Any, Sequence
+
+
+Factor = tuple[tuple, dict[tuple, int]]
+
+
+class Bindings(NamedTuple):
+	'''
+	Stream of rows whose n-th value is bound to the n-th correspondence key
+	'''
+	keys: tuple
+	rows: Iterable[tuple]
+
+
+def get_key_getter(positions: Sequence[int]) -> Callable[[tuple], Any]:
+	if not positions:
+		return lambda row: ()
+	return itemgetter(*positions)
+
+
+def get_tuple_getter(positions: Sequence[int]) -> Callable[[tuple], tuple]:
+	if len(positions) == 1:
+		position = positions[0]
+		return lambda row: (row[position], )
+	return get_key_getter(positions)
+
+
+def hash_join(left: Bindings, right: Bindings) -> Bindings:
+	'''
+	Equi-join on the keys both sides share. The right side is hashed on the first pull, the left one is streamed through the table
+	'''
+	shared = tuple(key for key in right.keys if key in left.keys)
+	extra = tuple(i for i, key in enumerate(right.keys) if key not in left.keys)
+	left_key = get_key_getter([left.keys.index(key) for key in shared])
+	right_key = get_key_getter([right.keys.index(key) for key in shared])
+	right_extra = get_tuple_getter(extra)
+	keys = left.keys + tuple(right.keys[i] for i in extra)
+	return Bindings(keys, _probe(left.rows, left_key, right.rows, right_key, right_extra))
+
+
+def _probe(left_rows: Iterable[tuple], left_key, right_rows: Iterable[tuple], right_key, right_extra) -> Iterator[tuple]:
+	table: dict[Any, set[tuple]] = {}
+	for row in right_rows:
+		table.setdefault(right_key(row), set()).add(right_extra(row))
+	if not table:
+		return
+	for row in left_rows:
+		for extra in table.get(left_key(row), ()):
+			yield row + extra
+
+
+class ScanProgram(NamedTuple):
+	'''
+	Compiled scan of a relation for a pattern of params: the keys it binds and the member positions of them, the fixed positions
+	(the first one is looked up, the rest are checked) with their constants or bound keys, and the factory of the check
+	'''
+	keys: tuple
+	positions: tuple[int, ...]
+	fixed: tuple[tuple[int, bool, Any], ...]
+	make_check: Callable[[tuple], Callable[[tuple], bool]] | None
+
+
+@lru_cache(maxsize=4096)
+def compile_scan(pattern: tuple[tuple[str, Any], ...], bound_keys: frozenset) -> ScanProgram:
+	'''
+	The pattern gives every position as ('key', key), ('const', value) or ('any', None). The check of the fixed positions
+	after the first one and of the repeated keys is generated as a single expression, the values compared with inline
+	'''
+	keys, positions, fixed, conditions = [], [], [], []
+	for position, (kind, value) in enumerate(pattern):
+		if kind == 'const' or kind == 'key' and value in bound_keys:
+			if fixed:
+				conditions.append(f'm[{position}] == c[{len(fixed)}]')
+			fixed.append((position, kind == 'key', value))
+		elif kind == 'key':
+			if value in keys:
+				conditions.append(f'm[{position}] == m[{positions[keys.index(value)]}]')
+			else:
+				keys.append(value)
+				positions.append(position)
+	make_check = eval(f'lambda c: lambda m: {" and ".join(conditions)}') if conditions else None
+	return ScanProgram(tuple(keys), tuple(positions), tuple(fixed), make_check)
+
+
+@lru_cache(maxsize=4096)
+def compile_projection(output_keys: tuple, row_keys: tuple, bound_keys: frozenset) -> tuple[Callable[[tuple], Callable], tuple]:
+	'''
+	Factory of the function building an output tuple straight from a row, the values of the bound keys (c) and, when some
+	output keys are neither, their free values (f); returned with the free keys
+	'''
+	free = tuple(key for key in output_keys if key not in row_keys and key not in bound_keys)
+	bound = [key for key in output_keys if key not in row_keys and key in bound_keys]
+	items = []
+	for key in output_keys:
+		if key in row_keys:
+			items.append(f'r[{row_keys.index(key)}]')
+		elif key in bound_keys:
+			items.append(f'c[{bound.index(key)}]')
+		else:
+			items.append(f'f[{free.index(key)}]')
+	arguments = 'r, f' if free else 'r'
+	return eval(f'lambda c: lambda {arguments}: ({", ".join(items)}, )'), free
+
+
+def multiply(left: Factor, right: Factor) -> Factor:
+	'''
+	Join of two factors, maps of the rows of their keys to counts, on the keys they share; the counts of the joined rows are multiplied
+	'''
+	left_keys, left_counts = left
+	right_keys, right_counts = right
+	shared = [key for key in right_keys if key in left_keys]
+	extra = [i for i, key in enumerate(right_keys) if key not in left_keys]
+	left_key = get_key_getter([left_keys.index(key) for key in shared])
+	right_key = get_key_getter([right_keys.index(key) for key in shared])
+	right_extra = get_tuple_getter(extra)
+	table: dict[Any, list[tuple[tuple, int]]] = {}
+	for row, n in right_counts.items():
+		table.setdefault(right_key(row), []).append((right_extra(row), n))
+	counts = {}
+	for row, n in left_counts.items():
+		for extra_row, m in table.get(left_key(row), ()):
+			counts[row + extra_row] = n * m
+	return left_keys + tuple(right_keys[i] for i in extra), counts
+
+
+def sum_out(factor: Factor, key: Any) -> Factor:
+	keys, counts = factor
+	kept = [i for i, other in enumerate(keys) if other != key]
+	project = get_tuple_getter(kept)
+	summed: dict[tuple, int] = {}
+	for row, n in counts.items():
+		row = project(row)
+		summed[row] = summed.get(row, 0) + n
+	return tuple(keys[i] for i in kept), summed
+
+
+def count_join(factors: Iterable[Factor], kept: Sequence = ()) -> dict[tuple, int]:
+	'''
+	Counts of the rows of the natural join of the factors grouped by the kept keys, without building the join: every other key
+	is summed out as soon as the factors having it are multiplied, the one in the smallest factors first
+	'''
+	factors = list(factors)
+	if any(not counts for _, counts in factors):
+		return {}
+	eliminated = list(dict.fromkeys(key for keys, _ in factors for key in keys if key not in kept))
+	while eliminated:
+		key = min(eliminated, key=lambda key: sum(len(counts) for keys, counts in factors if key in keys))
+		eliminated.remove(key)
+		having = sorted((factor for factor in factors if key in factor[0]), key=lambda factor: len(factor[1]), reverse=True)
+		factors = [factor for factor in factors if key not in factor[0]]
+		factors.append(sum_out(reduce(multiply, having), key))
+	keys, counts = reduce(multiply, factors, ((), {(): 1}))
+	order = get_tuple_getter([keys.index(key) for key in kept])
+	return {order(row): n for row, n in counts.items()}
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import csv
+import os
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, Sequence
+
+Source = str | os.PathLike | Iterable[Any]
+
+_delimiters = {'.tsv': '\t', '.tab': '\t'}
+_buffer_size = 1 << 20
+
+
+def is_path(source: Source) -> bool:
+	return isinstance(source, str | os.PathLike)
+
+
+def read_rows(source: Source, delimiter: str = None, skip_header: bool = False) -> Iterator[Sequence]:
+	'''
+	Rows of a CSV/TSV file, read in big buffered chunks, or the rows of any other iterable as they are
+	'''
+	if not is_path(source):
+		return iter(source)
+	if delimiter is None:
+		delimiter = _delimiters.get(os.path.splitext(source)[1].lower(), ',')
+	return _read_file(source, delimiter, skip_header)
+
+
+def _read_file(path: str | os.PathLike, delimiter: str, skip_header: bool) -> Iterator[list[str]]:
+	with open(path, newline='', buffering=_buffer_size, encoding='utf-8') as file:
+		reader = csv.reader(file, delimiter=delimiter)
+		if skip_header:
+			next(reader, None)
+		yield from reader
+
+
+def iter_chunks(rows: Iterable[Any], arity: int, chunk_size: int = 1 << 16, converters: Sequence[Callable[[str], Any]] = None) -> Iterator[list[tuple]]:
+	'''
+	Lists of member tuples, the arity is validated once per chunk
+	'''
+	rows = iter(rows)
+	while chunk := list(islice(rows, chunk_size)):
+		if arity == 1:
+			chunk = [tuple(row) if isinstance(row, tuple | list) else (row, ) for row in chunk]
+		else:
+			chunk = [row if isinstance(row, tuple) else tuple(row) for row in chunk]
+		if converters is not None:
+			chunk = [tuple(convert(value) for convert, value in zip(converters, row)) for row in chunk]
+		if set(map(len, chunk)) != {arity}:
+			bad = next(row for row in chunk if len(row) != arity)
+			raise ValueError(f'Expected rows of {arity} members, got {bad}')
+		yield chunk
+
+
+def peek_arity(rows: Iterable[Any]) -> tuple[int, Iterator[Any]]:
+	'''
+	Arity of the first row and the rows with it put back
+	'''
+	rows = iter(rows)
+	first = next(rows, None)
+	if first is None:
+		raise ValueError('Cannot infer the arity of an empty source')
+	arity = len(first) if isinstance(first, tuple | list) else 1
+	return arity, _prepend(first, rows)
+
+
+def _prepend(first: Any, rows: Iterator[Any]) -> Iterator[Any]:
+	yield first
+	yield from rows
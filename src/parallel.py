@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Iterator
+
+from more_itertools import unique_everseen
+
+from src.joins import get_tuple_getter
+from src.relations import Relation, DerivedRelation, UnionRelation, IntersectionRelation, RelationStorage
+
+Leaf = tuple[int, tuple, list[tuple]]
+
+
+def _evaluate_partition(is_conjunctive: bool, leaves: list[Leaf], output_keys: tuple) -> list[tuple]:
+	'''
+	Members of the relation of the leaves (arity, params, members) rebuilt in the worker: the join of them when conjunctive, the union otherwise.
+	The rebuilt relation numbers the bare letters by their first appearance in the leaves, so its members are put in the order of the output keys
+	'''
+	storage = RelationStorage()
+	relations = [Relation(f'leaf_{i}', arity, space=members, registry=storage) for i, (arity, _, members) in enumerate(leaves)]
+	relation_type = IntersectionRelation if is_conjunctive else UnionRelation
+	relation = relation_type('partition', relations=relations, params=[params for _, params, _ in leaves])
+	if relation.positions == output_keys:
+		return list(relation)
+	return list(map(get_tuple_getter([relation.positions.index(key) for key in output_keys]), relation))
+
+
+class ParallelEvaluator:
+	'''
+	Evaluates derived relations in a process pool. The leaves are hash-partitioned on a correspondence they all share, so
+	every partition is evaluated on its own; small inputs, relations without such a correspondence and the ones a partition
+	cannot be evaluated on its own for are evaluated in-process
+	'''
+
+	def __init__(self, workers: int = None, min_size: int = 1 << 16, partitions_per_worker: int = 4):
+		self._workers = workers or os.cpu_count() or 1
+		self._min_size = min_size
+		self._partitions_per_worker = partitions_per_worker
+
+	@property
+	def workers(self) -> int:
+		return self._workers
+
+	def evaluate(self, relation: DerivedRelation) -> Iterator[tuple]:
+		'''
+		Members of the relation, streamed as the partitions are done
+		'''
+		if self._workers < 2 or not self.can_partition(relation):
+			return self._evaluate_in_process(relation)
+		leaves = [(leaf, params, leaf.members) for leaf, params in relation._get_leaves()]
+		key = self.get_partition_key(relation, leaves)
+		if key is None or sum(len(members) for _, _, members in leaves) < self._min_size:
+			return self._evaluate_in_process(relation)
+		members = self._stream(relation._is_conjunctive, self._partition(leaves, key, relation._is_conjunctive), relation.positions)
+		return members if key in relation.positions else unique_everseen(members)
+
+	@classmethod
+	def _evaluate_in_process(cls, relation: DerivedRelation) -> Iterator[tuple]:
+		'''
+		A relation being materialized is computed, as its stored members are not there yet
+		'''
+		return relation._compute({}) if relation._materialized else iter(relation)
+
+	@classmethod
+	def can_partition(cls, relation: DerivedRelation) -> bool:
+		'''
+		Whether the relation is a join or a union of its leaves, without a predicate, whose output positions are all bound
+		by the leaves: a complement ranges over the whole universe and a free position over the whole active domain,
+		which no partition has
+		'''
+		if relation._pred is not None or not (relation._is_conjunctive or isinstance(relation, UnionRelation)):
+			return False
+		params_list = [params for _, params in relation._get_leaves()]
+		is_bound = any if relation._is_conjunctive else all
+		return all(is_bound(key in params for params in params_list) for key in relation.positions)
+
+	def get_partition_key(self, relation: DerivedRelation, leaves: list[tuple[Relation, tuple, Any]]) -> int | None:
+		'''
+		The correspondence of every leaf with the most distinct values at its rarest point; for a union only the output
+		positions are shared by all the branches
+		'''
+		shared = set(relation.positions) if not relation._is_conjunctive else None
+		for _, params, _ in leaves:
+			keys = {param for param in params if relation._is_correspondence(param)}
+			shared = keys if shared is None else shared & keys
+		if not shared:
+			return None
+		return max(sorted(shared, key=str), key=lambda key: min(leaf.get_statistics().distinct_counts[params.index(key)] for leaf, params, _ in leaves))
+
+	def _partition(self, leaves: list[tuple[Relation, tuple, Any]], key: int, is_conjunctive: bool) -> list[list[Leaf]]:
+		'''
+		The members of every leaf split by the hash of their value of the key; a join needs all the leaves of a partition
+		to be non-empty, a union just one of them
+		'''
+		count = self._workers * self._partitions_per_worker
+		partitions = [[(leaf.arity, params, []) for leaf, params, _ in leaves] for _ in range(count)]
+		for i, (_, params, members_layers) in enumerate(leaves):
+			position = params.index(key)
+			for members in members_layers:
+				partitions[hash(members[position]) % count][i][2].append(members)
+		is_useful = all if is_conjunctive else any
+		return [partition for partition in partitions if is_useful(members for _, _, members in partition)]
+
+	def _stream(self, is_conjunctive: bool, partitions: list[list[Leaf]], output_keys: tuple) -> Iterator[tuple]:
+		with ProcessPoolExecutor(max_workers=self._workers) as executor:
+			futures = [executor.submit(_evaluate_partition, is_conjunctive, partition, output_keys) for partition in partitions]
+			for future in as_completed(futures):
+				yield from future.result()
+
+	def materialize(self, relation: DerivedRelation) -> DerivedRelation:
+		'''
+		Materializes the relation with its members evaluated in parallel, the later changes are maintained in-process
+		'''
+		return relation.materialize(self)
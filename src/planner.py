@@ -0,0 +1,358 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from collections import Counter
+from dataclasses import dataclass, field
+from itertools import chain, product
+from math import prod
+from typing import Callable, Iterable, Iterator, Any
+
+from more_itertools import unique_everseen
+
+from src.joins import Bindings, hash_join, compile_projection
+from src.trie import Trie, trie_join
+
+
+@dataclass(frozen=True)
+class Statistics:
+	cardinality: int
+	distinct_counts: tuple[int, ...]
+
+	def estimate(self, fixed_positions: Iterable[int]) -> float:
+		'''
+		Expected count of the members having the fixed positions set, assuming the positions are independent and uniform
+		'''
+		if not self.cardinality:
+			return 0
+		return self.cardinality / prod(max(self.distinct_counts[position], 1) for position in fixed_positions)
+
+
+@dataclass
+class ScanSource:
+	'''
+	What the planner needs to know about one relation of a derived relation
+	'''
+	label: str
+	params: tuple
+	statistics: Statistics
+	scan: Callable[[dict], Bindings]
+	has_cheap_lookup: bool
+	is_correspondence: Callable[[Any], bool]
+	subplan: Callable[[list[int]], Plan] | None = None
+	trie: Callable[[tuple[int, ...]], Trie] | None = None
+
+	def get_keys(self, bound_keys: Iterable) -> tuple:
+		keys = []
+		for param in self.params:
+			if self.is_correspondence(param) and param not in bound_keys and param not in keys:
+				keys.append(param)
+		return tuple(keys)
+
+	def get_fixed_positions(self, bound_keys: Iterable) -> list[int]:
+		fixed, seen = [], set()
+		for position, param in enumerate(self.params):
+			if not self.is_correspondence(param):
+				if param != '*':
+					fixed.append(position)
+			elif param in bound_keys or param in seen:
+				fixed.append(position)
+			else:
+				seen.add(param)
+		return fixed
+
+	def estimate(self, bound_keys: Iterable) -> float:
+		return self.statistics.estimate(self.get_fixed_positions(bound_keys))
+
+
+class PlanNode(ABC):
+	estimate: float
+
+	@abstractmethod
+	def execute(self, bound: dict) -> Bindings:
+		raise NotImplementedError
+
+	@abstractmethod
+	def get_keys(self) -> tuple:
+		raise NotImplementedError
+
+	@abstractmethod
+	def describe(self) -> str:
+		raise NotImplementedError
+
+	def get_children(self) -> Iterable[PlanNode]:
+		return ()
+
+	def explain_lines(self, depth: int = 0) -> Iterator[str]:
+		yield f'{"  " * depth}{self.describe()}  rows~{self.estimate:.0f}'
+		for child in self.get_children():
+			yield from child.explain_lines(depth + 1)
+
+
+@dataclass
+class ScanNode(PlanNode):
+	source: ScanSource
+	bound_keys: frozenset
+	estimate: float = 0
+
+	def __post_init__(self):
+		self.estimate = self.source.estimate(self.bound_keys)
+
+	def execute(self, bound: dict) -> Bindings:
+		return self.source.scan(bound)
+
+	def get_keys(self) -> tuple:
+		return self.source.get_keys(self.bound_keys)
+
+	def describe(self) -> str:
+		fixed = self.source.get_fixed_positions(self.bound_keys)
+		operator = 'IndexScan' if fixed else 'Scan'
+		params = ', '.join(str(param) if param not in self.bound_keys else f'{param}=?' for param in self.source.params)
+		return f'{operator} {self.source.label}({params})'
+
+	def get_children(self) -> Iterable[PlanNode]:
+		if self.source.subplan is None:
+			return ()
+		return self.source.subplan(self.source.get_fixed_positions(self.bound_keys)).get_children()
+
+
+@dataclass
+class HashJoinNode(PlanNode):
+	probe: PlanNode
+	build: PlanNode
+	estimate: float = 0
+
+	def execute(self, bound: dict) -> Bindings:
+		return hash_join(self.probe.execute(bound), self.build.execute(bound))
+
+	def get_keys(self) -> tuple:
+		probe_keys = self.probe.get_keys()
+		return probe_keys + tuple(key for key in self.build.get_keys() if key not in probe_keys)
+
+	def describe(self) -> str:
+		shared = [key for key in self.build.get_keys() if key in self.probe.get_keys()]
+		if not shared:
+			return 'CrossJoin'
+		return f'HashJoin on {tuple(shared)}'
+
+	def get_children(self) -> Iterable[PlanNode]:
+		return self.probe, self.build
+
+
+@dataclass
+class IndexNestedLoopJoinNode(PlanNode):
+	outer: PlanNode
+	inner: ScanNode
+	estimate: float = 0
+
+	def execute(self, bound: dict) -> Bindings:
+		outer = self.outer.execute(bound)
+		return Bindings(self.get_keys(), self._probe(outer, bound))
+
+	def _probe(self, outer: Bindings, bound: dict) -> Iterator[tuple]:
+		for row in outer.rows:
+			inner = self.inner.execute({**bound, **dict(zip(outer.keys, row))})
+			for extra in inner.rows:
+				yield row + extra
+
+	def get_keys(self) -> tuple:
+		return self.outer.get_keys() + self.inner.get_keys()
+
+	def describe(self) -> str:
+		shared = [key for key in self.inner.source.get_keys(()) if key in self.outer.get_keys()]
+		return f'IndexNestedLoopJoin on {tuple(shared)}'
+
+	def get_children(self) -> Iterable[PlanNode]:
+		return self.outer, self.inner
+
+
+@dataclass
+class TrieJoinNode(PlanNode):
+	'''
+	All the sources joined at once by binding one key at a time, for the cyclic patterns whose pairwise joins blow up.
+	The keys shared by the most sources come first, then the ones with the fewest distinct values
+	'''
+	sources: list[ScanSource]
+	bound_keys: frozenset
+	estimate: float = 0
+	keys: tuple = ()
+
+	def __post_init__(self):
+		counts = Counter(key for source in self.sources for key in source.get_keys(self.bound_keys))
+		distinct_counts = {key: min(source.statistics.distinct_counts[source.params.index(key)] for source in self.sources if key in source.params) for key in counts}
+		self.keys = tuple(sorted(counts, key=lambda key: (-counts[key], distinct_counts[key])))
+		self.estimate = self._get_output_bound()
+
+	def _get_output_bound(self) -> float:
+		'''
+		AGM bound of a fractional edge cover: a source with a key of its own has to cover it with a weight of 1,
+		the keys of the other ones are covered by two sources with a weight of 1/2 each
+		'''
+		counts = Counter(key for source in self.sources for key in source.get_keys(self.bound_keys))
+		weights = [1 if any(counts[key] == 1 for key in source.get_keys(self.bound_keys)) else 0.5 for source in self.sources]
+		return prod(source.estimate(self.bound_keys) ** weight for source, weight in zip(self.sources, weights))
+
+	def execute(self, bound: dict) -> Bindings:
+		index = {key: i for i, key in enumerate(self.keys)}
+		tries = [self._get_trie(source, bound, index) for source in self.sources]
+		return Bindings(self.keys, trie_join(tries, len(self.keys)))
+
+	def _get_trie(self, source: ScanSource, bound: dict, index: dict) -> tuple[list[int], Trie]:
+		'''
+		The index of the relation in the order of the keys when its params are just distinct free keys, otherwise a trie of its scan
+		'''
+		keys = sorted(source.get_keys(self.bound_keys), key=index.get)
+		levels = [index[key] for key in keys]
+		if source.trie is not None and not source.get_fixed_positions(self.bound_keys):
+			return levels, source.trie(tuple(source.params.index(key) for key in keys))
+		bindings = source.scan(bound)
+		return levels, Trie([bindings.keys.index(key) for key in keys], bindings.rows)
+
+	def get_keys(self) -> tuple:
+		return self.keys
+
+	def describe(self) -> str:
+		return f'TrieJoin on {self.keys}'
+
+	def get_children(self) -> Iterable[PlanNode]:
+		return [ScanNode(source, self.bound_keys) for source in self.sources]
+
+
+@dataclass
+class UnionNode(PlanNode):
+	'''
+	Rows of the branches put in the order of the keys and deduplicated, the keys a branch does not bind range over the domain
+	'''
+	branches: list[PlanNode]
+	keys: tuple = ()
+	domain: Callable[[], Iterable] | None = None
+	estimate: float = 0
+
+	def __post_init__(self):
+		self.estimate = sum(branch.estimate for branch in self.branches)
+
+	def execute(self, bound: dict) -> Bindings:
+		return Bindings(self.keys, unique_everseen(chain.from_iterable(self._project(branch.execute(bound)) for branch in self.branches)))
+
+	def _project(self, bindings: Bindings) -> Iterator[tuple]:
+		make_projection, free = compile_projection(self.keys, bindings.keys, frozenset())
+		project = make_projection(())
+		if not free:
+			return map(project, bindings.rows)
+		free_values_layers = list(product(self.domain(), repeat=len(free)))
+		return (project(row, free_values) for row in bindings.rows for free_values in free_values_layers)
+
+	def get_keys(self) -> tuple:
+		return self.keys
+
+	def describe(self) -> str:
+		return 'Union'
+
+	def get_children(self) -> Iterable[PlanNode]:
+		return self.branches
+
+
+@dataclass
+class ComplementNode(PlanNode):
+	'''
+	Rows of the universe, bound to the keys, whose members the source does not match; each of them is probed, as the
+	members the source induces cannot be scanned
+	'''
+	source: PlanNode
+	estimate: float = 0
+	keys: tuple = ()
+	universe: Callable[[dict], Iterable[tuple]] | None = None
+	make_check: Callable[[dict], Callable[[tuple], bool]] | None = None
+
+	def execute(self, bound: dict) -> Bindings:
+		return Bindings(self.keys, filter(self.make_check(bound), self.universe(bound)))
+
+	def get_keys(self) -> tuple:
+		return self.keys
+
+	def describe(self) -> str:
+		return 'AntiJoin with universe'
+
+	def get_children(self) -> Iterable[PlanNode]:
+		return self.source,
+
+
+@dataclass
+class Plan:
+	label: str
+	output_keys: tuple
+	root: PlanNode
+	bound_keys: frozenset = field(default_factory=frozenset)
+
+	@property
+	def estimate(self) -> float:
+		return self.root.estimate
+
+	def execute(self, bound: dict) -> Bindings:
+		return self.root.execute(bound)
+
+	def get_children(self) -> Iterable[PlanNode]:
+		return self.root,
+
+	def __str__(self) -> str:
+		bound = ', '.join(sorted(map(str, self.bound_keys)))
+		header = f'{self.label} -> Distinct Project{self.output_keys}' + (f' given {bound}' if bound else '')
+		return '\n'.join([header, *self.root.explain_lines(1)])
+
+
+class QueryPlanner:
+	'''
+	Greedy cost-based join ordering: starts from the most selective relation and keeps joining the connected relation
+	with the smallest estimated result, choosing an index nested loop join when probing is cheaper than hashing.
+	Cyclic patterns are joined by a single trie join instead
+	'''
+
+	def plan_join(self, sources: list[ScanSource], bound_keys: frozenset) -> PlanNode:
+		if len(sources) > 2 and self.is_cyclic(sources, bound_keys):
+			return TrieJoinNode(sources, bound_keys)
+		remaining = list(sources)
+		first = min(remaining, key=lambda source: source.estimate(bound_keys))
+		remaining.remove(first)
+		node: PlanNode = ScanNode(first, bound_keys)
+		keys = set(bound_keys) | set(node.get_keys())
+		while remaining:
+			connected = [source for source in remaining if keys & set(source.get_keys(()))] or remaining
+			source = min(connected, key=lambda s: self._estimate_join(node, s, keys))
+			remaining.remove(source)
+			node = self._choose_join(node, source, bound_keys, keys)
+			keys |= set(source.get_keys(()))
+		return node
+
+	@classmethod
+	def is_cyclic(cls, sources: list[ScanSource], bound_keys: frozenset) -> bool:
+		'''
+		GYO reduction of the hypergraph of the free keys: the keys of a single source and the sources within another one are
+		removed until nothing changes, the pattern is acyclic when a single source is left
+		'''
+		edges = [set(source.get_keys(bound_keys)) for source in sources]
+		is_changed = True
+		while is_changed and len(edges) > 1:
+			counts = Counter(key for edge in edges for key in edge)
+			lonely = [{key for key in edge if counts[key] == 1} for edge in edges]
+			is_changed = any(lonely)
+			edges = [edge - keys for edge, keys in zip(edges, lonely)]
+			ear = next((i for i, edge in enumerate(edges) if any(i != j and edge <= other for j, other in enumerate(edges))), None)
+			if ear is not None:
+				edges.pop(ear)
+				is_changed = True
+		return len(edges) > 1
+
+	@classmethod
+	def _estimate_join(cls, node: PlanNode, source: ScanSource, keys: set) -> float:
+		return node.estimate * source.estimate(keys)
+
+	def _choose_join(self, node: PlanNode, source: ScanSource, bound_keys: frozenset, keys: set) -> PlanNode:
+		estimate = self._estimate_join(node, source, keys)
+		shared = keys & set(source.get_keys(())) - bound_keys
+		scan = ScanNode(source, bound_keys)
+		probing_cost = node.estimate * (1 + source.estimate(keys)) * (1 if source.has_cheap_lookup else max(scan.estimate, 1))
+		hashing_cost = node.estimate + scan.estimate + estimate
+		if shared and probing_cost < hashing_cost:
+			return IndexNestedLoopJoinNode(node, ScanNode(source, frozenset(keys)), estimate)
+		if scan.estimate < node.estimate:
+			return HashJoinNode(node, scan, estimate)
+		return HashJoinNode(scan, node, estimate)
@@ -1,14 +1,44 @@
 from __future__ import annotations
 
+import os
+import re
+import time
+import weakref
 from abc import ABC, abstractmethod
-from functools import reduce
-from itertools import repeat, product
-from typing import Iterable, Any, Callable
+from collections import Counter
+from functools import reduce, partial
+from itertools import repeat, product, chain, count, compress, accumulate, islice
+from typing import Iterable, Iterator, Any, Callable, AbstractSet, Sequence, NamedTuple, Hashable, TYPE_CHECKING
 
 from more_itertools import unique_everseen, bucket
 import operator as op
 
+from src.cache import ResultCache
+from src.closure import TransitiveClosure
+from src.loader import Source, read_rows, iter_chunks, peek_arity
+from src.joins import Bindings, Factor, get_tuple_getter, compile_scan, compile_projection, count_join
+from src.snapshot import write_snapshot, read_snapshot
+from src.planner import Statistics, ScanSource, ScanNode, UnionNode, ComplementNode, Plan, QueryPlanner
+from src.sparse import SparseBooleanMatrix
+from src.storage import Storage, SetStorage, VersionedStorage, ColumnarStorage, AtomTable, WriteLock, PinnedVersions, to_mask, no_members, is_pinned
+from src.trie import Trie
+
+if TYPE_CHECKING:
+	from src.parallel import ParallelEvaluator
+	from src.sqlite_store import SqlCompiler
+
+_variable = re.compile(r'[A-Z]\d*')
+
+
+def is_variable(param: Any) -> bool:
+	'''
+	Letter correspondences: 'A' takes a free output position, 'A1' is the output position 1; 'A' and 'A1' are the same one
+	'''
+	return isinstance(param, str) and _variable.fullmatch(param) is not None
+
+
 class IName:
+	__slots__ = ()
 
 	def __init__(self, name: str, **kwargs):
 		super().__init__(**kwargs)
@@ -23,19 +53,39 @@ class IName:
 
 
 class ISet:
-	def __init__(self, **kwargs):
+	__slots__ = ()
+
+	def __init__(self, backend: Storage = None, **kwargs):
 		super().__init__(**kwargs)
-		self._set = set()
+		self._set: Storage = backend if backend is not None else SetStorage()
+		self._snapshot: AbstractSet | None = None
+
+	@property
+	def set(self) -> set:
+		return set(self.members)
 
 	@property
-	def set(self):
-		return set(self._set)
+	def members(self) -> AbstractSet:
+		'''
+		Read-only snapshot of the members, reused until the next modification. The current version of a persistent storage
+		is already one, and it can be pinned
+		'''
+		if self._set.persistent:
+			return self._set.get_snapshot()
+		if self._snapshot is None:
+			self._snapshot = self._set.get_snapshot()
+		return self._snapshot
+
+	def get_members(self) -> AbstractSet:
+		return self.members
 
-	def get_members(self) -> set:
-		return self.set
+	def _invalidate_members(self) -> None:
+		self._snapshot = None
 
 
 class IArity:
+	__slots__ = ()
+
 	def __init__(self, arity, **kwargs):
 		super().__init__(**kwargs)
 		self._arity = arity
@@ -46,41 +96,182 @@ class IArity:
 
 
 class IIsMatchedBy(ABC):
+	__slots__ = ()
+
 	def is_matched_by(self, *elems: Any) -> bool:
 		raise NotImplementedError
 
 	def filter(self, elems: Iterable[Any]) -> Iterable[Any]:
-		return filter(lambda elem: self.is_matched_by(elem), elems)
+		candidates = elems if hasattr(elems, '__len__') else list(elems)
+		return compress(candidates, self.match_many(candidates))
 
+	def match_many(self, candidates: Sequence[Any]) -> Sequence[bool]:
+		'''
+		Boolean mask of the candidates being matched, a NumPy array when NumPy is available
+		'''
+		return to_mask(map(self.is_matched_by, candidates), len(candidates))
 
-class Relation(IName, IIsMatchedBy, ISet, IArity):
 
-	_all_relations: dict[int, list[Relation]] = {}
+class Relation(IName, IIsMatchedBy, ISet, IArity):
+	'''
+	The mixins only declare empty slots, so they can be combined; the slots of all of them live here
+	'''
+	__slots__ = ('_name', '_set', '_snapshot', '_arity', '_registry', '_statistics', '_version', '_observers', '_flags', '_closure', '_shape', '_tries', '__weakref__')
 
-	def __init__(self, name: str = '', arity: int = 2,  **kwargs):
+	def __init__(self, name: str = '', arity: int = 2, space: Iterable[Any] = (), registry: RelationStorage = None, **kwargs):
+		self._flags = 0
 		super().__init__(name=name, arity=arity, **kwargs)
-		self._save_relation(self)
+		self._registry: RelationStorage = registry if registry is not None else default_storage
+		self._statistics: Statistics | None = None
+		self._version = 0
+		self._observers: list[weakref.ref] | None = None
+		self._closure: TransitiveClosure | None = None
+		self._tries: tuple[AbstractSet, dict[tuple[int, ...], Trie]] | None = None
+		self._save_relation()
+		if space:
+			self.bulk_load(space)
+
+	def _save_relation(self) -> None:
+		self._registry.register(self)
 
-	@classmethod
-	def _save_relation(cls, relation: Relation):
-		cls._all_relations.setdefault(relation.arity, []).append(relation)
+	@property
+	def registry(self) -> RelationStorage:
+		return self._registry
+
+	@property
+	def version(self) -> int:
+		'''
+		Counter of the modifications
+		'''
+		return self._version
 
 	def add(self, *to_adds: Any):
-		for to_add in to_adds:
-			if not isinstance(to_add, tuple | list):
-				to_add = (to_add, )
-			self._set.add(to_add)
+		with self._registry.writer:
+			added = self._set.update(tuple(to_add) if isinstance(to_add, tuple | list) else (to_add, ) for to_add in to_adds)
+			if added:
+				self._track_added(added)
+				self._version += 1
+				self._invalidate_members()
+				self._notify(tuple(added))
+
+	def bulk_load(self, source: Source, *, delimiter: str = None, skip_header: bool = False, chunk_size: int = 1 << 16, converters: Sequence[Callable[[str], Any]] = None) -> int:
+		'''
+		Adds the rows of a CSV/TSV file (by path, the delimiter follows the extension) or of any iterable, chunk by chunk.
+		Observers are notified once, with all the new members, and the count of them is returned
+		'''
+		chunks = iter_chunks(read_rows(source, delimiter, skip_header), self.arity, chunk_size, converters)
+		with self._registry.writer:
+			added = self._set.load(chunks)
+			if added:
+				self._track_added(added)
+				self._version += 1
+				self._invalidate_members()
+				self._notify(tuple(added))
+		return len(added)
+
+	def _track_added(self, added: list[tuple] | None) -> None:
+		'''
+		Bookkeeping of the new members, None when all of them were replaced; called under the write lock before the observers are notified
+		'''
+		pass
+
+	def subscribe(self, observer) -> None:
+		'''
+		The observer's _on_added gets the members of every add, or None when the relation has changed in another way.
+		Observers are weakly referenced, the collected ones are dropped whenever the count of them reaches a power of two
+		'''
+		if self._observers is None:
+			self._observers = []
+		elif not len(self._observers) & (len(self._observers) - 1):
+			self._observers = [ref for ref in self._observers if ref() is not None]
+		self._observers.append(weakref.ref(observer))
+
+	def _has_observers(self) -> bool:
+		return self._observers is not None and any(ref() is not None for ref in self._observers)
+
+	def _notify(self, added: tuple[tuple, ...] | None) -> None:
+		if self._observers is None:
+			return
+		for ref in tuple(self._observers):
+			observer = ref()
+			if observer is not None:
+				observer._on_added(self, added)
+
+	def _invalidate_members(self) -> None:
+		super()._invalidate_members()
+		self._statistics = None
+
+	def get_trie(self, order: Sequence[int]) -> Trie:
+		'''
+		Members indexed in the column order, built on first use and kept for as long as the members are the same snapshot
+		'''
+		members = self.members
+		if self._tries is None or self._tries[0] is not members:
+			self._tries = (members, {})
+		order = tuple(order)
+		tries = self._tries[1]
+		if order not in tries:
+			tries[order] = Trie(order, members)
+		return tries[order]
+
+	def get_statistics(self) -> Statistics:
+		'''
+		Cardinality and per position distinct counts, recomputed after a modification
+		'''
+		if self._statistics is None:
+			distinct_counts = (self._set.get_distinct_count(n) for n in range(self.arity))
+			self._statistics = Statistics(len(self._set), tuple(distinct_counts))
+		return self._statistics
+
+	def _to_members(self, elems: tuple) -> tuple:
+		if len(elems) == 1 and isinstance(elems[0], tuple | list) and (self.arity != 1 or len(elems[0]) == 1):
+			return tuple(elems[0])
+		return tuple(elems)
 
 	def is_matched_by(self, *elems: Any) -> bool:
+		elems = self._to_members(elems)
 		if len(elems) != self.arity:
 			return False
+		return elems in self.members
+
+	def match_many(self, candidates: Sequence[Any]) -> Sequence[bool]:
+		return self._set.match_many(self._to_members_many(candidates))
+
+	def _to_members_many(self, candidates: Sequence[Any]) -> list[tuple]:
+		if hasattr(candidates, 'tolist'):
+			candidates = candidates.tolist()
 		if self.arity == 1:
-			elems = tuple(elems)
-		return elems in self.set
+			return [self._to_members((candidate, )) for candidate in candidates]
+		return [candidate if isinstance(candidate, tuple) else tuple(candidate) if isinstance(candidate, list) else (candidate, ) for candidate in candidates]
 
 	def get_all_with_value_at(self, value: Any, n: int, from_set=None):
-		from_set = from_set or self.set
-		return self.get_all_with_value_at_from(value, n, from_set)
+		if from_set is not None:
+			return self.get_all_with_value_at_from(value, n, from_set)
+		return self._set.get_all_with_value_at(value, n)
+
+	@property
+	def positions(self) -> tuple[int, ...]:
+		'''
+		Correspondences of the members' positions, the default params when the relation is derived from
+		'''
+		return tuple(range(self.arity))
+
+	def _get_matrix(self, atoms: AtomTable) -> SparseBooleanMatrix:
+		'''
+		Adjacency matrix of the members of a binary relation, read from the columns when they are encoded with the same atoms
+		'''
+		if isinstance(self._set, ColumnarStorage) and self._set.atoms is atoms:
+			return SparseBooleanMatrix.from_columns(self._set.get_column(0), self._set.get_column(1), len(atoms))
+		return SparseBooleanMatrix.from_edges(self.members, atoms)
+
+	def _derive_sql(self, compiler: SqlCompiler) -> str | None:
+		'''
+		Source of the FROM clause of a SQL query computing the members, None when the relation is not expressible in SQL
+		'''
+		return compiler.table(self)
+
+	def _active_domain(self) -> set:
+		return {member for members in self.members for member in members}
 
 	@classmethod
 	def get_all_with_value_at_from(cls, value: Any, n: int, from_set):
@@ -89,13 +280,46 @@ class Relation(IName, IIsMatchedBy, ISet, IArity):
 	def __getitem__(self, elems):
 		return elems in self._set
 
+	def __iter__(self) -> Iterator[tuple]:
+		'''
+		Members pulled one by one, derived relations evaluate only as far as they are iterated
+		'''
+		return iter(self.members)
+
+	def exists(self) -> bool:
+		return next(iter(self), None) is not None
+
+	def first(self, default: tuple | None = None) -> tuple | None:
+		return next(iter(self), default)
+
+	def take(self, n: int) -> list[tuple]:
+		return list(islice(self, n))
+
+	def count(self) -> int:
+		return len(self._set)
+
+	def count_by(self, n: int) -> dict[Any, int]:
+		'''
+		Count of the members per value at the position, read from the positional index
+		'''
+		return self._set.get_value_counts(n)
+
+	def distinct_count(self, n: int) -> int:
+		return self._set.get_distinct_count(n)
+
+	def _has_inducive_properties(self) -> bool:
+		'''
+		Whether it matches members it does not store
+		'''
+		return False
+
 	def __contains__(self, elems) -> bool:
-		return self.is_matched_by(*elems)
+		return self.is_matched_by(elems)
 
 	def __call__(self, *args, **kwargs):
-		if len(args) == self.arity and not any((isinstance(arg, int) or arg == '*' for arg in args)):
+		if len(args) == self.arity and not any((DerivedRelation._is_correspondence(arg) or arg == '*' for arg in args)):
 			return self.is_matched_by(*args)
-		return DerivedRelation(self.name, relations=self, params=(args,))
+		return IntersectionRelation(self.name, relations=(self, ), params=(args,))
 
 	def __or__(self, relation) -> DerivedRelation:
 		return UnionRelation(f'{self.name}_or_{relation.name}', relations=(self, relation))
@@ -106,25 +330,89 @@ class Relation(IName, IIsMatchedBy, ISet, IArity):
 	def __neg__(self) -> DerivedRelation:
 		return ComplementRelation(f'not_{self.name}', relation=self)
 
+	def get_key(self) -> Hashable:
+		'''
+		Structural key: a stored relation is just itself, weakly referenced, so the keys do not keep it alive
+		'''
+		return weakref.ref(self)
+
 	def __eq__(self, other):
-		if not isinstance(other, Relation):
-			return False
-		return self.name == other.name and self.arity == other.arity
+		return self is other
+
+	def __hash__(self) -> int:
+		return object.__hash__(self)
 
 
 class DerivedRelation(Relation, ABC):
-	def __init__(self, name, *, relations: Iterable[Relation], params: Iterable[tuple[int | str, ...]] = None, pred: Callable[[Iterable[Relation], Iterable[tuple]], bool] = None, **kwargs):
+	__slots__ = ('_relations', '_params', '_output_keys', '_pred', '_materialized', '_key')
+	_planner = QueryPlanner()
+	_is_conjunctive = True
+
+	def __init__(self, name, *, relations: Iterable[Relation], params: Iterable[tuple[int | str, ...]] = None, pred: Callable[[Iterable[Relation], Iterable[tuple]], bool] = None, materialized: bool = False, **kwargs):
 		self._relations = tuple(relations)
-		self._params: list[tuple[str | int, ...]] = list(params or (tuple(range(relation.arity)) for relation in self._relations))
-		self._correspondences_with_points = self._get_correspondences_with_point()
-		self._pred = pred or self._predicate
-		super().__init__(name=name, arity=len(self._correspondences_with_points), **kwargs)
+		self._params: tuple[tuple[str | int, ...], ...] = self._spell_variables(tuple(params or (relation.positions for relation in self._relations)), name)
+		if any(len(params) != relation.arity for relation, params in zip(self._relations, self._params)):
+			raise ValueError(f'Params of {name} do not match the arities of its relations')
+		self._output_keys: tuple[int | str, ...] = self._get_output_keys(name)
+		self._pred = pred
+		self._materialized = False
+		self._key: tuple | None = None
+		kwargs.setdefault('registry', self._relations[0].registry)
+		kwargs.setdefault('backend', no_members)
+		super().__init__(name=name, arity=len(self._output_keys), **kwargs)
+		for relation in self._get_leaf_relations():
+			relation.subscribe(self)
+		if materialized:
+			self.materialize()
+
+	def _save_relation(self) -> None:
+		pass
+
+	@classmethod
+	def _is_correspondence(cls, param: int | str) -> bool:
+		return isinstance(param, int) or is_variable(param)
 
-	def _get_correspondences_with_point(self) -> dict[int, tuple[int, int]]:
+	@classmethod
+	def _spell_variables(cls, params_list: tuple[tuple, ...], name: str) -> tuple[tuple, ...]:
+		'''
+		Every occurrence of a letter spelled with its output position when some occurrence of it has one
+		'''
+		spelled = {}
+		for params in params_list:
+			for param in params:
+				if is_variable(param) and len(param) > 1 and spelled.setdefault(param[0], param) != param:
+					raise ValueError(f'Correspondence {param[0]} of {name} is given two output positions: {spelled[param[0]]} and {param}')
+		return tuple(tuple(spelled.get(param[0], param) if is_variable(param) else param for param in params) for params in params_list)
+
+	def _get_output_keys(self, name: str) -> tuple[int | str, ...]:
+		'''
+		Non-negative correspondences in the order of their positions: numbers and numbered letters give theirs,
+		the bare letters take the free ones in the order of their appearance
+		'''
+		numbered, bare = {}, []
+		for key in self._get_correspondences_with_point():
+			if is_variable(key) and len(key) == 1:
+				bare.append(key)
+				continue
+			n = int(key[1:]) if is_variable(key) else key
+			if n < 0:
+				continue
+			if n in numbered:
+				raise ValueError(f'Correspondences {numbered[n]} and {key} of {name} are both the output position {n}')
+			numbered[n] = key
+		free = [n for n in range(len(numbered) + len(bare)) if n not in numbered]
+		numbered.update(zip(free, bare))
+		return tuple(numbered[n] for n in sorted(numbered))
+
+	def _get_correspondences_with_point(self) -> dict[int | str, list[tuple[int, int]]]:
+		'''
+		Maps each correspondence to the (relation, member) points it joins, in the order of appearance.
+		Non-negative ones and letters are output positions, negative ones are projected out
+		'''
 		result = {}
 		for relation_i, params in enumerate(self._params):
 			for member_i, correspondence in enumerate(params):
-				if isinstance(correspondence, int):
+				if self._is_correspondence(correspondence):
 					result.setdefault(correspondence, []).append((relation_i, member_i))
 		return result
 
@@ -133,93 +421,747 @@ class DerivedRelation(Relation, ABC):
 	def _predicate(cls, relations: Iterable[Relation], layer: Iterable[tuple]) -> bool:
 		raise NotImplementedError
 
+	def _matches(self, layer: tuple[tuple, ...]) -> bool:
+		return (self._pred or self._predicate)(self._relations, layer)
+
 	@property
-	def set(self):
-		if len(self._relations) > 1:
-			raise NotImplementedError
-
-		spaces = map(Relation.get_members, self._relations)
-		right_values_spaces = self._filter_wrong_values_out(spaces)
-		relations_members_layers = product(*list(right_values_spaces))
-		corresponding_relations_members_layers = self._filter_not_corresponding_out(relations_members_layers)
-		predicated = filter(self._pred, corresponding_relations_members_layers)
-		reordered = self._reorder_params(predicated)
-		return reordered
-
-	def _filter_not_corresponding_out(self, relations_members_layers: Iterable[tuple[tuple]]) -> Iterable[tuple[tuple]]:
-		return filter(self.has_correspondent_members_the_same, relations_members_layers)
-
-	def has_correspondent_members_the_same(self, relations_members: tuple[tuple]) -> bool:
-		for correspondence, points in self._correspondences_with_points.items():
-			correspondent_members = map(lambda p: relations_members[p[0]][p[1]], points)
-			is_same = len(set(correspondent_members)) == 1
-			if not is_same:
-				return False
-		return True
+	def positions(self) -> tuple[int | str, ...]:
+		return self._output_keys
 
-	def _filter_wrong_values_out(self, spaces: Iterable[Iterable[tuple]]) -> Iterable[Iterable[tuple]]:
-		return (self._filter_wrong_values_out_of_space(space, params) for space, params in zip(spaces, self._params))
+	@property
+	def members(self) -> frozenset:
+		'''
+		Evaluated members, shared through the storage's cache by the relations of the same structure until a relation they
+		are derived from changes. Pinned reads bypass the cache, as the versions do not tell the pinned members apart
+		'''
+		if self._materialized:
+			return super().members
+		if is_pinned():
+			return frozenset(self._evaluate({}))
+		key, version = self.get_key(), self.version
+		members = self._registry.cache.get(key, version)
+		if members is None:
+			members = frozenset(self._evaluate({}))
+			self._registry.cache.put(key, version, members)
+		return members
+
+	def get_key(self) -> tuple:
+		'''
+		Structural key of the operator, the keys of the relations and the params, computed once as derived relations do not change
+		'''
+		if self._key is None:
+			self._key = self._make_key()
+		return self._key
+
+	def _make_key(self) -> tuple:
+		return type(self), self._pred, tuple(relation.get_key() for relation in self._relations), self._get_canonical_params()
+
+	def _get_canonical_params(self) -> tuple[tuple, ...]:
+		'''
+		Output correspondences as their positions and the existential ones numbered in the order of appearance,
+		so the relations built with differently named correspondences have the same key
+		'''
+		at = {key: n for n, key in enumerate(self._output_keys)}
+		existential = {}
+		canonical = []
+		for params in self._params:
+			canonical.append(tuple(at.get(param, param) if not self._is_correspondence(param) or param in at else -1 - existential.setdefault(param, len(existential)) for param in params))
+		return tuple(canonical)
 
-	def _filter_wrong_values_out_of_space(self, space: Iterable[tuple], params: tuple) -> Iterable[tuple]:
-		for param_i, param in enumerate(params):
-			if isinstance(param, str) and param != '*':
-				space = filter(lambda members: members[param_i] == param, space)
-		return space
+	def __eq__(self, other):
+		return isinstance(other, DerivedRelation) and self.get_key() == other.get_key()
 
-	def _reorder_params(self, space: Iterable[tuple]) -> Iterable[tuple]:
-		lacking_count = len(self._correspondences_with_points)
-		for members in space:
-			reordered = [members[index] for index in self._correspondences_with_points.keys()]
-			lacking = members[lacking_count+1:]
-			yield tuple(reordered + lacking)
+	def __hash__(self) -> int:
+		return hash(self.get_key())
+
+	@property
+	def set(self) -> set:
+		return set(self.members)
+
+	@property
+	def version(self) -> int:
+		return self._version + sum(relation.version for relation in self._get_leaf_relations())
+
+	def materialize(self, evaluator: ParallelEvaluator = None) -> DerivedRelation:
+		'''
+		Keeps the members stored and maintains them with the delta rules when the relations change.
+		The first evaluation can be done by a parallel evaluator
+		'''
+		if not self._materialized:
+			self._materialized = True
+			self._refresh(evaluator)
+		return self
+
+	def _refresh(self, evaluator: ParallelEvaluator = None) -> None:
+		'''
+		The new members are published as a single version
+		'''
+		with self._registry.writer:
+			if self._set is no_members:
+				self._set = VersionedStorage() if self._registry.is_versioned else SetStorage()
+			self._set.reset(self._compute({}) if evaluator is None else evaluator.evaluate(self))
+			self._track_added(None)
+			self._version += 1
+			self._invalidate_members()
+			self._notify(None)
+
+	def _on_added(self, relation: Relation, added: tuple[tuple, ...] | None) -> None:
+		if not self._materialized and not self._has_observers():
+			return
+		delta = None if added is None else self._get_delta(relation, Delta(relation, added))
+		if delta is None:
+			self._refresh() if self._materialized else self._notify(None)
+		elif self._materialized:
+			self.add(*delta)
+		else:
+			self._notify(tuple(unique_everseen(delta)))
+
+	def _get_delta(self, relation: Relation, delta: Delta) -> Iterable[tuple] | None:
+		'''
+		New members caused by the delta of the relation: the join evaluated once per occurrence of the relation, with the delta in its place
+		'''
+		leaves = self._get_leaves()
+		deltas = []
+		for changed_i, (leaf, _) in enumerate(leaves):
+			if leaf is not relation:
+				continue
+			sources = [self._get_scan_source(delta if leaf_i == changed_i else leaf, params) for leaf_i, (leaf, params) in enumerate(leaves)]
+			deltas.append(self._reorder_params(self._planner.plan_join(sources, frozenset()).execute({}), {}))
+		return chain.from_iterable(deltas)
+
+	def _active_domain(self) -> set:
+		return set().union(*(relation._active_domain() for relation in self._relations))
+
+	def match_many(self, candidates: Sequence[Any]) -> Sequence[bool]:
+		'''
+		Probes the stored or, when there are at least as many candidates as expected members, the evaluated members in bulk
+		'''
+		if self._materialized:
+			return Relation.match_many(self, candidates)
+		members_layers = self._to_members_many(candidates)
+		if len(members_layers) >= self.get_plan().estimate:
+			members = self.members
+			return to_mask(map(members.__contains__, members_layers), len(members_layers))
+		return to_mask((self.is_matched_by(members) for members in members_layers), len(members_layers))
+
+	def is_matched_by(self, *elems: Any) -> bool:
+		if self._materialized:
+			return Relation.is_matched_by(self, *elems)
+		elems = self._to_members(elems)
+		if len(elems) != self.arity:
+			return False
+		bound = dict(zip(self._output_keys, elems))
+		layer = self._get_layer(bound)
+		if layer is not None:
+			return self._matches(layer)
+		return next(self._evaluate(bound), None) is not None
+
+	def _get_layer(self, bound: dict) -> tuple[tuple, ...] | None:
+		'''
+		Members of every relation determined by the bound correspondences, None if some of them stay free
+		'''
+		if not all(self._is_correspondence(param) and param in bound for params in self._params for param in params):
+			return None
+		return tuple(tuple(bound[param] for param in params) for params in self._params)
+
+	def get_all_with_value_at(self, value: Any, n: int, from_set=None):
+		if from_set is not None:
+			return self.get_all_with_value_at_from(value, n, from_set)
+		return self._evaluate({self._output_keys[n]: value})
+
+	def __iter__(self) -> Iterator[tuple]:
+		members = self._get_cached_members()
+		return self._stream({}) if members is None else iter(members)
+
+	def _get_cached_members(self) -> frozenset | None:
+		return None if self._materialized or is_pinned() else self._registry.cache.get(self.get_key(), self.version)
+
+	def count(self) -> int:
+		'''
+		Counted without enumerating the members when they are cached, when the relation factorises or as the entries
+		of its adjacency matrix
+		'''
+		if self._materialized:
+			return super().count()
+		members = self._get_cached_members()
+		if members is not None:
+			return len(members)
+		factors = self._get_factors(None)
+		if factors is not None:
+			return count_join(factors).get((), 0)
+		if self._pred is None and SparseBooleanMatrix.is_supported():
+			matrix = self._derive_matrix(self._get_atoms())
+			if matrix is not None:
+				return matrix.nnz
+		return sum(1 for _ in self._stream({}))
+
+	def count_by(self, n: int) -> dict[Any, int]:
+		if self._materialized:
+			return super().count_by(n)
+		key = self._output_keys[n]
+		members = self._get_cached_members()
+		factors = self._get_factors(key) if members is None else None
+		if factors is not None:
+			return {value: count for (value, ), count in count_join(factors, (key, )).items()}
+		return dict(Counter(row[n] for row in (self._stream({}) if members is None else members)))
+
+	def distinct_count(self, n: int) -> int:
+		if self._materialized:
+			return super().distinct_count(n)
+		return len(self.count_by(n))
+
+	def _get_factors(self, group_key: int | str | None) -> list[Factor] | None:
+		'''
+		The leaves as the factors of a count of the join, grouped by the key when given. The count of the join is the count of
+		the members unless a correspondence shared by some leaves is projected away, then the members are fewer and None is returned
+		'''
+		if not self._is_conjunctive or self._pred is not None:
+			return None
+		leaves = self._get_leaves()
+		occurrences = Counter(key for _, params in leaves for key in set(params) if self._is_correspondence(key))
+		if any(key not in occurrences for key in self._output_keys) or any(n > 1 and key not in self._output_keys for key, n in occurrences.items()):
+			return None
+		return [self._get_factor(relation, params, occurrences, group_key) for relation, params in leaves]
+
+	def _get_factor(self, relation: Relation, params: tuple, occurrences: Counter, group_key: int | str | None) -> Factor:
+		'''
+		A leaf of distinct output correspondences joined by at most one of them is its count per value of that one, so the others
+		are summed out by the positional index; any other leaf is its distinct rows of the output correspondences
+		'''
+		joined = [param for param in params if occurrences[param] > 1 or param == group_key] if all(map(self._is_correspondence, params)) else None
+		if joined is not None and len(joined) <= 1 and len(set(params)) == len(params) and all(param in self._output_keys for param in params):
+			if not joined:
+				count = relation.count()
+				return (), {(): count} if count else {}
+			return (joined[0], ), {(value, ): count for value, count in relation.count_by(params.index(joined[0])).items()}
+		bindings = self._scan(relation, params, {})
+		kept = [i for i, key in enumerate(bindings.keys) if key in self._output_keys]
+		return tuple(bindings.keys[i] for i in kept), dict.fromkeys(map(get_tuple_getter(kept), bindings.rows), 1)
+
+	def _stream(self, bound: dict) -> Iterator[tuple]:
+		'''
+		Lazy evaluation, for the relations whose _compute evaluates everything at once
+		'''
+		return self._evaluate(bound)
+
+	def _evaluate(self, bound: dict) -> Iterator[tuple]:
+		if not self._materialized:
+			pushed = self._registry.push_down(self, bound)
+			return self._compute(bound) if pushed is None else pushed
+		fixed = [(self._output_keys.index(key), value) for key, value in bound.items() if key in self._output_keys]
+		if not fixed:
+			return iter(self.members)
+		(first_n, first_value), *rest = fixed
+		return (members for members in Relation.get_all_with_value_at(self, first_value, first_n) if all(members[n] == value for n, value in rest))
+
+	def _compute(self, bound: dict) -> Iterator[tuple]:
+		'''
+		Members agreeing with the bound correspondences, the relations' spaces are joined on the shared correspondences as planned for these bound ones
+		'''
+		plan = self.get_plan(frozenset(bound))
+		members_layers = self._reorder_params(plan.execute(bound), bound)
+		if self._pred is not None:
+			members_layers = filter(self._is_accepted, members_layers)
+		return unique_everseen(members_layers)
+
+	def _is_accepted(self, members: tuple) -> bool:
+		'''
+		Whether the custom predicate accepts the layer of the planned member; one not determined by the member is kept, as is_matched_by does
+		'''
+		layer = self._get_layer(dict(zip(self._output_keys, members)))
+		return layer is None or self._matches(layer)
+
+	def _compute_with_matrix(self) -> Iterator[tuple]:
+		'''
+		Members of a binary relation evaluated as sparse boolean matrix algebra over the atoms of the relations
+		'''
+		atoms = self._get_atoms()
+		return self._derive_matrix(atoms).decode(atoms)
+
+	def _get_atoms(self) -> AtomTable:
+		'''
+		Atom table of the columnar leaves when they share one, a new one otherwise
+		'''
+		tables = {id(leaf._set.atoms): leaf._set.atoms for leaf in self._get_leaf_relations() if isinstance(leaf._set, ColumnarStorage)}
+		return next(iter(tables.values())) if len(tables) == 1 else AtomTable()
+
+	def _get_matrix(self, atoms: AtomTable) -> SparseBooleanMatrix:
+		matrix = None if self._materialized or self._pred is not None else self._derive_matrix(atoms)
+		return super()._get_matrix(atoms) if matrix is None else matrix
+
+	def _derive_matrix(self, atoms: AtomTable) -> SparseBooleanMatrix | None:
+		'''
+		Adjacency matrix computed from the matrices of the relations, None when the relation is not expressible with them
+		'''
+		return None
+
+	def _derive_sql(self, compiler: SqlCompiler) -> str | None:
+		return None
+
+	def _has_elementwise_params(self) -> bool:
+		return self.arity == 2 and all(relation.arity == 2 and tuple(params) == (0, 1) for relation, params in zip(self._relations, self._params))
+
+	def get_plan(self, bound_keys: frozenset = frozenset()) -> Plan:
+		sources = self._get_scan_sources()
+		return Plan(self.name, self._output_keys, self._planner.plan_join(sources, bound_keys), bound_keys)
+
+	def explain(self) -> None:
+		print(self.get_plan())
+
+	def _get_scan_sources(self) -> list[ScanSource]:
+		return [self._get_scan_source(relation, params) for relation, params in self._get_leaves()]
+
+	def _get_scan_source(self, relation: Relation, params: tuple) -> ScanSource:
+		subplan = None
+		if isinstance(relation, DerivedRelation):
+			subplan = lambda fixed: relation.get_plan(frozenset(relation.positions[position] for position in fixed))
+		is_stored = not isinstance(relation, DerivedRelation)
+		return ScanSource(relation.name, params, relation.get_statistics(), partial(self._scan, relation, params),
+						  is_stored, self._is_correspondence, subplan, relation.get_trie if is_stored else None)
+
+	def _get_leaf_relations(self) -> Iterable[Relation]:
+		return {id(relation): relation for relation, _ in self._get_leaves()}.values()
+
+	def _get_leaves(self) -> list[tuple[Relation, tuple]]:
+		'''
+		Relations with their params after inlining the conjunctive derived relations, so the constants reach the stored relations
+		and all the joins can be reordered together
+		'''
+		fresh = count(min(chain([0], (key for key in self._get_correspondences_with_point() if isinstance(key, int)))) - 1, -1)
+		leaves = []
+		for relation, params in zip(self._relations, self._params):
+			leaves.extend(self._inline(relation, params, fresh, self._is_conjunctive))
+		return leaves
+
+	@classmethod
+	def _inline(cls, relation: Relation, params: tuple, fresh: Iterator[int], can_join: bool) -> list[tuple[Relation, tuple]]:
+		if not isinstance(relation, DerivedRelation) or not relation._is_conjunctive or relation._pred is not None or not (can_join or len(relation._relations) == 1):
+			return [(relation, params)]
+		outer = dict(zip(relation.positions, params))
+		renamed = {}
+		leaves = []
+		for child, child_params in zip(relation._relations, relation._params):
+			composed = tuple(cls._compose_param(param, outer, renamed, fresh) for param in child_params)
+			leaves.extend(cls._inline(child, composed, fresh, can_join))
+		return leaves
+
+	@classmethod
+	def _flatten(cls, relations: tuple[Relation, ...], params_list: tuple[tuple, ...]) -> tuple[tuple[Relation, ...], tuple[tuple, ...]]:
+		'''
+		Children of the same associative operator are spliced in with their params composed as _inline does,
+		so a chain of operators is a single node however long it is
+		'''
+		if not any(cls._can_flatten(relation) for relation in relations):
+			return relations, params_list
+		fresh = count(min(chain([0], (param for params in params_list for param in params if isinstance(param, int)))) - 1, -1)
+		flat_relations, flat_params = [], []
+		for relation, params in zip(relations, params_list):
+			if not cls._can_flatten(relation):
+				flat_relations.append(relation)
+				flat_params.append(params)
+				continue
+			outer = dict(zip(relation.positions, params))
+			renamed = {}
+			for child, child_params in zip(relation._relations, relation._params):
+				flat_relations.append(child)
+				flat_params.append(tuple(cls._compose_param(param, outer, renamed, fresh) for param in child_params))
+		return tuple(flat_relations), tuple(flat_params)
+
+	@classmethod
+	def _can_flatten(cls, relation: Relation) -> bool:
+		return type(relation) is cls and not relation._materialized and relation._pred is None
+
+	def _is_elementwise(self) -> bool:
+		'''
+		Whether every param is an output position, so the members of the children are picked out of a member
+		'''
+		return all(self._is_correspondence(param) and param in self._output_keys for params in self._params for param in params)
+
+	@classmethod
+	def _get_probe_cost(cls, relation: Relation) -> float:
+		'''
+		Stored relations are probed by size, the smallest rejecting the most; derived ones are evaluated, so they come last
+		'''
+		return len(relation._set) if not isinstance(relation, DerivedRelation) or relation._materialized else float('inf')
+
+	@classmethod
+	def _compose_param(cls, param: int | str, outer: dict, renamed: dict, fresh: Iterator[int]) -> int | str:
+		if not cls._is_correspondence(param):
+			return param
+		if param in outer and outer[param] != '*':
+			return outer[param]
+		if param not in renamed:
+			renamed[param] = next(fresh)
+		return renamed[param]
+
+	def get_statistics(self) -> Statistics:
+		estimate = self.get_plan().estimate
+		distinct_counts = [estimate] * self.arity
+		for relation, params in self._get_leaves():
+			statistics = relation.get_statistics()
+			for member_i, param in enumerate(params):
+				if param in self._output_keys:
+					n = self._output_keys.index(param)
+					distinct_counts[n] = min(distinct_counts[n], statistics.distinct_counts[member_i])
+		return Statistics(round(estimate), tuple(round(distinct_count) for distinct_count in distinct_counts))
+
+	def _scan(self, relation: Relation, params: tuple, bound: dict) -> Bindings:
+		'''
+		Members of the relation agreeing with the constants, the bound correspondences and the repeated ones, by the scan compiled
+		for the pattern of the params: the first fixed position is looked up, the rest are checked by one generated predicate
+		'''
+		pattern = self._get_pattern(params)
+		program = compile_scan(pattern, frozenset(key for kind, key in pattern if kind == 'key' and key in bound))
+		values = tuple(bound[value] if is_key else value for _, is_key, value in program.fixed)
+		space = relation.get_all_with_value_at(values[0], program.fixed[0][0]) if values else relation.get_members()
+		if program.make_check is not None:
+			space = filter(program.make_check(values), space)
+		if program.positions != tuple(range(relation.arity)):
+			space = map(get_tuple_getter(program.positions), space)
+		return Bindings(program.keys, space)
+
+	@classmethod
+	def _get_pattern(cls, params: tuple) -> tuple[tuple[str, Any], ...]:
+		return tuple(('key', param) if cls._is_correspondence(param) else ('any', None) if param == '*' else ('const', param) for param in params)
+
+	def _reorder_params(self, bindings: Bindings, bound: dict) -> Iterator[tuple]:
+		'''
+		Puts the bound values into the output order by a compiled projection, positions no relation binds range over the active domain
+		'''
+		make_projection, free = compile_projection(self._output_keys, bindings.keys, frozenset(key for key in self._output_keys if key in bound))
+		project = make_projection(tuple(bound[key] for key in self._output_keys if key not in bindings.keys and key in bound))
+		if not free:
+			return map(project, bindings.rows)
+		free_values_layers = list(product(self._active_domain(), repeat=len(free)))
+		return (project(row, free_values) for row in bindings.rows for free_values in free_values_layers)
 
 
 class UnionRelation(DerivedRelation):
+	'''
+	Union of any number of relations, the unions among them are flattened into it. Members are streamed branch by branch
+	and deduplicated on the way, a member is matched by the first branch matching it
+	'''
+	__slots__ = ()
+	_is_conjunctive = False
+
 	def __init__(self, name, *, relations: Iterable[Relation], params: Iterable[tuple[int | str, ...]] = None, **kwargs):
+		relations = tuple(relations)
+		relations, params = self._flatten(relations, tuple(params or (relation.positions for relation in relations)))
 		super().__init__(name, relations=relations, params=params, **kwargs)
 
+	@classmethod
+	def _can_flatten(cls, relation: Relation) -> bool:
+		'''
+		A branch not binding all the positions would range over the active domain of the inner union, which is smaller
+		'''
+		return super()._can_flatten(relation) and all(key in params for params in relation._params for key in relation.positions)
+
 	@classmethod
 	def _predicate(cls, relations: Iterable[Relation], layer: Iterable[tuple]) -> bool:
-		return any((relation(members) for relation, members in zip(relations, layer)))
+		return any((relation.is_matched_by(members) for relation, members in zip(relations, layer)))
+
+	def match_many(self, candidates: Sequence[Any]) -> Sequence[bool]:
+		'''
+		Every branch probed in bulk with the candidates no branch before it has matched
+		'''
+		if self._materialized or self._pred is not None or not self._is_elementwise():
+			return super().match_many(candidates)
+		members_layers = self._to_members_many(candidates)
+		matched = [False] * len(members_layers)
+		remaining = [i for i, members in enumerate(members_layers) if len(members) == self.arity]
+		at = {key: n for n, key in enumerate(self._output_keys)}
+		for relation, params in sorted(zip(self._relations, self._params), key=lambda pair: self._get_probe_cost(pair[0])):
+			if not remaining:
+				break
+			positions = [at[param] for param in params]
+			mask = relation.match_many([tuple(members_layers[i][n] for n in positions) for i in remaining])
+			for i in compress(remaining, mask):
+				matched[i] = True
+			remaining = [i for i, is_matched in zip(remaining, mask) if not is_matched]
+		return to_mask(matched, len(members_layers))
+
+	def _derive_matrix(self, atoms: AtomTable) -> SparseBooleanMatrix | None:
+		if not self._has_elementwise_params():
+			return None
+		return reduce(op.or_, (relation._get_matrix(atoms) for relation in self._relations))
+
+	def _derive_sql(self, compiler: SqlCompiler) -> str | None:
+		return compiler.union(self)
+
+	def get_plan(self, bound_keys: frozenset = frozenset()) -> Plan:
+		branches = [ScanNode(source, bound_keys) for source in self._get_scan_sources()]
+		keys = tuple(key for key in self._output_keys if key not in bound_keys)
+		return Plan(self.name, self._output_keys, UnionNode(branches, keys, self._active_domain), bound_keys)
+
+	def _get_delta(self, relation: Relation, delta: Delta) -> Iterable[tuple] | None:
+		if any(key not in params for params in self._params for key in self._output_keys):
+			return None
+		branches = (self._scan(delta, params, {}) for leaf, params in self._get_leaves() if leaf is relation)
+		return chain.from_iterable(self._reorder_params(branch, {}) for branch in branches)
 
 
 class IntersectionRelation(DerivedRelation):
+	'''
+	Join of any number of relations, the intersections among them are flattened into it. A member is probed in the smallest
+	relation first and rejected by the first one not matching it
+	'''
+	__slots__ = ('_probes', )
+
 	def __init__(self, name, *, relations: Iterable[Relation], params: Iterable[tuple[int | str, ...]] = None, **kwargs):
+		relations = tuple(relations)
+		relations, params = self._flatten(relations, tuple(params or (relation.positions for relation in relations)))
+		self._probes: tuple[list, bool] | None = None
 		super().__init__(name, relations=relations, params=params, **kwargs)
 
 	@classmethod
 	def _predicate(cls, relations: Iterable[Relation], layer: Iterable[tuple]) -> bool:
-		return all((relation(members) for relation, members in zip(relations, layer)))
+		return all((relation.is_matched_by(members) for relation, members in zip(relations, layer)))
+
+	def _matches(self, layer: tuple[tuple, ...]) -> bool:
+		if self._pred is not None:
+			return super()._matches(layer)
+		pairs = sorted(zip(self._relations, layer), key=lambda pair: self._get_probe_cost(pair[0]))
+		return all(relation.is_matched_by(members) for relation, members in pairs)
+
+	def is_matched_by(self, *elems: Any) -> bool:
+		'''
+		The relations whose members are determined by the member and the constants are probed first, the join is evaluated
+		only for a member all of them match and only when some relation has free correspondences left
+		'''
+		if self._materialized or self._pred is not None:
+			return super().is_matched_by(*elems)
+		elems = self._to_members(elems)
+		if len(elems) != self.arity:
+			return False
+		if self._probes is None:
+			self._probes = self._get_probes()
+		determined, is_free = self._probes
+		for relation, picks in sorted(determined, key=lambda probe: self._get_probe_cost(probe[0])):
+			if not relation.is_matched_by(tuple(elems[n] if n is not None else constant for n, constant in picks)):
+				return False
+		return not is_free or next(self._evaluate(dict(zip(self._output_keys, elems))), None) is not None
+
+	def _get_probes(self) -> tuple[list[tuple[Relation, list[tuple[int | None, Any]]]], bool]:
+		'''
+		The relations whose members are picked out of a member, each with the (output position or None, constant) of its params,
+		and whether any relation is left with free correspondences
+		'''
+		at = {key: n for n, key in enumerate(self._output_keys)}
+		determined, is_free = [], False
+		for relation, params in zip(self._relations, self._params):
+			if all(param in at if self._is_correspondence(param) else param != '*' for param in params):
+				determined.append((relation, [(at[param], None) if self._is_correspondence(param) else (None, param) for param in params]))
+			else:
+				is_free = True
+		return determined, is_free
+
+	def match_many(self, candidates: Sequence[Any]) -> Sequence[bool]:
+		'''
+		The candidates probed in bulk relation by relation, smallest first, each probe with the ones still matched
+		'''
+		if self._materialized or self._pred is not None or not self._is_elementwise():
+			return super().match_many(candidates)
+		members_layers = self._to_members_many(candidates)
+		remaining = [i for i, members in enumerate(members_layers) if len(members) == self.arity]
+		at = {key: n for n, key in enumerate(self._output_keys)}
+		for relation, params in sorted(zip(self._relations, self._params), key=lambda pair: self._get_probe_cost(pair[0])):
+			if not remaining:
+				break
+			positions = [at[param] for param in params]
+			remaining = list(compress(remaining, relation.match_many([tuple(members_layers[i][n] for n in positions) for i in remaining])))
+		matched = [False] * len(members_layers)
+		for i in remaining:
+			matched[i] = True
+		return to_mask(matched, len(members_layers))
+
+	def _derive_matrix(self, atoms: AtomTable) -> SparseBooleanMatrix | None:
+		if not self._has_elementwise_params():
+			return None
+		return reduce(op.and_, (relation._get_matrix(atoms) for relation in self._relations))
+
+	def _derive_sql(self, compiler: SqlCompiler) -> str | None:
+		return compiler.join(self)
 
 
 class ComplementRelation(DerivedRelation):
-	def __init__(self, name, *, relation: Relation, params: tuple[int | str, ...] = None, **kwargs):
+	'''
+	Members not matching the relation. With a domain, a unary relation of the atoms, the members are bounded by it and enumerated
+	lazily; without one, membership is open world and the members range over the other relations of the same arity
+	'''
+	__slots__ = ('_domain', )
+	_is_conjunctive = False
+
+	def __init__(self, name, *, relation: Relation, params: tuple[int | str, ...] = None, domain: Relation = None, **kwargs):
+		if domain is not None and domain.arity != 1:
+			raise ValueError(f'Domain of {name} has to be unary')
+		self._domain = domain
 		super().__init__(name, relations=(relation, ), params=(params,) if params else None, **kwargs)
+		if domain is not None:
+			domain.subscribe(self)
+
+	@property
+	def domain(self) -> Relation | None:
+		return self._domain
+
+	@property
+	def version(self) -> int:
+		'''
+		Without a domain the members range over the universe, so its changes count too
+		'''
+		return super().version + (self._registry.universe_version if self._domain is None else self._domain.version)
+
+	def is_matched_by(self, *elems: Any) -> bool:
+		if self._domain is not None and not self._materialized and not all(map(self._domain.is_matched_by, self._to_members(elems))):
+			return False
+		return super().is_matched_by(*elems)
+
+	def _make_key(self) -> tuple:
+		return super()._make_key() + (None if self._domain is None else self._domain.get_key(), )
+
+	def _is_outside(self, members: tuple) -> bool:
+		bound = dict(zip(self._output_keys, members))
+		layer = self._get_layer(bound)
+		if layer is not None:
+			return self._matches(layer)
+		return next(iter(self._scan(self._relations[0], self._params[0], bound).rows), None) is None
 
 	@classmethod
 	def _predicate(cls, relations: Iterable[Relation], layer: Iterable[tuple]) -> bool:
 		relation, members = next(iter(relations)), next(iter(layer))
-		return not relation(members)
+		return not relation.is_matched_by(members)
+
+	def match_many(self, candidates: Sequence[Any]) -> Sequence[bool]:
+		'''
+		Negated mask of the relation, as the members of a complement cannot be enumerated
+		'''
+		relation = self._relations[0]
+		if self._materialized or tuple(self._params[0]) != relation.positions:
+			return IIsMatchedBy.match_many(self, candidates)
+		members_layers = self._to_members_many(candidates)
+		matched = relation.match_many(members_layers)
+		if self._domain is not None:
+			in_domain = self._domain.match_many([atom for members in members_layers for atom in members])
+			ends = list(accumulate(map(len, members_layers), initial=0))
+			matched = [is_matched or not all(in_domain[start:end]) for is_matched, start, end in zip(matched, ends, ends[1:])]
+		return to_mask((not is_matched and len(members) == self.arity for is_matched, members in zip(matched, members_layers)), len(members_layers))
+
+	def count(self) -> int:
+		'''
+		Size of the space less the members of the relation in it, the relation being enumerated instead of the space
+		'''
+		if not self._is_counted_from_relation():
+			return super().count()
+		size = len(self._registry.get_universe(self.arity)) if self._domain is None else self._domain.count() ** self.arity
+		return size - sum(1 for _ in self._get_excluded())
+
+	def count_by(self, n: int) -> dict[Any, int]:
+		if not self._is_counted_from_relation():
+			return super().count_by(n)
+		if self._domain is None:
+			space = Counter(members[n] for members in self._registry.get_universe(self.arity))
+		else:
+			space = Counter(dict.fromkeys((atom for atom, in self._domain.members), self._domain.count() ** (self.arity - 1)))
+		return dict(space - Counter(members[n] for members in self._get_excluded()))
+
+	def _is_counted_from_relation(self) -> bool:
+		'''
+		Whether the members outside the complement are the members of the relation, not reordered and none of them induced
+		'''
+		relation = self._relations[0]
+		return not self._materialized and self._pred is None and tuple(self._params[0]) == relation.positions and not relation._has_inducive_properties()
 
-	def set(self):
+	def _get_excluded(self) -> Iterator[tuple]:
+		'''
+		Members of the relation in the space of the complement
+		'''
 		relation = self._relations[0]
-		rest = (rel.set for rel in Relation._all_relations[relation.arity] if rel != relation)
-		return reduce(op.or_, rest) - relation.set
+		if self._domain is None:
+			return filter(self._registry.get_universe(self.arity).__contains__, relation)
+		atoms = self._domain.members
+		return (members for members in relation if all((atom, ) in atoms for atom in members))
+
+	def get_plan(self, bound_keys: frozenset = frozenset()) -> Plan:
+		source = ScanNode(self._get_scan_source(self._relations[0], self._params[0]), bound_keys)
+		estimate = source.estimate
+		if self._domain is not None:
+			free = [key for key in self._output_keys if key not in bound_keys]
+			estimate = max(len(self._domain.members) ** len(free) - source.estimate, 0)
+		keys = tuple(key for key in self._output_keys if key not in bound_keys)
+		return Plan(self.name, self._output_keys, ComplementNode(source, estimate, keys, self._get_space, self._get_outside_check), bound_keys)
+
+	def _get_space(self, bound: dict) -> Iterator[tuple]:
+		'''
+		Members of the space of the complement agreeing with the bound keys, as the values of the other keys.
+		The product of the domain is walked lazily, so only the members asked for are produced
+		'''
+		free = [n for n, key in enumerate(self._output_keys) if key not in bound]
+		if self._domain is not None:
+			if not all(self._domain.is_matched_by(value) for key, value in bound.items() if key in self._output_keys):
+				return iter(())
+			return product([atom for atom, in self._domain.members], repeat=len(free))
+		fixed = [(n, bound[key]) for n, key in enumerate(self._output_keys) if key in bound]
+		get_free = get_tuple_getter(free)
+		return (get_free(members) for members in self._registry.get_universe(self.arity) if all(members[n] == value for n, value in fixed))
+
+	def _get_outside_check(self, bound: dict) -> Callable[[tuple], bool]:
+		'''
+		Whether the member of the values of the free keys and the bound ones is outside the relation, its induced members included
+		'''
+		keys = tuple(key for key in self._output_keys if key not in bound)
+		make_projection, _ = compile_projection(self._output_keys, keys, frozenset(key for key in self._output_keys if key in bound))
+		project = make_projection(tuple(bound[key] for key in self._output_keys if key in bound))
+		return lambda row: self._is_outside(project(row))
+
+	def _get_delta(self, relation: Relation, delta: Delta) -> Iterable[tuple] | None:
+		return None
+
+	def _compute(self, bound: dict) -> Iterator[tuple]:
+		'''
+		The space is distinct, so the planned members are not deduplicated
+		'''
+		return self._reorder_params(self.get_plan(frozenset(bound)).execute(bound), bound)
+
+
+class Delta(Relation):
+	'''
+	Members just added to a relation, scanned in its place by the delta rules
+	'''
+	__slots__ = ()
+
+	def __init__(self, relation: Relation, added: Iterable[tuple]):
+		super().__init__(f'delta_of_{relation.name}', relation.arity, space=added, registry=relation.registry)
+
+	def _save_relation(self) -> None:
+		pass
 
 
 class IInduce(ABC):
-	def __init__(self, inducive_condition: Callable[[Any, Any, set[tuple]], bool], **kwargs):
-		super().__init__(**kwargs)
-		self.inducive_condition = inducive_condition
+	'''
+	The inducive condition is a static method shared by all the instances
+	'''
+	__slots__ = ()
+
+	@staticmethod
+	def inducive_condition(a: Any, b: Any, relation: Relation) -> bool:
+		return False
 
-	def induce(self, a, b, domain) -> bool:
-		return self.inducive_condition(a, b, domain)
+	def induce(self, a, b, relation: Relation) -> bool:
+		return self.inducive_condition(a, b, relation)
+
+	def induce_many(self, pairs: Sequence[tuple], relation: Relation) -> Sequence[bool]:
+		return to_mask((self.inducive_condition(a, b, relation) for a, b in pairs), len(pairs))
 
 
 class State(ABC):
+	__slots__ = ('_state', )
+
 	def __init__(self, state: bool, **kwargs):
 		super().__init__(**kwargs)
-		self.state: bool = state
+		self._state: bool = state
+
+	@property
+	def state(self) -> bool:
+		return self._state
 
 	def is_on(self) -> bool:
 		return self.state
@@ -229,124 +1171,324 @@ class State(ABC):
 
 
 class Property(State, ABC):
+	'''
+	Immutable, one instance per state is shared by all the relations, which keep only the flag of the property
+	'''
+	__slots__ = ()
+	flag: int = 0
+	_instances: tuple[Property, Property] = ()
+
 	def __init__(self, state: bool, **kwargs):
 		super().__init__(state=state, **kwargs)
 
+	def __init_subclass__(cls, **kwargs):
+		super().__init_subclass__(**kwargs)
+		cls._instances = (cls(False), cls(True))
+
+	@classmethod
+	def of(cls, state: bool) -> Property:
+		return cls._instances[bool(state)]
+
 
 class Reflexivity(Property, IInduce):
+	__slots__ = ()
+	flag = 1
+
 	def __init__(self, cond=False, **kwargs):
-		super().__init__(state=cond, inducive_condition=lambda a, b, d: a == b, **kwargs)
+		super().__init__(state=cond, **kwargs)
+
+	@staticmethod
+	def inducive_condition(a: Any, b: Any, relation: Relation) -> bool:
+		return a == b
+
+	def induce_many(self, pairs: Sequence[tuple], relation: Relation) -> Sequence[bool]:
+		return to_mask(map(op.eq, *zip(*pairs)), len(pairs))
 
 
 class Irreflexivity(Property):
+	__slots__ = ()
+	flag = 2
+
 	def __init__(self, cond=False, **kwargs):
 		super().__init__(state=cond, **kwargs)
 
 
 class Symmetry(Property, IInduce):
+	__slots__ = ()
+	flag = 4
+
 	def __init__(self, cond=False, **kwargs):
-		super().__init__(state=cond, inducive_condition=lambda a, b, d: (b, a) in d, **kwargs)
+		super().__init__(state=cond, **kwargs)
+
+	@staticmethod
+	def inducive_condition(a: Any, b: Any, relation: Relation) -> bool:
+		return (b, a) in relation.members
+
+	def induce_many(self, pairs: Sequence[tuple], relation: Relation) -> Sequence[bool]:
+		return relation._set.match_many([(b, a) for a, b in pairs])
 
 
 class Asymmetry(Property):
+	__slots__ = ()
+	flag = 8
+
 	def __init__(self, cond=False, **kwargs):
 		super().__init__(state=cond, **kwargs)
 
 
 class Transitivity(Property, IInduce):
+	__slots__ = ()
+	flag = 16
+
 	def __init__(self, cond=False, **kwargs):
-		super().__init__(state=cond, inducive_condition=self.transitivity_condition, **kwargs)
-
-	def transitivity_condition(self, a: Any, c: Any, domain: set[tuple]) -> bool:  # TODO: imlement yielding a similar tree in a relation
-		searched = set()
-		to_searches = set(map(lambda t: t[1], Relation.get_all_with_value_at_from(a, 0, domain)))
-		while to_searches:
-			all_further = set()
-			for to_search in to_searches:
-				further = set(map(lambda t: t[1], Relation.get_all_with_value_at_from(to_search, 0, domain))) & searched & to_searches
-				if c in further:
-					return True
-				all_further |= further
-			searched |= to_searches
-			to_searches = all_further[:]
-		return False
+		super().__init__(state=cond, **kwargs)
+
+	@staticmethod
+	def inducive_condition(a: Any, c: Any, relation: BinaryRelation) -> bool:
+		return (a, c) in relation.get_closure()
+
+	def induce_many(self, pairs: Sequence[tuple], relation: BinaryRelation) -> Sequence[bool]:
+		closure = relation.get_closure()
+		return to_mask(map(closure.__contains__, pairs), len(pairs))
+
+
+class IHaveProperties:
+	'''
+	Properties stored as the bits of an int _flags
+	'''
+	__slots__ = ()
 
+	def _get_property(self, property_type: type[Property]) -> Property:
+		return property_type.of(self._flags & property_type.flag)
+
+	def _set_property(self, property_type: type[Property], state: bool) -> None:
+		self._flags = self._flags | property_type.flag if state else self._flags & ~property_type.flag
+
+
+class ICanBeReflexive(IHaveProperties):
+	__slots__ = ()
 
-class ICanBeReflexive:
 	def __init__(self, is_reflexive: bool = False, **kwargs):
 		super().__init__(**kwargs)
-		self.reflexivity = Reflexivity(is_reflexive)
+		self._set_property(Reflexivity, is_reflexive)
+
+	@property
+	def reflexivity(self) -> Reflexivity:
+		return self._get_property(Reflexivity)
 
 
-class ICanBeIrreflexive:
+class ICanBeIrreflexive(IHaveProperties):
+	__slots__ = ()
+
 	def __init__(self, is_irreflexive=False, **kwargs):
 		super().__init__(**kwargs)
-		self.irreflexivity = Irreflexivity(is_irreflexive)
+		self._set_property(Irreflexivity, is_irreflexive)
+
+	@property
+	def irreflexivity(self) -> Irreflexivity:
+		return self._get_property(Irreflexivity)
 
 
-class ICanBeSymmetric:
+class ICanBeSymmetric(IHaveProperties):
+	__slots__ = ()
+
 	def __init__(self, is_symmetric=False, **kwargs):
 		super().__init__(**kwargs)
-		self.symmetry = Symmetry(is_symmetric)
+		self._set_property(Symmetry, is_symmetric)
+
+	@property
+	def symmetry(self) -> Symmetry:
+		return self._get_property(Symmetry)
 
 
-class ICanBeAsymmetric:
+class ICanBeAsymmetric(IHaveProperties):
+	__slots__ = ()
+
 	def __init__(self, is_asymmetric=False, **kwargs):
 		super().__init__(**kwargs)
-		self.asymmetry = Asymmetry(is_asymmetric)
+		self._set_property(Asymmetry, is_asymmetric)
+
+	@property
+	def asymmetry(self) -> Asymmetry:
+		return self._get_property(Asymmetry)
 
 
-class ICanBeTransitive:
+class ICanBeTransitive(IHaveProperties):
+	__slots__ = ()
+
 	def __init__(self, is_transitive=False, **kwargs):
 		super().__init__(**kwargs)
-		self.transitivity = Transitivity(is_transitive)
+		self._set_property(Transitivity, is_transitive)
+
+	@property
+	def transitivity(self) -> Transitivity:
+		return self._get_property(Transitivity)
 
 
 class ICanBeAll(ISet, ICanBeReflexive, ICanBeIrreflexive, ICanBeSymmetric, ICanBeAsymmetric, ICanBeTransitive):
+	__slots__ = ()
+
 	def __init__(self, **kwargs):
 		super().__init__(**kwargs)
 
 
 class Restrictions(ICanBeAll):
+	__slots__ = ()
+
 	def can_be_reflexive(self):
 		return self.irreflexivity.is_off()
 
 	def can_be_irreflexive(self):
-		return self.reflexivity.is_off()
+		return self.reflexivity.is_off() and not self._get_shape().loops
 
 	def can_be_symmetric(self):
 		return self.asymmetry.is_off()
 
 	def can_be_asymmetric(self):
-		return self.symmetry.is_off()
+		return self.symmetry.is_off() and not self._get_shape().reversed
 
 	def can_be_antisymmetric(self):
-		return not any(((b, a) in self._set for a, b in self._set))
+		shape = self._get_shape()
+		return shape.reversed == shape.loops
 
 
 class CanAll(ICanBeAll):
-	def can_add(self, a, b):
-		if self.irreflexivity.is_on():
-			return a != b
-		if self.asymmetry.is_on():
-			return (b, a) not in self._set
+	__slots__ = ()
+
+	def can_add(self, a, b) -> bool:
+		if a == b:
+			return self.irreflexivity.is_off() and self.asymmetry.is_off()
+		return self.asymmetry.is_off() or (b, a) not in self._set
+
+	def can_add_many(self, pairs: Sequence[tuple]) -> Sequence[bool]:
+		'''
+		Mask of the pairs that can be added; under asymmetry the reversed pairs are probed in bulk and the pairs reversing
+		each other within the batch are refused too
+		'''
+		loops_allowed = self.irreflexivity.is_off() and self.asymmetry.is_off()
+		if self.asymmetry.is_off():
+			return to_mask((a != b or loops_allowed for a, b in pairs), len(pairs))
+		reversed_pairs = [(b, a) for a, b in pairs]
+		stored = self._set.match_many(reversed_pairs)
+		batch = set(pairs)
+		allowed = (a != b and not is_stored and reversed_pair not in batch for (a, b), reversed_pair, is_stored in zip(pairs, reversed_pairs, stored))
+		return to_mask(allowed, len(pairs))
+
+
+class Shape(NamedTuple):
+	'''
+	Counts of the members of a binary relation: all of them, the loops (a, a) and the ones whose reverse is stored too, loops included
+	'''
+	count: int
+	loops: int
+	reversed: int
+
+
+no_shape = Shape(0, 0, 0)
 
 
 class BinaryRelation(Relation, Restrictions, CanAll):
-	def __init__(self, name: str = '', **kwargs):
+	__slots__ = ()
+	_inducive_property_types: tuple[type[Property], ...] = (Reflexivity, Symmetry, Transitivity)
+
+	def __init__(self, name: str = '', arity: int = 2, **kwargs):
+		self._shape: Shape | None = no_shape if kwargs.get('backend') is None else None
 		super().__init__(name=name, arity=2, **kwargs)
-		self._inducive_properties: list[IInduce] = [self.reflexivity, self.symmetry, self.transitivity]
 
-	def is_matched_by(self, a, b) -> bool:
-		result = super().is_matched_by(a, b)
-		if not result:
-			result = self._induce(a, b)
+	def _track_added(self, added: list[tuple] | None) -> None:
+		'''
+		Keeps the shape up to date: a new pair (a, b) has its reverse stored if (b, a) is, which then has it too unless it is new as well
+		'''
+		if added is None or self._shape is None:
+			self._shape = None
+			return
+		count, loops, reversed_count = self._shape
+		new = set(added)
+		for a, b in added:
+			if a == b:
+				loops += 1
+				reversed_count += 1
+			elif (b, a) in self._set:
+				reversed_count += 1 if (b, a) in new else 2
+		self._shape = Shape(count + len(added), loops, reversed_count)
+
+	def _get_shape(self) -> Shape:
+		'''
+		Maintained by add, counted again only after the members were replaced or when they are not stored at all
+		'''
+		if self._shape is not None:
+			return self._shape
+		members = self.members
+		shape = Shape(len(members), sum(1 for a, b in members if a == b), sum(1 for a, b in members if (b, a) in members))
+		if self._set is not no_members:
+			self._shape = shape
+		return shape
+
+	def is_symmetric(self) -> bool:
+		'''
+		Whether the relation is symmetric by its property or by the stored members, each of them having its reverse stored
+		'''
+		if self.symmetry.is_on():
+			return True
+		shape = self._get_shape()
+		return shape.reversed == shape.count
+
+	def is_transitive(self) -> bool:
+		'''
+		Whether the relation is transitive by its property or by the stored members: the successors of b are successors
+		of a for every member (a, b), looked up in the index of the first position until the first one that is not
+		'''
+		if self.transitivity.is_on():
+			return True
+		members = self.members
+		if self._set is no_members:
+			successors = {}
+			for member in members:
+				successors.setdefault(member[0], []).append(member)
+			get_successors = lambda b: successors.get(b, ())
+		else:
+			get_successors = lambda b: self._set.get_all_with_value_at(b, 0)
+		return all((a, c) in members for a, b in members for _, c in get_successors(b))
+
+	def _get_inducive_properties(self) -> Iterator[IInduce]:
+		return (property_type.of(True) for property_type in self._inducive_property_types if self._flags & property_type.flag)
+
+	def get_closure(self) -> TransitiveClosure:
+		'''
+		Transitive closure of the members, kept up to date by add
+		'''
+		if self._closure is None:
+			self._closure = TransitiveClosure(self.members)
+			self.subscribe(self._closure)
+		return self._closure
+
+	def is_matched_by(self, *elems: Any) -> bool:
+		elems = self._to_members(elems)
+		result = super().is_matched_by(*elems)
+		if not result and len(elems) == self.arity:
+			result = self._induce(*elems)
 		return result
 
+	def match_many(self, candidates: Sequence[Any]) -> Sequence[bool]:
+		'''
+		Stored members probed in bulk, then one pass per inducive property over the candidates still unmatched
+		'''
+		members_layers = self._to_members_many(candidates)
+		mask = self._set.match_many(members_layers)
+		for inducive_property in self._get_inducive_properties():
+			rest = [i for i, (is_matched, members) in enumerate(zip(mask, members_layers)) if not is_matched and len(members) == self.arity]
+			if not rest:
+				break
+			induced = inducive_property.induce_many([members_layers[i] for i in rest], self)
+			for i in compress(rest, induced):
+				mask[i] = True
+		return mask
+
+	def _has_inducive_properties(self) -> bool:
+		return any(self._flags & property_type.flag for property_type in self._inducive_property_types)
+
 	def _induce(self, a, b) -> bool:
-		present_properties = filter(Property.is_on, self._inducive_properties)
-		induction = map(lambda p: p.induce(a, b, self._set), present_properties)
-		return any(induction)
+		return any(inducive_property.induce(a, b, self) for inducive_property in self._get_inducive_properties())
 
 	def __mul__(self, relation):
 		return CompositionRelation(f'{self.name}_x_and_x_{relation.name}', relations=(self, relation))
@@ -356,34 +1498,281 @@ class BinaryRelation(Relation, Restrictions, CanAll):
 
 
 class CompositionRelation(DerivedRelation, BinaryRelation):
+	__slots__ = ()
 
 	def __init__(self, name, *, relations: Iterable[Relation], **kwargs):
-		super().__init__(name, relations=relations, params=((0, 1), (1, 2)), **kwargs)
+		super().__init__(name, relations=relations, params=((0, -1), (-1, 1)), **kwargs)
 
 	@classmethod
 	def _predicate(cls, relations: Iterable[Relation], layer: Iterable[tuple]) -> bool:
-		return all((relation(members) for relation, members in zip(relations, layer)))
+		return all((relation.is_matched_by(members) for relation, members in zip(relations, layer)))
+
+	def _compute(self, bound: dict) -> Iterator[tuple]:
+		if bound or self._pred is not None or not SparseBooleanMatrix.is_supported():
+			return super()._compute(bound)
+		return self._compute_with_matrix()
+
+	def _stream(self, bound: dict) -> Iterator[tuple]:
+		if self._materialized:
+			return self._evaluate(bound)
+		pushed = self._registry.push_down(self, bound)
+		return DerivedRelation._compute(self, bound) if pushed is None else pushed
+
+	def _derive_matrix(self, atoms: AtomTable) -> SparseBooleanMatrix:
+		left, right = self._relations
+		return left._get_matrix(atoms) @ right._get_matrix(atoms)
+
+	def _derive_sql(self, compiler: SqlCompiler) -> str | None:
+		return compiler.join(self)
 
 
 class ConverseRelation(DerivedRelation, BinaryRelation):
+	__slots__ = ()
+
 	def __init__(self, name, *, relation: Relation, **kwargs):
-		super().__init__(name, relations=(relation, ), params=(1, 0), **kwargs)
+		super().__init__(name, relations=(relation, ), params=((1, 0), ), **kwargs)
 
 	@classmethod
 	def _predicate(cls, relations: Iterable[Relation], layer: Iterable[tuple]) -> bool:
 		return next(iter(layer)) in next(iter(relations))
 
+	def _compute(self, bound: dict) -> Iterator[tuple]:
+		if bound or self._pred is not None or not SparseBooleanMatrix.is_supported() or not isinstance(self._relations[0], DerivedRelation):
+			return super()._compute(bound)
+		return self._compute_with_matrix()
+
+	def _stream(self, bound: dict) -> Iterator[tuple]:
+		if self._materialized:
+			return self._evaluate(bound)
+		pushed = self._registry.push_down(self, bound)
+		return DerivedRelation._compute(self, bound) if pushed is None else pushed
+
+	def _derive_matrix(self, atoms: AtomTable) -> SparseBooleanMatrix:
+		return self._relations[0]._get_matrix(atoms).T
+
+	def _derive_sql(self, compiler: SqlCompiler) -> str | None:
+		return compiler.join(self)
+
+
+class ActiveDomain(Relation):
+	'''
+	Unary relation of the atoms appearing in the observed relations, kept up to date by their adds
+	'''
+	__slots__ = ()
+
+	def __init__(self, name: str = 'active_domain', relations: Iterable[Relation] = (), **kwargs):
+		super().__init__(name, 1, **kwargs)
+		for relation in relations:
+			self.observe(relation)
+
+	def _save_relation(self) -> None:
+		pass
+
+	def observe(self, relation: Relation) -> None:
+		relation.subscribe(self)
+		self._on_added(relation, None)
+
+	def _on_added(self, relation: Relation, added: tuple[tuple, ...] | None) -> None:
+		members_layers = relation.members if added is None else added
+		self.add(*((atom, ) for members in members_layers for atom in members))
+
 
 class RelationStorage:
+	'''
+	Relations by name, the active domain of their atoms and a weakly referenced registry of all the stored relations
+	built with it, whose per arity universes are cached until one of them changes
+	'''
 	def __init__(self):
+		self._writer = WriteLock()
 		self._relations: dict = {}
+		self._registry: dict[int, list[weakref.ref]] = {}
+		self._universes: dict[int, frozenset] = {}
+		self._universe_version = 0
+		self._is_versioned = False
+		self._on_collected = self._forget
+		self._cache = ResultCache()
+		self._domain = ActiveDomain(registry=self)
 
 	@property
 	def relations(self) -> dict:
 		return self._relations
 
+	@property
+	def domain(self) -> ActiveDomain:
+		return self._domain
+
+	@property
+	def cache(self) -> ResultCache:
+		'''
+		Members of the derived relations evaluated on the relations of the storage, by structural key
+		'''
+		return self._cache
+
+	@property
+	def writer(self) -> WriteLock:
+		'''
+		Lock serializing the writes to the relations of the storage, including the maintenance of the derived ones
+		'''
+		return self._writer
+
+	@property
+	def is_versioned(self) -> bool:
+		'''
+		Whether the relations keep their members in copy-on-write versions, which they do from the first read on
+		'''
+		return self._is_versioned
+
+	def read(self) -> PinnedVersions:
+		'''
+		Pins the current versions of all the relations of the storage and of the materialized ones derived from them for
+		the reads of this thread within the with block, so a long evaluation sees a consistent state while writers go on.
+		Reading is opt-in: the reads outside such a block see the live members, which a write from another thread may change
+		under an evaluation. No lock is taken: the versions are collected again if a write happened meanwhile, except
+		in the thread that is writing, e.g. an observer, which pins its own state at once
+		'''
+		if not self._is_versioned:
+			self._make_versioned()
+		if self._writer.is_held():
+			return PinnedVersions(relation._set for relation in self._get_readable_relations())
+		while True:
+			epoch = self._writer.epoch
+			if epoch & 1:
+				time.sleep(0)
+				continue
+			pinned = PinnedVersions(relation._set for relation in self._get_readable_relations())
+			if self._writer.epoch == epoch:
+				return pinned
+
+	def _make_versioned(self) -> None:
+		'''
+		Moves the members of the relations in the default set storages into versioned ones, the relations built later get one
+		when registered. Until then a write costs no version
+		'''
+		with self._writer:
+			self._is_versioned = True
+			for relation in self._get_readable_relations():
+				self._make_relation_versioned(relation)
+
+	@classmethod
+	def _make_relation_versioned(cls, relation: Relation) -> None:
+		if type(relation._set) is SetStorage:
+			relation._set = VersionedStorage(relation._set)
+			relation._invalidate_members()
+
+	def _get_readable_relations(self) -> list[Relation]:
+		relations = {id(relation): relation for relation in chain(self._relations.values(), *map(self.get_registered, list(self._registry)), (self._domain, ))}
+		to_visit = list(relations.values())
+		while to_visit:
+			for ref in tuple(to_visit.pop()._observers or ()):
+				observer = ref()
+				if isinstance(observer, Relation) and id(observer) not in relations:
+					relations[id(observer)] = observer
+					to_visit.append(observer)
+		return list(relations.values())
+
+	def add_relation(self, relation: Relation) -> Relation:
+		self._relations[relation.name] = relation
+		if relation.registry is not self:
+			self.register(relation)
+		self._domain.observe(relation)
+		return relation
+
+	def register(self, relation: Relation) -> None:
+		'''
+		Weakly keeps the relation, the collected ones are dropped whenever the count of the arity reaches a power of two
+		'''
+		registered = self._registry.setdefault(relation.arity, [])
+		if registered and not len(registered) & (len(registered) - 1):
+			registered[:] = [ref for ref in registered if ref() is not None]
+		registered.append(weakref.ref(relation, self._on_collected))
+		if self._is_versioned:
+			self._make_relation_versioned(relation)
+		relation.subscribe(self)
+		self._universes.pop(relation.arity, None)
+		self._universe_version += 1
+
+	def _forget(self, ref: weakref.ref) -> None:
+		self._universes.clear()
+		self._universe_version += 1
+
+	@property
+	def universe_version(self) -> int:
+		'''
+		Counter of the changes of the universes, the relations registered, collected or added to
+		'''
+		return self._universe_version
+
+	def get_registered(self, arity: int) -> list[Relation]:
+		relations = (ref() for ref in self._registry.get(arity, ()))
+		return [relation for relation in relations if relation is not None]
+
+	def get_universe(self, arity: int) -> frozenset:
+		'''
+		Members of all the registered relations of the arity
+		'''
+		if arity not in self._universes:
+			self._universes[arity] = frozenset().union(*(relation.members for relation in self.get_registered(arity)))
+		return self._universes[arity]
+
+	def _on_added(self, relation: Relation, added: tuple[tuple, ...] | None) -> None:
+		self._universes.pop(relation.arity, None)
+		self._universe_version += 1
+
+	def load(self, name: str, source: Source, arity: int = None, **kwargs) -> Relation:
+		'''
+		Bulk loads the source into the stored relation of the name, created first if missing, with the arity of the first row unless given.
+		The keywords go to Relation.bulk_load
+		'''
+		if name not in self._relations:
+			if arity is None:
+				arity, source = peek_arity(read_rows(source, kwargs.pop('delimiter', None), kwargs.pop('skip_header', False)))
+			self.add_relation(Relation(name, arity, registry=self))
+		self._relations[name].bulk_load(source, **kwargs)
+		return self._relations[name]
+
+	def save(self, path: str | os.PathLike) -> None:
+		'''
+		Writes the stored relations, their property flags and the active domain to a binary snapshot
+		'''
+		relations = [relation for relation in self._relations.values() if not isinstance(relation, DerivedRelation)]
+		entries = [(type(relation).__name__, relation.name, relation.arity, relation._flags, relation.members) for relation in relations]
+		entries.append((ActiveDomain.__name__, self._domain.name, 1, 0, self._domain.members))
+		write_snapshot(path, entries)
+
+	@classmethod
+	def open(cls, path: str | os.PathLike) -> RelationStorage:
+		'''
+		Storage of the relations of a snapshot, their members stay in the memory-mapped file until read or modified
+		'''
+		storage = cls()
+		for entry in read_snapshot(path):
+			if entry.kind == ActiveDomain.__name__:
+				storage._domain._set = entry.storage
+				continue
+			relation_type = BinaryRelation if entry.arity == 2 and entry.kind != Relation.__name__ else Relation
+			relation = relation_type(entry.name, entry.arity, backend=entry.storage, registry=storage)
+			relation._flags = entry.flags
+			storage._relations[relation.name] = relation
+			relation.subscribe(storage._domain)
+		return storage
+
+	def push_down(self, relation: DerivedRelation, bound: dict) -> Iterator[tuple] | None:
+		'''
+		Members of the derived relation evaluated by the backend of the storage, None to evaluate them in Python
+		'''
+		return None
+
+	def get_complement(self, name: str) -> ComplementRelation:
+		'''
+		Complement of the relation bounded by the active domain of the storage
+		'''
+		return ComplementRelation(f'not_{name}', relation=self.get_relation(name), domain=self._domain)
+
 	def get_relation(self, name: str):
 		return self.relations[name]
 
 	def get_nary_relations(self, n: int) -> Iterable[Relation]:
 		return filter(lambda r: r.arity == n, self._relations.values())
+
+
+default_storage = RelationStorage()
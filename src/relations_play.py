@@ -1,4 +1,4 @@
-from relations import BinaryRelation, Relation, DerivedRelation
+from src.relations import BinaryRelation, Relation, DerivedRelation
 
 piotr = 'piotr'
 kita = 'kita'
@@ -0,0 +1,339 @@
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Any, Iterable, Iterator, NamedTuple
+
+from src.storage import AtomTable, ColumnarStorage, ColumnarSnapshot, PackedKeys, np, _missing
+
+_magic = b'ALGEREL\0'
+_version = 2
+_header = struct.Struct('<8sIIq')
+_relation_header = struct.Struct('<IIIIqq')
+
+_str, _int, _float, _bool, _none, _bytes, _tuple = range(7)
+_float_struct = struct.Struct('<d')
+_item_struct = struct.Struct('<bq')
+
+
+class SnapshotEntry(NamedTuple):
+	kind: str
+	name: str
+	arity: int
+	flags: int
+	storage: ColumnarStorage
+
+
+def _pad(size: int) -> int:
+	return -size % 8
+
+
+def _encode_atom(atom: Any) -> tuple[int, bytes]:
+	'''
+	Kind and bytes of a str, int, float, bool, None, bytes or a tuple of them; equal atoms of a kind have equal bytes
+	'''
+	atom_type = type(atom)
+	if atom_type is str:
+		return _str, atom.encode('utf-8')
+	if atom_type is int:
+		return _int, str(atom).encode('ascii')
+	if atom_type is float:
+		return _float, _float_struct.pack(atom or 0.0)
+	if atom_type is bool:
+		return _bool, bytes((atom, ))
+	if atom is None:
+		return _none, b''
+	if atom_type is bytes:
+		return _bytes, atom
+	if atom_type is tuple:
+		data = bytearray()
+		for item in atom:
+			kind, item_data = _encode_atom(item)
+			data += _item_struct.pack(kind, len(item_data)) + item_data
+		return _tuple, bytes(data)
+	raise TypeError(f'Cannot write the atom {atom!r}, a snapshot stores only str, int, float, bool, None, bytes and tuples of them')
+
+
+def _decode_atom(kind: int, data: bytes) -> Any:
+	if kind == _str:
+		return data.decode('utf-8')
+	if kind == _int:
+		return int(data)
+	if kind == _float:
+		return _float_struct.unpack(data)[0]
+	if kind == _bool:
+		return data == b'\x01'
+	if kind == _none:
+		return None
+	if kind == _bytes:
+		return data
+	if kind == _tuple:
+		items, offset = [], 0
+		while offset < len(data):
+			item_kind, size = _item_struct.unpack_from(data, offset)
+			offset += _item_struct.size
+			items.append(_decode_atom(item_kind, data[offset:offset + size]))
+			offset += size
+		return tuple(items)
+	raise ValueError(f'Unknown atom kind {kind}')
+
+
+def _get_encodings(atom: Any) -> Iterator[tuple[int, bytes]]:
+	'''
+	Encodings of the atoms equal to the atom, the numbers equal across int, float and bool share one atom id
+	'''
+	yield _encode_atom(atom)
+	if type(atom) in (int, float, bool):
+		for number_type in (int, float, bool):
+			try:
+				number = number_type(atom)
+			except (OverflowError, ValueError):
+				continue
+			if number_type is not type(atom) and number == atom:
+				yield _encode_atom(number)
+
+
+def write_snapshot(path: str | os.PathLike, relations: Iterable[tuple[str, str, int, int, Iterable[tuple]]]) -> None:
+	'''
+	Writes the (kind, name, arity, flags, members) of the relations, their atoms interned into one table.
+	The file is little-endian and 8-byte aligned:
+		header     magic, version, relation count, atom count
+		atoms      kinds (int8 per atom), offsets (int64, atom count + 1), the blob of the encoded atoms and the atom ids
+		           sorted by their kind and bytes
+		relations  per relation a header, the kind and name, the columns (int64 atom ids) and the sorted packed keys
+		           of the rows when they fit 63 bits
+	The rows are sorted, so the first column is sorted too
+	'''
+	atoms = AtomTable()
+	encoded = []
+	for kind, name, arity, flags, members_layers in relations:
+		intern = atoms.intern
+		rows = sorted({tuple(intern(member) for member in members) for members in members_layers})
+		columns = [array('q', column) for column in zip(*rows)] if rows else [array('q') for _ in range(arity)]
+		keys = array('q', map(ColumnarStorage.pack, rows)) if arity * ColumnarStorage.id_bits <= 63 else array('q')
+		encoded.append((kind, name, arity, flags, len(rows), columns, keys))
+
+	with open(path, 'wb') as file:
+		file.write(_header.pack(_magic, _version, len(encoded), len(atoms)))
+		kinds, offsets, blob = array('b'), array('q', [0]), bytearray()
+		encoded_atoms = [_encode_atom(atom) for atom in atoms.get_atoms()]
+		for kind, data in encoded_atoms:
+			kinds.append(kind)
+			blob += data
+			offsets.append(len(blob))
+		order = array('q', sorted(range(len(encoded_atoms)), key=encoded_atoms.__getitem__))
+		for data in (kinds.tobytes(), offsets.tobytes(), bytes(blob), order.tobytes()):
+			file.write(data + bytes(_pad(len(data))))
+		for kind, name, arity, flags, count, columns, keys in encoded:
+			names = kind.encode('utf-8') + name.encode('utf-8')
+			file.write(_relation_header.pack(len(kind.encode('utf-8')), len(names), arity, flags, count, len(keys)))
+			file.write(names + bytes(_pad(len(names))))
+			for column in columns:
+				file.write(column.tobytes())
+			file.write(keys.tobytes())
+
+
+def read_snapshot(path: str | os.PathLike) -> list[SnapshotEntry]:
+	'''
+	Maps the file read-only; the storages read their columns and keys from the mapped pages without copying them
+	'''
+	with open(path, 'rb') as file:
+		mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+	view = memoryview(mapped)
+	magic, version, relation_count, atom_count = _header.unpack_from(mapped, 0)
+	if magic != _magic or version != _version:
+		raise ValueError(f'{path} is not a relation snapshot of version {_version}')
+	offset = _header.size
+
+	def take(size: int) -> memoryview:
+		nonlocal offset
+		data = view[offset:offset + size]
+		offset += size + _pad(size)
+		return data
+
+	kinds = take(atom_count)
+	offsets = take(8 * (atom_count + 1)).cast('q')
+	blob = take(offsets[-1])
+	order = take(8 * atom_count).cast('q')
+	atoms = MappedAtomTable(kinds, offsets, blob, order)
+
+	entries = []
+	for _ in range(relation_count):
+		kind_size, names_size, arity, flags, count, key_count = _relation_header.unpack_from(mapped, offset)
+		offset += _relation_header.size
+		names = bytes(take(names_size))
+		columns = [take(8 * count).cast('q') for _ in range(arity)]
+		keys = take(8 * key_count).cast('q')
+		storage = MappedStorage(arity, atoms, columns, keys)
+		entries.append(SnapshotEntry(names[:kind_size].decode('utf-8'), names[kind_size:].decode('utf-8'), arity, flags, storage))
+	return entries
+
+
+class MappedAtomTable(AtomTable):
+	'''
+	Atom table decoding the atoms from the mapped blob one by one. An id is found by a binary search of the encoded atom
+	in the ids sorted by the encodings; the whole table is only decoded when it is listed or a new atom is interned
+	'''
+	__slots__ = ('_kinds', '_offsets', '_blob', '_order', '_decoded', '_is_loaded')
+
+	def __init__(self, kinds: memoryview, offsets: memoryview, blob: memoryview, order: memoryview):
+		super().__init__()
+		self._kinds = kinds
+		self._offsets = offsets
+		self._blob = blob
+		self._order = order
+		self._decoded: dict[int, Any] = {}
+		self._is_loaded = False
+
+	def _load(self) -> None:
+		if not self._is_loaded:
+			self._atoms = [self.get_atom(atom_id) for atom_id in range(len(self._kinds))]
+			self._ids = {atom: atom_id for atom_id, atom in enumerate(self._atoms)}
+			self._is_loaded = True
+
+	def _get_encoding(self, atom_id: int) -> tuple[int, bytes]:
+		return self._kinds[atom_id], bytes(self._blob[self._offsets[atom_id]:self._offsets[atom_id + 1]])
+
+	def _find(self, encoding: tuple[int, bytes]) -> int | None:
+		order, low, high = self._order, 0, len(self._order)
+		while low < high:
+			middle = (low + high) // 2
+			if self._get_encoding(order[middle]) < encoding:
+				low = middle + 1
+			else:
+				high = middle
+		if low < len(order) and self._get_encoding(order[low]) == encoding:
+			return order[low]
+		return None
+
+	def get_atom(self, atom_id: int) -> Any:
+		if self._is_loaded:
+			return self._atoms[atom_id]
+		atom = self._decoded.get(atom_id, _missing)
+		if atom is _missing:
+			atom = self._decoded[atom_id] = _decode_atom(*self._get_encoding(atom_id))
+		return atom
+
+	def intern(self, atom: Any) -> int:
+		self._load()
+		return super().intern(atom)
+
+	def get_id(self, atom: Any, default: int | None = None) -> int | None:
+		if self._is_loaded:
+			return super().get_id(atom, default)
+		try:
+			encodings = list(_get_encodings(atom))
+		except TypeError:
+			return default
+		for encoding in encodings:
+			atom_id = self._find(encoding)
+			if atom_id is not None:
+				return atom_id
+		return default
+
+	def get_ids(self, atoms: Iterable[Any]) -> list[int]:
+		return [self.get_id(atom, -1) for atom in atoms]
+
+	def get_atoms(self) -> list[Any]:
+		self._load()
+		return super().get_atoms()
+
+	def __len__(self) -> int:
+		return len(self._atoms) if self._is_loaded else len(self._kinds)
+
+	def __contains__(self, atom: Any) -> bool:
+		return self.get_id(atom) is not None
+
+
+def _find_rows(column: memoryview, atom_id: int) -> range:
+	'''
+	Rows of the id in a sorted column
+	'''
+	return range(bisect_left(column, atom_id), bisect_right(column, atom_id))
+
+
+def _has_row(columns: list[memoryview], ids: list[int]) -> bool:
+	'''
+	Whether the rows, sorted by their ids, have one of the ids: the rows of the first id are compared on the other columns
+	'''
+	if not columns:
+		return True
+	rest = list(zip(columns[1:], ids[1:]))
+	return any(all(column[row] == atom_id for column, atom_id in rest) for row in _find_rows(columns[0], ids[0]))
+
+
+class MappedStorage(ColumnarStorage):
+	'''
+	Columnar storage over the mapped columns of a snapshot. Membership is a binary search in the mapped sorted keys, or
+	in the sorted first column when the keys do not fit 63 bits, and the rows of a first column value are a range found
+	by bisection; the columns are copied, and the keys of the wide rows collected, on the first write
+	'''
+	__slots__ = ('_is_mapped', )
+
+	def __init__(self, arity: int, atoms: MappedAtomTable, columns: list[memoryview], keys: memoryview):
+		self._arity = arity
+		self._atoms = atoms
+		self._columns = columns
+		self._row_indexes = {}
+		self._is_mapped = True
+		self._keys = PackedKeys(use_array=arity * self.id_bits <= 63)
+		if self._keys.is_array():
+			self._keys._sorted = np.frombuffer(keys, dtype=np.int64)
+
+	def is_mapped(self) -> bool:
+		return self._is_mapped
+
+	def _thaw(self) -> None:
+		if self._is_mapped:
+			self._columns = [array('q', column.tobytes()) for column in self._columns]
+			if not self._keys.is_array():
+				self._keys._buffer = set(map(self.pack, zip(*self._columns)))
+			self._is_mapped = False
+
+	def __contains__(self, members) -> bool:
+		if not self._is_mapped or self._keys.is_array():
+			return super().__contains__(members)
+		if len(members) != self._arity:
+			return False
+		ids = self.encode(members)
+		return ids is not None and _has_row(self._columns, ids)
+
+	def get_snapshot(self) -> ColumnarSnapshot:
+		if self._is_mapped:
+			return MappedSnapshot(self, len(self))
+		return super().get_snapshot()
+
+	def update(self, members_layers: Iterable[tuple]) -> list[tuple]:
+		self._thaw()
+		return super().update(members_layers)
+
+	def clear(self) -> None:
+		self._is_mapped = False
+		super().clear()
+
+	def get_all_with_value_at(self, value: Any, n: int) -> Iterator[tuple]:
+		if n or not self._is_mapped:
+			return super().get_all_with_value_at(value, n)
+		atom_id = self._atoms.get_id(value)
+		if atom_id is None:
+			return iter(())
+		columns, get_atom = self._columns, self._atoms.get_atom
+		return (tuple(get_atom(column[row]) for column in columns) for row in _find_rows(columns[0], atom_id))
+
+
+class MappedSnapshot(ColumnarSnapshot):
+	'''
+	Snapshot of a mapped storage: its columns are all the rows sorted, which stay mapped after the storage is copied on
+	a write, so membership is a bisection in them
+	'''
+	__slots__ = ()
+
+	def __contains__(self, members) -> bool:
+		storage = self._storage
+		if len(members) != storage.arity or not self._count:
+			return False
+		ids = storage.encode(members)
+		return ids is not None and _has_row(self._columns, ids)
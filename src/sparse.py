@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+from array import array
+from typing import Iterable, Iterator, Hashable
+
+from src.storage import AtomTable, np
+
+
+class SparseBooleanMatrix:
+	'''
+	Square boolean matrix over interned atoms in CSR form: the columns of the true entries of row i are
+	indices[indptr[i]:indptr[i + 1]], sorted. The transpose is the CSC form of the same matrix
+	'''
+
+	def __init__(self, indptr, indices):
+		self._indptr = indptr
+		self._indices = indices
+
+	@classmethod
+	def is_supported(cls) -> bool:
+		return np is not None
+
+	@classmethod
+	def from_pairs(cls, rows, cols, size: int) -> SparseBooleanMatrix:
+		keys = np.unique(np.asarray(rows, dtype=np.int64) * size + np.asarray(cols, dtype=np.int64))
+		rows, cols = np.divmod(keys, size) if size else (keys, keys)
+		indptr = np.zeros(size + 1, dtype=np.int64)
+		np.cumsum(np.bincount(rows, minlength=size), out=indptr[1:])
+		return cls(indptr, cols)
+
+	@classmethod
+	def from_columns(cls, rows: array, cols: array, size: int) -> SparseBooleanMatrix:
+		'''
+		Matrix of the pairs stored as array('q') columns of atom ids, read without copying
+		'''
+		if not len(rows):
+			return cls.from_pairs((), (), size)
+		return cls.from_pairs(np.frombuffer(rows, dtype=np.int64), np.frombuffer(cols, dtype=np.int64), size)
+
+	@classmethod
+	def from_edges(cls, edges: Iterable[tuple[Hashable, Hashable]], atoms: AtomTable) -> SparseBooleanMatrix:
+		rows, cols = [], []
+		for a, b in edges:
+			rows.append(atoms.intern(a))
+			cols.append(atoms.intern(b))
+		return cls.from_pairs(rows, cols, len(atoms))
+
+	@property
+	def size(self) -> int:
+		return len(self._indptr) - 1
+
+	@property
+	def nnz(self) -> int:
+		return len(self._indices)
+
+	def resized(self, size: int) -> SparseBooleanMatrix:
+		'''
+		The same entries in a bigger matrix, for atoms interned after this one was built
+		'''
+		if size == self.size:
+			return self
+		return SparseBooleanMatrix(np.concatenate([self._indptr, np.full(size - self.size, self._indptr[-1])]), self._indices)
+
+	def to_pairs(self):
+		return np.repeat(np.arange(self.size, dtype=np.int64), np.diff(self._indptr)), self._indices
+
+	def decode(self, atoms: AtomTable) -> Iterator[tuple]:
+		atom_list = atoms.get_atoms()
+		rows, cols = self.to_pairs()
+		return ((atom_list[a], atom_list[b]) for a, b in zip(rows.tolist(), cols.tolist()))
+
+	def __len__(self) -> int:
+		return self.nnz
+
+	def __contains__(self, pair: tuple[int, int]) -> bool:
+		a, b = pair
+		if not 0 <= a < self.size:
+			return False
+		row = self._indices[self._indptr[a]:self._indptr[a + 1]]
+		i = row.searchsorted(b)
+		return i < len(row) and row[i] == b
+
+	def _align(self, other: SparseBooleanMatrix) -> tuple[SparseBooleanMatrix, SparseBooleanMatrix, int]:
+		size = max(self.size, other.size)
+		return self.resized(size), other.resized(size), size
+
+	@property
+	def T(self) -> SparseBooleanMatrix:
+		rows, cols = self.to_pairs()
+		return SparseBooleanMatrix.from_pairs(cols, rows, self.size)
+
+	def __or__(self, other: SparseBooleanMatrix) -> SparseBooleanMatrix:
+		left, right, size = self._align(other)
+		(left_rows, left_cols), (right_rows, right_cols) = left.to_pairs(), right.to_pairs()
+		return SparseBooleanMatrix.from_pairs(np.concatenate([left_rows, right_rows]), np.concatenate([left_cols, right_cols]), size)
+
+	def __and__(self, other: SparseBooleanMatrix) -> SparseBooleanMatrix:
+		left, right, size = self._align(other)
+		keys = np.intersect1d(left._get_keys(), right._get_keys(), assume_unique=True)
+		rows, cols = np.divmod(keys, size)
+		return SparseBooleanMatrix.from_pairs(rows, cols, size)
+
+	def __sub__(self, other: SparseBooleanMatrix) -> SparseBooleanMatrix:
+		left, right, size = self._align(other)
+		keys = np.setdiff1d(left._get_keys(), right._get_keys(), assume_unique=True)
+		rows, cols = np.divmod(keys, size)
+		return SparseBooleanMatrix.from_pairs(rows, cols, size)
+
+	def _get_keys(self):
+		rows, cols = self.to_pairs()
+		return rows * self.size + cols
+
+	def __matmul__(self, other: SparseBooleanMatrix) -> SparseBooleanMatrix:
+		'''
+		Boolean product: every entry (i, k) is expanded by the row k of the other matrix, duplicates are dropped
+		'''
+		left, right, size = self._align(other)
+		rows, middles = left.to_pairs()
+		counts = right._indptr[middles + 1] - right._indptr[middles]
+		starts = np.repeat(right._indptr[middles] - (np.cumsum(counts) - counts), counts)
+		cols = right._indices[starts + np.arange(starts.size, dtype=np.int64)]
+		return SparseBooleanMatrix.from_pairs(np.repeat(rows, counts), cols, size)
+
+	def closure(self) -> SparseBooleanMatrix:
+		'''
+		Transitive closure by repeated squaring, C <- C | C @ C, where each round only multiplies by the entries found in the previous one
+		'''
+		closure, delta = self, self
+		while delta.nnz:
+			delta = ((closure @ delta) | (delta @ closure)) - closure
+			closure = closure | delta
+		return closure
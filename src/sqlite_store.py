@@ -0,0 +1,307 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+from collections.abc import Set
+from itertools import count
+from typing import Any, Iterable, Iterator, Sequence
+
+from src.relations import Relation, BinaryRelation, DerivedRelation, RelationStorage
+from src.storage import Storage
+
+
+def quote(name: str) -> str:
+	return '"' + name.replace('"', '""') + '"'
+
+
+def _columns(arity: int, prefix: str = '') -> str:
+	return ', '.join(f'{prefix}c{n}' for n in range(arity))
+
+
+class SqliteStorage(Storage):
+	'''
+	Members as the rows of a table with a column per position, unique over all of them and indexed by every other one.
+	Rows are only appended by add, so a snapshot is the rows up to a rowid. The connection may be used from many threads,
+	every statement holds the lock shared by the storages of the connection and reads fetch all their rows under it
+	'''
+	__slots__ = ('_connection', '_table', '_arity', '_lock')
+
+	def __init__(self, connection: sqlite3.Connection, table: str, arity: int, lock: threading.RLock = None):
+		self._connection = connection
+		self._table = quote(table)
+		self._arity = arity
+		self._lock = lock if lock is not None else threading.RLock()
+		columns = _columns(arity)
+		with self._lock:
+			connection.execute(f'CREATE TABLE IF NOT EXISTS {self._table} ({columns}, UNIQUE ({columns}))')
+			for n in range(1, arity):
+				connection.execute(f'CREATE INDEX IF NOT EXISTS {quote(f"{table}_c{n}")} ON {self._table} (c{n})')
+
+	@property
+	def connection(self) -> sqlite3.Connection:
+		return self._connection
+
+	@property
+	def table(self) -> str:
+		return self._table
+
+	@property
+	def arity(self) -> int:
+		return self._arity
+
+	def fetch(self, query: str, args: Sequence[Any] = ()) -> list[tuple]:
+		with self._lock:
+			return self._connection.execute(query, args).fetchall()
+
+	def _where_all(self) -> str:
+		return ' AND '.join(f'c{n} IS ?' for n in range(self._arity))
+
+	def __contains__(self, members) -> bool:
+		if len(members) != self._arity:
+			return False
+		return bool(self.fetch(f'SELECT 1 FROM {self._table} WHERE {self._where_all()} LIMIT 1', tuple(members)))
+
+	def __iter__(self) -> Iterator[tuple]:
+		return iter(self.fetch(f'SELECT {_columns(self._arity)} FROM {self._table}'))
+
+	def __len__(self) -> int:
+		return self.fetch(f'SELECT COUNT(*) FROM {self._table}')[0][0]
+
+	def add(self, members: tuple) -> None:
+		self.update((members, ))
+
+	def update(self, members_layers: Iterable[tuple]) -> list[tuple]:
+		'''
+		Inserts in a single transaction, the rows ignored by the unique constraint are the ones already stored
+		'''
+		added = []
+		insert = f'INSERT OR IGNORE INTO {self._table} VALUES ({", ".join("?" * self._arity)})'
+		with self._lock, self._connection:
+			execute = self._connection.execute
+			for members in members_layers:
+				if len(members) != self._arity:
+					raise ValueError(f'Expected {self._arity} members, got {len(members)}')
+				if execute(insert, members).rowcount:
+					added.append(members)
+		return added
+
+	def discard(self, members: tuple) -> None:
+		with self._lock, self._connection:
+			self._connection.execute(f'DELETE FROM {self._table} WHERE {self._where_all()}', tuple(members))
+
+	def clear(self) -> None:
+		with self._lock, self._connection:
+			self._connection.execute(f'DELETE FROM {self._table}')
+
+	def get_snapshot(self) -> SqliteSnapshot:
+		last = self.fetch(f'SELECT MAX(rowid) FROM {self._table}')[0][0]
+		return SqliteSnapshot(self, last or 0)
+
+	def get_all_with_value_at(self, value: Any, n: int) -> Iterator[tuple]:
+		return iter(self.fetch(f'SELECT {_columns(self._arity)} FROM {self._table} WHERE c{n} = ?', (value, )))
+
+	def get_distinct_count(self, n: int) -> int:
+		return self.fetch(f'SELECT COUNT(DISTINCT c{n}) FROM {self._table}')[0][0]
+
+	def get_value_counts(self, n: int) -> dict[Any, int]:
+		return dict(self.fetch(f'SELECT c{n}, COUNT(*) FROM {self._table} GROUP BY c{n}'))
+
+
+class SqliteSnapshot(Set):
+	'''
+	The rows of a table up to a rowid, read from the table on demand
+	'''
+
+	def __init__(self, storage: SqliteStorage, last: int):
+		self._storage = storage
+		self._last = last
+
+	def __contains__(self, members) -> bool:
+		storage = self._storage
+		if len(members) != storage.arity:
+			return False
+		query = f'SELECT 1 FROM {storage.table} WHERE {storage._where_all()} AND rowid <= ? LIMIT 1'
+		return bool(storage.fetch(query, (*members, self._last)))
+
+	def __iter__(self) -> Iterator[tuple]:
+		storage = self._storage
+		return iter(storage.fetch(f'SELECT {_columns(storage.arity)} FROM {storage.table} WHERE rowid <= ?', (self._last, )))
+
+	def __len__(self) -> int:
+		storage = self._storage
+		return storage.fetch(f'SELECT COUNT(*) FROM {storage.table} WHERE rowid <= ?', (self._last, ))[0][0]
+
+	def __hash__(self) -> int:
+		return self._hash()
+
+	@classmethod
+	def _from_iterable(cls, it: Iterable[tuple]) -> frozenset:
+		return frozenset(it)
+
+
+class SqlCompiler:
+	'''
+	Compiles a relation stored in the connection, or derived from such ones, into a single query with the columns c0, c1, ...
+	Every relation compiles through its _derive_sql into a source of the FROM clause: a table, a subquery or a common table
+	expression. The relations that cannot be compiled, the ones with a custom predicate among them, give None
+	'''
+
+	def __init__(self, connection: sqlite3.Connection):
+		self._connection = connection
+		self._ctes: list[str] = []
+		self._args: list[Any] = []
+		self._fresh = count()
+
+	def compile(self, relation: Relation, bound: dict = None) -> tuple[str, list[Any]] | None:
+		'''
+		The query and its arguments, the bound correspondences of a derived relation become conditions
+		'''
+		self._ctes, self._args = [], []
+		source = self._get_source(relation)
+		if source is None:
+			return None
+		query = f'SELECT {_columns(relation.arity)} FROM {source} AS r'
+		fixed = [(n, bound[key]) for n, key in enumerate(relation.positions) if key in (bound or {})]
+		if fixed:
+			query += f' WHERE {" AND ".join(f"r.c{n} = ?" for n, _ in fixed)}'
+			self._args.extend(value for _, value in fixed)
+		with_clause = f'WITH RECURSIVE {", ".join(self._ctes)} ' if self._ctes else ''
+		return with_clause + query, self._args
+
+	def table(self, relation: Relation) -> str | None:
+		'''
+		The table of a relation stored in the connection; a transitive binary relation stands for its closure,
+		as its is_matched_by does, computed by a recursive common table expression
+		'''
+		storage = relation._set
+		if not isinstance(storage, SqliteStorage) or storage.connection is not self._connection:
+			return None
+		if isinstance(relation, BinaryRelation) and relation.transitivity.is_on():
+			return self._closure(storage.table)
+		return storage.table
+
+	def _closure(self, table: str) -> str:
+		name = f'closure_{next(self._fresh)}'
+		self._ctes.append(f'{name} (c0, c1) AS (SELECT c0, c1 FROM {table} UNION SELECT {name}.c0, edge.c1 FROM {name} JOIN {table} AS edge ON {name}.c1 = edge.c0)')
+		return name
+
+	def join(self, relation: DerivedRelation) -> str | None:
+		'''
+		The relations joined on their shared correspondences, the constants as conditions
+		'''
+		query = self._select(relation, relation._relations, relation._params)
+		return query and f'({query})'
+
+	def _get_source(self, relation: Relation) -> str | None:
+		if getattr(relation, '_pred', None) is not None:
+			return None
+		return relation._derive_sql(self)
+
+	def union(self, relation: DerivedRelation) -> str | None:
+		branches = [self._select(relation, (child, ), (params, )) for child, params in zip(relation._relations, relation._params)]
+		if None in branches:
+			return None
+		return f'({" UNION ".join(branches)})'
+
+	def _select(self, relation: DerivedRelation, children: Sequence[Relation], params_list: Sequence[tuple]) -> str | None:
+		'''
+		The arguments are collected in the order of their placeholders: each source's own, then the ones of its ON clause
+		and the ones of the WHERE clause at the end
+		'''
+		points: dict[int, str] = {}
+		joins, conditions, args = [], [], []
+		for i, (child, params) in enumerate(zip(children, params_list)):
+			source = self._get_source(child)
+			if source is None:
+				return None
+			on, on_args = [], []
+			for n, param in enumerate(params):
+				column = f't{i}.c{n}'
+				if relation._is_correspondence(param):
+					if param in points:
+						on.append(f'{points[param]} = {column}')
+					else:
+						points[param] = column
+				elif param != '*':
+					on.append(f'{column} = ?')
+					on_args.append(param)
+			if i:
+				joins.append(f'JOIN {source} AS t{i} ON {" AND ".join(on) or "1"}')
+				self._args.extend(on_args)
+			else:
+				joins.append(f'{source} AS t0')
+				conditions.extend(on)
+				args.extend(on_args)
+		if any(key not in points for key in relation.positions):
+			return None
+		outputs = ', '.join(f'{points[key]} AS c{n}' for n, key in enumerate(relation.positions))
+		where = f' WHERE {" AND ".join(conditions)}' if conditions else ''
+		self._args.extend(args)
+		return f'SELECT DISTINCT {outputs} FROM {" ".join(joins)}{where}'
+
+
+class SqliteRelationStorage(RelationStorage):
+	'''
+	Relation storage keeping every stored relation as a table of a SQLite file; the derived relations of them are evaluated
+	by single queries compiled with SqlCompiler. The kinds, arities and property flags are kept in a table too,
+	so the relations are there again when the file is reopened. The connection is shared by the threads of an executor,
+	serialised by a lock
+	'''
+	_catalog = '_relations'
+
+	def __init__(self, path: str | os.PathLike = ':memory:'):
+		super().__init__()
+		self._connection = sqlite3.connect(path, check_same_thread=False)
+		self._lock = threading.RLock()
+		self._connection.execute(f'CREATE TABLE IF NOT EXISTS {self._catalog} (name TEXT PRIMARY KEY, kind TEXT, arity INTEGER, flags INTEGER)')
+		self._domain._set = self._create_storage(f'{self._catalog}_domain', 1)
+		for name, kind, arity, flags in self._connection.execute(f'SELECT name, kind, arity, flags FROM {self._catalog}').fetchall():
+			relation_type = BinaryRelation if arity == 2 and kind != Relation.__name__ else Relation
+			relation = relation_type(name, arity, backend=self._create_storage(name, arity), registry=self)
+			relation._flags = flags
+			self._relations[name] = relation
+			relation.subscribe(self._domain)
+
+	@property
+	def connection(self) -> sqlite3.Connection:
+		return self._connection
+
+	def _create_storage(self, table: str, arity: int) -> SqliteStorage:
+		return SqliteStorage(self._connection, table, arity, self._lock)
+
+	def add_relation(self, relation: Relation) -> Relation:
+		'''
+		Moves the members of a stored relation into its table; the relation then belongs to this storage, so that
+		the relations derived from it are pushed down here
+		'''
+		if not isinstance(relation, DerivedRelation) and not isinstance(relation._set, SqliteStorage):
+			members_layers = relation._set
+			relation._set = self._create_storage(relation.name, relation.arity)
+			relation._set.update(members_layers)
+			relation._invalidate_members()
+			with self._lock, self._connection:
+				self._connection.execute(f'INSERT OR REPLACE INTO {self._catalog} VALUES (?, ?, ?, ?)', (relation.name, type(relation).__name__, relation.arity, relation._flags))
+			if relation.registry is not self:
+				relation._registry = self
+				self.register(relation)
+		return super().add_relation(relation)
+
+	def compile(self, relation: Relation, bound: dict = None) -> tuple[str, list[Any]] | None:
+		return SqlCompiler(self._connection).compile(relation, bound)
+
+	def push_down(self, relation: DerivedRelation, bound: dict) -> Iterator[tuple] | None:
+		compiled = self.compile(relation, bound)
+		if compiled is None:
+			return None
+		query, args = compiled
+		with self._lock:
+			return iter(self._connection.execute(query, args).fetchall())
+
+	def explain(self, relation: Relation) -> list[str]:
+		'''
+		SQLite's plan of the compiled query
+		'''
+		query, args = self.compile(relation)
+		with self._lock:
+			return [row[-1] for row in self._connection.execute(f'EXPLAIN QUERY PLAN {query}', args)]
@@ -0,0 +1,734 @@
+from __future__ import annotations
+
+import threading
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from collections.abc import MutableSet, Set
+from itertools import chain
+from typing import Any, Iterable, Iterator, Sequence
+
+try:
+	import numpy as np
+except ImportError:  # pragma: no cover
+	np = None
+
+_missing = object()
+
+def to_mask(values: Iterable[bool], count: int) -> Sequence[bool]:
+	'''
+	Boolean NumPy array of the values when NumPy is available, a list otherwise
+	'''
+	if np is None:
+		return list(values)
+	return np.fromiter(values, dtype=bool, count=count)
+
+
+class Storage(MutableSet, ABC):
+	'''
+	Members of a relation as a set of tuples. A persistent storage returns its immutable current version as the snapshot
+	'''
+	__slots__ = ()
+	persistent = False
+
+	@abstractmethod
+	def get_snapshot(self) -> Set:
+		'''
+		Read-only view of the current members, not affected by later additions
+		'''
+		raise NotImplementedError
+
+	@abstractmethod
+	def get_all_with_value_at(self, value: Any, n: int) -> Iterator[tuple]:
+		raise NotImplementedError
+
+	@abstractmethod
+	def get_distinct_count(self, n: int) -> int:
+		raise NotImplementedError
+
+	def get_value_counts(self, n: int) -> dict[Any, int]:
+		'''
+		Count of the members per value at the position
+		'''
+		return dict(Counter(members[n] for members in self))
+
+	def update(self, members_layers: Iterable[tuple]) -> list[tuple]:
+		'''
+		Adds the members and returns the ones that were not stored yet
+		'''
+		added = []
+		for members in members_layers:
+			if members not in self:
+				self.add(members)
+				added.append(members)
+		return added
+
+	def reset(self, members_layers: Iterable[tuple]) -> None:
+		'''
+		Replaces all the members
+		'''
+		self.clear()
+		self.update(members_layers)
+
+	def load(self, chunks: Iterable[list[tuple]]) -> list[tuple]:
+		'''
+		Adds the chunks of members in bulk and returns the ones that were not stored yet
+		'''
+		added = []
+		for chunk in chunks:
+			added.extend(self.update(chunk))
+		return added
+
+	def match_many(self, members_layers: Sequence[tuple]) -> Sequence[bool]:
+		'''
+		Mask of the members being stored
+		'''
+		return to_mask(map(self.__contains__, members_layers), len(members_layers))
+
+
+class SetStorage(Storage):
+	'''
+	Python set of tuples with hash indexes of the positions (value -> members), built on first use and kept up to date
+	'''
+	__slots__ = ('_members', '_indexes')
+
+	def __init__(self, members_layers: Iterable[tuple] = ()):
+		self._members: set[tuple] = set(members_layers)
+		self._indexes: dict[int, dict[Any, set[tuple]]] | None = None
+
+	def __contains__(self, members) -> bool:
+		return members in self._members
+
+	def __iter__(self) -> Iterator[tuple]:
+		return iter(self._members)
+
+	def __len__(self) -> int:
+		return len(self._members)
+
+	def match_many(self, members_layers: Sequence[tuple]) -> Sequence[bool]:
+		return to_mask(map(self._members.__contains__, members_layers), len(members_layers))
+
+	def add(self, members: tuple) -> None:
+		if members in self._members:
+			return
+		self._members.add(members)
+		if self._indexes:
+			for n, index in self._indexes.items():
+				index.setdefault(members[n], set()).add(members)
+
+	def load(self, chunks: Iterable[list[tuple]]) -> list[tuple]:
+		'''
+		Deduplicates every chunk with set operations; the indexes are dropped meanwhile and rebuilt in one pass at the end
+		'''
+		indexed, self._indexes = tuple(self._indexes or ()), None
+		added = []
+		for chunk in chunks:
+			new = set(chunk)
+			new -= self._members
+			self._members |= new
+			added.extend(new)
+		for n in indexed:
+			self._get_index(n)
+		return added
+
+	def discard(self, members: tuple) -> None:
+		if members not in self._members:
+			return
+		self._members.discard(members)
+		if self._indexes:
+			for n, index in self._indexes.items():
+				index[members[n]].discard(members)
+				if not index[members[n]]:
+					del index[members[n]]
+
+	def clear(self) -> None:
+		self._members = set()
+		self._indexes = None
+
+	def get_snapshot(self) -> frozenset:
+		return frozenset(self._members)
+
+	def get_all_with_value_at(self, value: Any, n: int) -> Iterator[tuple]:
+		return iter(tuple(self._get_index(n).get(value, ())))
+
+	def get_distinct_count(self, n: int) -> int:
+		if self._indexes and n in self._indexes:
+			return len(self._indexes[n])
+		return len({members[n] for members in self._members})
+
+	def get_value_counts(self, n: int) -> dict[Any, int]:
+		return {value: len(members) for value, members in self._get_index(n).items()}
+
+	def _get_index(self, n: int) -> dict[Any, set[tuple]]:
+		if self._indexes is None:
+			self._indexes = {}
+		if n not in self._indexes:
+			index = {}
+			for members in self._members:
+				index.setdefault(members[n], set()).add(members)
+			self._indexes[n] = index
+		return self._indexes[n]
+
+
+class EmptyStorage(Storage):
+	'''
+	Read-only storage without members, shared by the relations that do not store any
+	'''
+	__slots__ = ()
+
+	def __contains__(self, members) -> bool:
+		return False
+
+	def __iter__(self) -> Iterator[tuple]:
+		return iter(())
+
+	def __len__(self) -> int:
+		return 0
+
+	def add(self, members: tuple) -> None:
+		raise TypeError('Cannot add to a relation that does not store its members')
+
+	def discard(self, members: tuple) -> None:
+		pass
+
+	def get_snapshot(self) -> frozenset:
+		return frozenset()
+
+	def get_all_with_value_at(self, value: Any, n: int) -> Iterator[tuple]:
+		return iter(())
+
+	def get_distinct_count(self, n: int) -> int:
+		return 0
+
+	def get_value_counts(self, n: int) -> dict[Any, int]:
+		return {}
+
+
+no_members = EmptyStorage()
+
+
+class WriteLock:
+	'''
+	Reentrant lock of the writers with an epoch that is odd while a write is in progress, so readers can check that
+	nothing was written while they were pinning versions. The thread holding it is recorded
+	'''
+	__slots__ = ('_lock', '_depth', '_owner', 'epoch')
+
+	def __init__(self):
+		self._lock = threading.RLock()
+		self._depth = 0
+		self._owner: int | None = None
+		self.epoch = 0
+
+	def __enter__(self) -> WriteLock:
+		self._lock.acquire()
+		self._depth += 1
+		if self._depth == 1:
+			self._owner = threading.get_ident()
+			self.epoch += 1
+		return self
+
+	def __exit__(self, *exc_info) -> None:
+		self._depth -= 1
+		if not self._depth:
+			self.epoch += 1
+			self._owner = None
+		self._lock.release()
+
+	def is_held(self) -> bool:
+		'''
+		Whether the current thread is writing
+		'''
+		return self._owner == threading.get_ident()
+
+
+_pins = threading.local()
+
+
+class PinnedVersions:
+	'''
+	Makes the versioned storages read the given versions in the current thread; nested pins keep the outer versions
+	'''
+	__slots__ = ('_versions', '_previous')
+
+	def __init__(self, storages: Iterable[Storage]):
+		self._versions = {id(storage): (storage, storage.get_snapshot()) for storage in storages if isinstance(storage, VersionedStorage)}
+		self._previous = None
+
+	def __enter__(self) -> PinnedVersions:
+		self._previous = getattr(_pins, 'versions', None)
+		_pins.versions = {**self._versions, **(self._previous or {})}
+		return self
+
+	def __exit__(self, *exc_info) -> None:
+		_pins.versions = self._previous
+
+
+def is_pinned() -> bool:
+	'''
+	Whether the current thread reads pinned versions
+	'''
+	return bool(getattr(_pins, 'versions', None))
+
+
+class _Layer:
+	__slots__ = ('members', 'indexes')
+
+	def __init__(self, members: frozenset):
+		self.members = members
+		self.indexes: dict[int, dict[Any, list[tuple]]] = {}
+
+	def get_index(self, n: int) -> dict[Any, list[tuple]]:
+		'''
+		Built on first use and published only when complete, readers racing to build it just do it twice
+		'''
+		index = self.indexes.get(n)
+		if index is None:
+			index = {}
+			for members in self.members:
+				index.setdefault(members[n], []).append(members)
+			self.indexes[n] = index
+		return index
+
+
+class StorageVersion(Set):
+	'''
+	Immutable members as disjoint frozen layers, each with its own indexes. A new version shares the layers of the previous one
+	and merges the last ones while they are not geometrically decreasing, so there are O(log n) of them
+	'''
+	__slots__ = ('_layers', '_count')
+
+	def __init__(self, layers: tuple[_Layer, ...] = ()):
+		self._layers = layers
+		self._count = sum(len(layer.members) for layer in layers)
+
+	def __contains__(self, members) -> bool:
+		for layer in self._layers:
+			if members in layer.members:
+				return True
+		return False
+
+	def __iter__(self) -> Iterator[tuple]:
+		return chain.from_iterable(layer.members for layer in self._layers)
+
+	def __len__(self) -> int:
+		return self._count
+
+	def __hash__(self) -> int:
+		return self._hash()
+
+	@classmethod
+	def _from_iterable(cls, it: Iterable[tuple]) -> frozenset:
+		return frozenset(it)
+
+	def with_members(self, members: frozenset) -> StorageVersion:
+		layers = [*self._layers, _Layer(members)]
+		while len(layers) > 1 and len(layers[-2].members) <= 2 * len(layers[-1].members):
+			last = layers.pop()
+			layers[-1] = _Layer(layers[-1].members | last.members)
+		return StorageVersion(tuple(layers))
+
+	def without(self, members: tuple) -> StorageVersion:
+		return StorageVersion(tuple(layer if members not in layer.members else _Layer(layer.members - {members}) for layer in self._layers))
+
+	def get_all_with_value_at(self, value: Any, n: int) -> Iterator[tuple]:
+		if len(self._layers) == 1:
+			return iter(self._layers[0].get_index(n).get(value, ()))
+		return chain.from_iterable(layer.get_index(n).get(value, ()) for layer in self._layers)
+
+	def get_distinct_count(self, n: int) -> int:
+		if len(self._layers) == 1:
+			return len(self._layers[0].get_index(n))
+		return len(set().union(*(layer.get_index(n) for layer in self._layers)))
+
+	def get_value_counts(self, n: int) -> dict[Any, int]:
+		'''
+		The layers are disjoint, so the counts of a value in them add up
+		'''
+		counts = Counter()
+		for layer in self._layers:
+			counts.update({value: len(members) for value, members in layer.get_index(n).items()})
+		return dict(counts)
+
+
+class VersionedStorage(Storage):
+	'''
+	Copy-on-write storage: every write publishes a new immutable version with a single assignment, so readers never see
+	a change in the middle of their iteration and need no lock. Writers have to be serialized, Relation does it with the
+	write lock of its registry. A thread can pin the versions it reads with PinnedVersions
+	'''
+	__slots__ = ('_version', )
+	persistent = True
+
+	def __init__(self, members_layers: Iterable[tuple] = ()):
+		self._version = StorageVersion()
+		self.update(members_layers)
+
+	def _current(self) -> StorageVersion:
+		pinned = getattr(_pins, 'versions', None)
+		if pinned:
+			entry = pinned.get(id(self))
+			if entry is not None:
+				return entry[1]
+		return self._version
+
+	def __contains__(self, members) -> bool:
+		return members in self._current()
+
+	def __iter__(self) -> Iterator[tuple]:
+		return iter(self._current())
+
+	def __len__(self) -> int:
+		return len(self._current())
+
+	def match_many(self, members_layers: Sequence[tuple]) -> Sequence[bool]:
+		return to_mask(map(self._current().__contains__, members_layers), len(members_layers))
+
+	def add(self, members: tuple) -> None:
+		self.update((members, ))
+
+	def update(self, members_layers: Iterable[tuple]) -> list[tuple]:
+		version = self._version
+		new = {members for members in members_layers if members not in version}
+		if new:
+			self._version = version.with_members(frozenset(new))
+		return list(new)
+
+	def load(self, chunks: Iterable[list[tuple]]) -> list[tuple]:
+		'''
+		Published as a single version with one new layer, whose indexes are built on first use
+		'''
+		version = self._version
+		new = set()
+		for chunk in chunks:
+			chunk = set(chunk)
+			chunk -= new
+			new.update(members for members in chunk if members not in version)
+		if new:
+			self._version = version.with_members(frozenset(new))
+		return list(new)
+
+	def discard(self, members: tuple) -> None:
+		if members in self._version:
+			self._version = self._version.without(members)
+
+	def clear(self) -> None:
+		self._version = StorageVersion()
+
+	def reset(self, members_layers: Iterable[tuple]) -> None:
+		'''
+		Publishes the new members as a single version
+		'''
+		self._version = StorageVersion().with_members(frozenset(members_layers))
+
+	def get_snapshot(self) -> StorageVersion:
+		return self._current()
+
+	def get_all_with_value_at(self, value: Any, n: int) -> Iterator[tuple]:
+		return self._current().get_all_with_value_at(value, n)
+
+	def get_distinct_count(self, n: int) -> int:
+		return self._current().get_distinct_count(n)
+
+	def get_value_counts(self, n: int) -> dict[Any, int]:
+		return self._current().get_value_counts(n)
+
+
+class AtomTable:
+	'''
+	Dictionary encoding of atoms, value <-> int id, meant to be shared by many relations
+	'''
+	__slots__ = ('_ids', '_atoms')
+
+	def __init__(self):
+		self._ids: dict[Any, int] = {}
+		self._atoms: list[Any] = []
+
+	def intern(self, atom: Any) -> int:
+		atom_id = self._ids.get(atom)
+		if atom_id is None:
+			atom_id = self._ids[atom] = len(self._atoms)
+			self._atoms.append(atom)
+		return atom_id
+
+	def get_id(self, atom: Any, default: int | None = None) -> int | None:
+		return self._ids.get(atom, default)
+
+	def get_ids(self, atoms: Iterable[Any]) -> list[int]:
+		'''
+		Ids of the atoms, -1 for the ones never interned
+		'''
+		get_id = self._ids.get
+		return [get_id(atom, -1) for atom in atoms]
+
+	def get_atom(self, atom_id: int) -> Any:
+		return self._atoms[atom_id]
+
+	def get_atoms(self) -> list[Any]:
+		return self._atoms
+
+	def __len__(self) -> int:
+		return len(self._atoms)
+
+	def __contains__(self, atom: Any) -> bool:
+		return atom in self._ids
+
+
+default_atoms = AtomTable()
+
+
+class PackedKeys:
+	'''
+	Set of non-negative int keys. With NumPy and keys fitting 63 bits it is a sorted int64 array plus a small unsorted
+	buffer merged into it once it outgrows min_buffer_size and an eighth of the array, a Python set otherwise
+	'''
+	__slots__ = ('_sorted', '_buffer', '_min_buffer_size')
+
+	def __init__(self, use_array: bool, min_buffer_size: int = 4096):
+		self._sorted = np.empty(0, dtype=np.int64) if use_array and np is not None else None
+		self._buffer: set[int] = set()
+		self._min_buffer_size = min_buffer_size
+
+	def __contains__(self, key: int) -> bool:
+		if key in self._buffer:
+			return True
+		if self._sorted is None or not len(self._sorted):
+			return False
+		i = self._sorted.searchsorted(key)
+		return i < len(self._sorted) and self._sorted[i] == key
+
+	def add(self, key: int) -> None:
+		self._buffer.add(key)
+		if self._sorted is not None and len(self._buffer) > max(self._min_buffer_size, len(self._sorted) >> 3):
+			self._merge()
+
+	def __len__(self) -> int:
+		return len(self._buffer) + (0 if self._sorted is None else len(self._sorted))
+
+	def is_array(self) -> bool:
+		return self._sorted is not None
+
+	def _merge(self) -> None:
+		buffer = np.fromiter(self._buffer, dtype=np.int64, count=len(self._buffer))
+		self._sorted = np.union1d(self._sorted, buffer)
+		self._buffer = set()
+
+	def to_array(self):
+		'''
+		All the keys as a sorted NumPy array
+		'''
+		if self._sorted is None:
+			return np.array(sorted(self._buffer), dtype=object if any(key >> 63 for key in self._buffer) else np.int64)
+		if self._buffer:
+			self._merge()
+		return self._sorted
+
+
+class ColumnarStorage(Storage):
+	'''
+	Members as columns of atom ids (array('q')) and a set of the rows' ids packed into single ints.
+	Positional lookups go through lazily built per-column indexes of row numbers
+	'''
+	__slots__ = ('_arity', '_atoms', '_columns', '_keys', '_row_indexes')
+	id_bits = 31
+
+	def __init__(self, arity: int, atoms: AtomTable = None, members_layers: Iterable[tuple] = ()):
+		self._arity = arity
+		self._atoms = atoms if atoms is not None else default_atoms
+		self._columns: list[array] = []
+		self._keys: PackedKeys | None = None
+		self._row_indexes: dict[int, dict[int, array]] = {}
+		self.clear()
+		self.update(members_layers)
+
+	@property
+	def atoms(self) -> AtomTable:
+		return self._atoms
+
+	@property
+	def arity(self) -> int:
+		return self._arity
+
+	def get_column(self, n: int) -> array:
+		return self._columns[n]
+
+	def get_keys(self) -> PackedKeys:
+		return self._keys
+
+	@classmethod
+	def pack(cls, ids: Iterable[int]) -> int:
+		key = 0
+		for atom_id in ids:
+			key = key << cls.id_bits | atom_id
+		return key
+
+	def encode(self, members: tuple) -> list[int] | None:
+		'''
+		Ids of the members, None if some of them were never interned
+		'''
+		ids = [self._atoms.get_id(member) for member in members]
+		return None if None in ids else ids
+
+	def __contains__(self, members) -> bool:
+		if len(members) != self._arity:
+			return False
+		ids = self.encode(members)
+		return ids is not None and self.pack(ids) in self._keys
+
+	def __iter__(self) -> Iterator[tuple]:
+		return self._iter_rows(self._columns, len(self))
+
+	def match_many(self, members_layers: Sequence[tuple]) -> Sequence[bool]:
+		'''
+		Encodes the members and looks all the packed keys up at once with NumPy's isin
+		'''
+		if not self._keys.is_array():
+			return super().match_many(members_layers)
+		missing = (_missing, ) * self._arity
+		members_layers = [members if len(members) == self._arity else missing for members in members_layers]
+		keys = np.zeros(len(members_layers), dtype=np.int64)
+		known = np.ones(len(members_layers), dtype=bool)
+		for members_column in zip(*members_layers):
+			ids = np.array(self._atoms.get_ids(members_column), dtype=np.int64)
+			known &= ids >= 0
+			keys = keys << self.id_bits | ids
+		return known & np.isin(keys, self._keys.to_array())
+
+	def _iter_rows(self, columns: list[array], count: int) -> Iterator[tuple]:
+		get_atom = self._atoms.get_atom
+		for row in range(count):
+			yield tuple(get_atom(column[row]) for column in columns)
+
+	def __len__(self) -> int:
+		return len(self._columns[0]) if self._columns else len(self._keys)
+
+	def add(self, members: tuple) -> None:
+		self.update((members, ))
+
+	def update(self, members_layers: Iterable[tuple]) -> list[tuple]:
+		added = []
+		intern, pack, keys = self._atoms.intern, self.pack, self._keys
+		for members in members_layers:
+			if len(members) != self._arity:
+				raise ValueError(f'Expected {self._arity} members, got {len(members)}')
+			ids = [intern(member) for member in members]
+			key = pack(ids)
+			if key in keys:
+				continue
+			keys.add(key)
+			row = len(self)
+			for n, (column, atom_id) in enumerate(zip(self._columns, ids)):
+				column.append(atom_id)
+				if n in self._row_indexes:
+					self._row_indexes[n].setdefault(atom_id, array('q')).append(row)
+			added.append(members)
+		return added
+
+	def load(self, chunks: Iterable[list[tuple]]) -> list[tuple]:
+		'''
+		The row indexes are dropped meanwhile and rebuilt in one pass at the end
+		'''
+		indexed, self._row_indexes = tuple(self._row_indexes), {}
+		added = super().load(chunks)
+		for n in indexed:
+			self._get_row_index(n)
+		return added
+
+	def discard(self, members: tuple) -> None:
+		if members in self:
+			remaining = [row for row in self if row != members]
+			self.clear()
+			self.update(remaining)
+
+	def clear(self) -> None:
+		'''
+		New columns replace the old ones, which the snapshots taken so far keep
+		'''
+		self._columns = [array('q') for _ in range(self._arity)]
+		self._keys = PackedKeys(use_array=self._arity * self.id_bits <= 63)
+		self._row_indexes = {}
+
+	def get_snapshot(self) -> ColumnarSnapshot:
+		return ColumnarSnapshot(self, len(self))
+
+	def get_all_with_value_at(self, value: Any, n: int) -> Iterator[tuple]:
+		atom_id = self._atoms.get_id(value)
+		if atom_id is None:
+			return iter(())
+		rows = tuple(self._get_row_index(n).get(atom_id, ()))
+		get_atom = self._atoms.get_atom
+		return (tuple(get_atom(column[row]) for column in self._columns) for row in rows)
+
+	def get_distinct_count(self, n: int) -> int:
+		if n in self._row_indexes:
+			return len(self._row_indexes[n])
+		if np is not None:
+			return len(np.unique(np.frombuffer(self._columns[n], dtype=np.int64)))
+		return len(set(self._columns[n]))
+
+	def get_value_counts(self, n: int) -> dict[Any, int]:
+		get_atom = self._atoms.get_atom
+		return {get_atom(atom_id): len(rows) for atom_id, rows in self._get_row_index(n).items()}
+
+	def _get_row_index(self, n: int) -> dict[int, array]:
+		if n not in self._row_indexes:
+			index = {}
+			for row, atom_id in enumerate(self._columns[n]):
+				index.setdefault(atom_id, array('q')).append(row)
+			self._row_indexes[n] = index
+		return self._row_indexes[n]
+
+
+class ColumnarSnapshot(Set):
+	'''
+	The first rows of the columns of a columnar storage. The columns are append-only and replaced rather than changed
+	by discard and clear, so they stay as they were
+	'''
+	__slots__ = ('_storage', '_columns', '_count', '_row_index')
+
+	def __init__(self, storage: ColumnarStorage, count: int):
+		self._storage = storage
+		self._columns = storage._columns
+		self._count = count
+		self._row_index: dict[int, array] | None = None
+
+	def __contains__(self, members) -> bool:
+		'''
+		A member of the storage is in the snapshot when it is in one of its first rows
+		'''
+		storage = self._storage
+		if len(members) != storage.arity or not self._count:
+			return False
+		ids = storage.encode(members)
+		if ids is None or self._columns is storage._columns and storage.pack(ids) not in storage.get_keys():
+			return False
+		if not ids:
+			return True
+		rows = self._get_row_index().get(ids[0], ())
+		return any(all(column[row] == atom_id for column, atom_id in zip(self._columns, ids)) for row in rows[:bisect_left(rows, self._count)])
+
+	def _get_row_index(self) -> dict[int, array]:
+		'''
+		Rows by the id in the first column: the storage's index while the columns are its own, built here once they are not
+		'''
+		if self._columns is self._storage._columns:
+			return self._storage._get_row_index(0)
+		if self._row_index is None:
+			self._row_index = {}
+			for row, atom_id in enumerate(self._columns[0][:self._count]):
+				self._row_index.setdefault(atom_id, array('q')).append(row)
+		return self._row_index
+
+	def __iter__(self) -> Iterator[tuple]:
+		return self._storage._iter_rows(self._columns, self._count)
+
+	def __len__(self) -> int:
+		return self._count
+
+	def __hash__(self) -> int:
+		return self._hash()
+
+	@classmethod
+	def _from_iterable(cls, it: Iterable[tuple]) -> frozenset:
+		return frozenset(it)
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+from typing import Iterable, Iterator, Sequence
+
+Node = dict | set
+
+
+class Trie:
+	'''
+	Members indexed column by column in a chosen order: nested dicts from a value of a column to the trie of the next ones,
+	the values of the last column in a set. An order of fewer columns than the arity is a projection, deduplicated as it is built
+	'''
+	__slots__ = ('_order', '_root', '_count')
+
+	def __init__(self, order: Sequence[int], rows: Iterable[tuple] = ()):
+		self._order = tuple(order)
+		self._root: Node = set() if len(self._order) == 1 else {}
+		self._count = 0
+		self.update(rows)
+
+	@property
+	def order(self) -> tuple[int, ...]:
+		return self._order
+
+	@property
+	def root(self) -> Node:
+		return self._root
+
+	def __len__(self) -> int:
+		return self._count
+
+	def update(self, rows: Iterable[tuple]) -> None:
+		if not self._order:
+			self._count = 1 if self._count or next(iter(rows), None) is not None else 0
+			return
+		*inner, last = self._order
+		depth = len(inner)
+		for row in rows:
+			node = self._root
+			for i, column in enumerate(inner):
+				node = node.setdefault(row[column], {} if i + 1 < depth else set())
+			if row[last] not in node:
+				node.add(row[last])
+				self._count += 1
+
+	def __iter__(self) -> Iterator[tuple]:
+		'''
+		Values of the columns in the order of the trie
+		'''
+		return _walk(self._root, len(self._order), ())
+
+
+def _walk(node: Node, depth: int, prefix: tuple) -> Iterator[tuple]:
+	if depth == 1:
+		yield from (prefix + (value, ) for value in node)
+		return
+	for value, child in node.items():
+		yield from _walk(child, depth - 1, prefix + (value, ))
+
+
+def trie_join(tries: Sequence[tuple[Sequence[int], Trie]], key_count: int) -> Iterator[tuple]:
+	'''
+	Generic join of the tries, each given with the keys of its levels; the keys are bound one at a time in their order
+	by intersecting the current nodes of the tries having it, the smallest node iterated and the others probed.
+	No intermediate result is bigger than the output of the join of the tries bound so far, so the cost is bounded by the
+	worst-case output size (the AGM bound) and not by the size of pairwise joins, which is what matters for cyclic patterns
+	'''
+	levels: list[list[int]] = [[] for _ in range(key_count)]
+	for i, (keys, trie) in enumerate(tries):
+		if list(keys) != sorted(keys):
+			raise ValueError(f'Levels of the trie {i} are not in the order of the keys: {keys}')
+		if not len(trie):
+			return iter(())
+		for key in keys:
+			levels[key].append(i)
+	if any(not participants for participants in levels):
+		raise ValueError('Every key has to be a level of some trie')
+	return _join(levels, [trie.root for _, trie in tries], 0, ())
+
+
+def _join(levels: list[list[int]], nodes: list[Node], key: int, row: tuple) -> Iterator[tuple]:
+	if key == len(levels):
+		yield row
+		return
+	participants = levels[key]
+	candidates = [nodes[i] for i in participants]
+	smallest = min(candidates, key=len)
+	others = [node for node in candidates if node is not smallest]
+	for value in smallest:
+		if all(value in node for node in others):
+			children = list(nodes)
+			for i, node in zip(participants, candidates):
+				children[i] = node[value] if isinstance(node, dict) else None
+			yield from _join(levels, children, key + 1, row + (value, ))
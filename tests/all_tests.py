@@ -3,10 +3,44 @@ import unittest
 from tests.abstractTest import AbstractTest
 from tests.basicRelationsTest import BasicRelationsTest
 from tests.operationsTest import OperationsTest
+from tests.plannerTest import PlannerTest
+from tests.materializedTest import MaterializedTest
+from tests.closureTest import ClosureTest
+from tests.storageTest import StorageTest
+from tests.sparseTest import SparseTest
+from tests.complementTest import ComplementTest
+from tests.registryTest import RegistryTest
+from tests.streamingTest import StreamingTest
+from tests.bulkLoadTest import BulkLoadTest
+from tests.snapshotTest import SnapshotTest
+from tests.sqliteStoreTest import SqliteStoreTest
+from tests.parallelTest import ParallelTest
+from tests.asyncStoreTest import AsyncStoreTest
+from tests.mvccTest import MvccTest
+from tests.trieTest import TrieTest
+from tests.cacheTest import CacheTest
+from tests.countTest import CountTest
 
 tests = [
     BasicRelationsTest,
     OperationsTest,
+    PlannerTest,
+    MaterializedTest,
+    ClosureTest,
+    StorageTest,
+    SparseTest,
+    ComplementTest,
+    RegistryTest,
+    StreamingTest,
+    BulkLoadTest,
+    SnapshotTest,
+    SqliteStoreTest,
+    ParallelTest,
+    AsyncStoreTest,
+    MvccTest,
+    TrieTest,
+    CacheTest,
+    CountTest,
 ]
 
 
@@ -0,0 +1,148 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+
+from src.async_store import AsyncRelationStore
+from src.relations import Relation, BinaryRelation, RelationStorage
+from src.sqlite_store import SqliteRelationStorage
+from tests.AbstractRelationsTest import AbstractRelationsTest
+
+
+class CountingRelation(BinaryRelation):
+	__slots__ = ('batches', )
+
+	def match_many(self, candidates):
+		self.batches.append(len(candidates))
+		return super().match_many(candidates)
+
+
+class AsyncStoreTest(AbstractRelationsTest):
+	@classmethod
+	def _get_test_name(cls) -> str:
+		return 'Async store'
+
+	@classmethod
+	def _create_store(cls, **kwargs) -> AsyncRelationStore:
+		storage = RelationStorage()
+		is_parent = storage.add_relation(CountingRelation('is_parent', space=(('Janina', 'Teresa'), ('Teresa', 'Piotr'), ('Piotr', 'Karol'))))
+		is_parent.batches = []
+		storage.add_relation(Relation('is_female', 1, space=('Janina', 'Teresa')))
+		storage.add_relation(is_parent * is_parent)
+		return AsyncRelationStore(storage, **kwargs)
+
+	def test_concurrent_matches_are_batched(self):
+		store = self._create_store()
+
+		async def ask():
+			return await asyncio.gather(*(store.is_matched_by('is_parent', a, b) for a, b in (('Teresa', 'Piotr'), ('Janina', 'Karol'), ('Piotr', 'Karol'))))
+
+		self.assertEqual([True, False, True], asyncio.run(ask()))
+		self.assertEqual([3], store.storage.get_relation('is_parent').batches)
+
+	def test_max_batch(self):
+		store = self._create_store(window=10, max_batch=2)
+
+		async def ask():
+			return await asyncio.gather(*(store.is_matched_by('is_female', name) for name in ('Janina', 'Piotr', 'Teresa', 'Karol')))
+
+		self.assertEqual([True, False, True, False], asyncio.run(ask()))
+
+	def test_derived_relations_and_lookups(self):
+		store = self._create_store()
+		grandparent = 'is_parent_x_and_x_is_parent'
+
+		async def ask():
+			return await asyncio.gather(
+				store.is_matched_by(grandparent, 'Janina', 'Piotr'),
+				store.is_matched_by(grandparent, 'Janina', 'Karol'),
+				store.get_all_with_value_at(grandparent, 'Teresa', 0),
+				store.get_all_with_value_at('is_parent', 'Teresa', 0),
+				store.get_all_with_value_at('is_parent', 'Teresa', 0),
+				store.get_members('is_female'),
+			)
+
+		result = asyncio.run(ask())
+		self.assertEqual([True, False, [('Teresa', 'Karol')], [('Teresa', 'Piotr')], [('Teresa', 'Piotr')]], result[:5])
+		self.assertEqual({('Janina', ), ('Teresa', )}, set(result[5]))
+
+	def test_add_during_evaluation(self):
+		store = self._create_store()
+		is_parent, is_female = store.storage.get_relation('is_parent'), store.storage.get_relation('is_female')
+		mother = store.storage.add_relation(is_parent(0, 1) & is_female(0))
+		added = threading.Event()
+
+		def add():
+			is_female.add(*(f'p{i}' for i in range(100)))
+			is_parent.add(*((f'p{i}', f'c{i}') for i in range(100)))
+			added.set()
+
+		def count_around_add(relation, loop):
+			before = relation.count_by(0)
+			loop.call_soon_threadsafe(add)
+			added.wait()
+			return before, relation.count_by(0), set(relation)
+
+		async def ask():
+			return await store._run(mother, count_around_add, asyncio.get_running_loop())
+
+		before, after, members = asyncio.run(ask())
+		self.assertEqual({'Janina': 1, 'Teresa': 1}, before)
+		self.assertEqual(before, after)
+		self.assertEqual({('Janina', 'Teresa'), ('Teresa', 'Piotr')}, members)
+		self.assertEqual(102, mother.count())
+
+	def test_sqlite_store(self):
+		storage = SqliteRelationStorage()
+		is_parent = storage.add_relation(BinaryRelation('is_parent', space=(('Janina', 'Teresa'), ('Teresa', 'Piotr'), ('Piotr', 'Karol'))))
+		grandparent = storage.add_relation(is_parent * is_parent).name
+		store = AsyncRelationStore(storage)
+
+		async def ask():
+			return await asyncio.gather(
+				*(store.is_matched_by(grandparent, a, b) for a, b in (('Janina', 'Piotr'), ('Janina', 'Karol'), ('Teresa', 'Karol')) * 20),
+				store.get_members(grandparent),
+				store.get_all_with_value_at(grandparent, 'Teresa', 0),
+				store.get_all_with_value_at('is_parent', 'Piotr', 0),
+				store.add('is_parent', ('Karol', 'Ola')),
+			)
+
+		result = asyncio.run(ask())
+		self.assertEqual([True, False, True] * 20, result[:60])
+		self.assertEqual({('Janina', 'Piotr'), ('Teresa', 'Karol')}, set(result[60]))
+		self.assertEqual([[('Teresa', 'Karol')], [('Piotr', 'Karol')]], [list(found) for found in result[61:63]])
+		self.assertIn(('Piotr', 'Ola'), storage.get_relation(grandparent).set)
+
+	def test_unix_server(self):
+		store = self._create_store()
+		path = os.path.join(tempfile.mkdtemp(), 'relations.sock')
+		requests = [
+			{'id': 1, 'op': 'match', 'relation': 'is_parent', 'args': ['Janina', 'Teresa']},
+			{'id': 2, 'op': 'add', 'relation': 'is_female', 'args': [['Karol']]},
+			{'id': 3, 'op': 'lookup', 'relation': 'is_parent', 'args': ['Piotr', 0]},
+			{'id': 4, 'op': 'match', 'relation': 'nothing', 'args': []},
+			{'id': 5, 'op': 'add', 'relation': 'is_female', 'args': ['Zofia', ['Ola']]},
+			{'id': 6, 'op': 'add', 'relation': 'is_parent', 'args': [['Ola', 'Ewa'], ['Ola']]},
+		]
+
+		async def talk():
+			server = await store.serve_unix(path)
+			async with server:
+				reader, writer = await asyncio.open_unix_connection(path)
+				writer.write(b''.join(json.dumps(request).encode() + b'\n' for request in requests))
+				await writer.drain()
+				responses = [json.loads(await reader.readline()) for _ in requests]
+				writer.close()
+			return {response['id']: response for response in responses}
+
+		responses = asyncio.run(talk())
+		self.assertTrue(responses[1]['result'])
+		self.assertIsNone(responses[2]['result'])
+		self.assertEqual([['Piotr', 'Karol']], responses[3]['result'])
+		self.assertIn('KeyError', responses[4]['error'])
+		self.assertIn(('Karol', ), store.storage.get_relation('is_female').set)
+		self.assertIsNone(responses[5]['result'])
+		self.assertEqual({('Janina', ), ('Teresa', ), ('Karol', ), ('Zofia', ), ('Ola', )}, store.storage.get_relation('is_female').set)
+		self.assertIn('ValueError', responses[6]['error'])
+		self.assertNotIn(('Ola', 'Ewa'), store.storage.get_relation('is_parent').set)
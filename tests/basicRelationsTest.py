@@ -1,9 +1,10 @@
+from itertools import compress
 from typing import Iterable
 
 from parameterized import parameterized
 
-from src.relations import Relation
-from tests.abstractRelationsTest import AbstractRelationsTest
+from src.relations import Relation, BinaryRelation
+from tests.AbstractRelationsTest import AbstractRelationsTest
 
 
 class BasicRelationsTest(AbstractRelationsTest):
@@ -37,3 +38,115 @@ class BasicRelationsTest(AbstractRelationsTest):
 		rel.add(*to_adds)
 		self.assertTrue(rel.is_matched_by(*to_match))
 		self.assertTrue(to_match in rel)
+
+	def test_members_snapshot_is_reused_until_add(self):
+		rel = Relation('snapshot', 1)
+		rel.add('apple', 'orange')
+		members = rel.members
+		self.assertIs(members, rel.members)
+		self.assertTrue(rel.is_matched_by('apple'))
+		self.assertIs(members, rel.members)
+		rel.add('kiwi')
+		self.assertIsNot(members, rel.members)
+		self.assertIn(('kiwi', ), rel.members)
+
+	def test_set_is_defensive_copy(self):
+		rel = Relation('copy', 1)
+		rel.add('apple')
+		external = rel.set
+		external.add(('kiwi', ))
+		self.assertFalse(rel.is_matched_by('kiwi'))
+		self.assertCountEqual([('apple', )], rel.set)
+
+	def test_filter_and_contains_unary(self):
+		rel = Relation('filter', 1)
+		rel.add('apple', 'kiwi')
+		self.assertTrue('kiwi' in rel)
+		self.assertCountEqual(['apple', 'kiwi'], rel.filter(['apple', 'orange', 'kiwi']))
+
+	def test_positional_lookup_follows_adds(self):
+		rel = Relation('positional', 2)
+		rel.add(('dad', 'son'), ('mum', 'son'))
+		self.assertCountEqual([('dad', 'son'), ('mum', 'son')], rel.get_all_with_value_at('son', 1))
+		rel.add(('grandma', 'mum'), ('dad', 'daughter'))
+		self.assertCountEqual([('dad', 'son'), ('dad', 'daughter')], rel.get_all_with_value_at('dad', 0))
+		self.assertCountEqual([], rel.get_all_with_value_at('nobody', 0))
+
+	@parameterized.expand([
+		('plain', {}, [True, False, False, False]),
+		('symmetric', {'is_symmetric': True}, [True, True, False, False]),
+		('reflexive', {'is_reflexive': True}, [True, False, True, False]),
+		('transitive', {'is_transitive': True}, [True, False, False, True]),
+	])
+	def test_match_many_with_induction(self, name, properties: dict, e_mask: list[bool]):
+		rel = BinaryRelation('match_many', space=(('dad', 'son'), ('son', 'grandson')), **properties)
+		candidates = [('dad', 'son'), ('son', 'dad'), ('mum', 'mum'), ('dad', 'grandson')]
+		self.assertEqual(e_mask, list(rel.match_many(candidates)))
+		self.assertEqual([rel.is_matched_by(*candidate) for candidate in candidates], list(rel.match_many(candidates)))
+		self.assertEqual(list(compress(candidates, e_mask)), list(rel.filter(candidates)))
+
+	def test_match_many_derived(self):
+		fruit = Relation('fruit', 1, space=('apple', 'kiwi'))
+		red = Relation('red', 1, space=('apple', 'cherry'))
+		candidates = ['apple', 'kiwi', 'cherry', 'plum']
+		for derived in (fruit & red, fruit | red, -fruit):
+			self.assertEqual([derived.is_matched_by(candidate) for candidate in candidates], list(derived.match_many(candidates)))
+
+	def test_relations_are_slotted_and_share_properties(self):
+		symmetric = BinaryRelation('slotted', is_symmetric=True, is_irreflexive=True)
+		other = BinaryRelation('other_slotted', is_symmetric=True)
+		derived = symmetric * other
+		for relation in (symmetric, derived, derived | symmetric):
+			self.assertFalse(hasattr(relation, '__dict__'))
+		self.assertIs(symmetric.symmetry, other.symmetry)
+		self.assertTrue(symmetric.irreflexivity.is_on())
+		self.assertTrue(other.irreflexivity.is_off())
+
+	@parameterized.expand([
+		('single_adds', [[('a', 'b')], [('b', 'a')], [('c', 'c')], [('a', 'c')]]),
+		('one_batch', [[('a', 'b'), ('b', 'a'), ('c', 'c'), ('a', 'c')]]),
+		('repeated', [[('a', 'b'), ('a', 'b')], [('b', 'a'), ('c', 'c')], [('c', 'c'), ('a', 'c')]]),
+	])
+	def test_shape_follows_adds(self, name, batches: list[list[tuple]]):
+		rel = BinaryRelation('shape')
+		for batch in batches:
+			rel.add(*batch)
+		self.assertEqual((4, 1, 3), tuple(rel._get_shape()))
+		rel._shape = None
+		self.assertEqual((4, 1, 3), tuple(rel._get_shape()))
+		self.assertFalse(rel.can_be_irreflexive())
+		self.assertFalse(rel.can_be_asymmetric())
+		self.assertFalse(rel.can_be_antisymmetric())
+		self.assertFalse(rel.is_symmetric())
+		rel.add(('c', 'a'))
+		self.assertTrue(rel.is_symmetric())
+
+	def test_structural_properties(self):
+		rel = BinaryRelation('structure', space=(('a', 'b'), ('b', 'c'), ('c', 'c')))
+		self.assertFalse(rel.can_be_asymmetric())
+		self.assertTrue(rel.can_be_antisymmetric())
+		self.assertFalse(rel.can_be_irreflexive())
+		self.assertFalse(rel.is_transitive())
+		rel.add(('a', 'c'))
+		self.assertTrue(rel.is_transitive())
+		derived = (rel * rel).materialize()
+		self.assertEqual((3, 1, 1), tuple(derived._get_shape()))
+		self.assertTrue((rel * rel).is_transitive())
+		self.assertIsNone(rel._closure)
+
+	def test_long_chain_is_not_transitive(self):
+		rel = BinaryRelation('chain', space=[(i, i + 1) for i in range(3000)])
+		self.assertFalse(rel.is_transitive())
+		self.assertIsNone(rel._closure)
+
+	@parameterized.expand([
+		('plain', {}, [True, True, True, True]),
+		('asymmetric', {'is_asymmetric': True}, [True, False, False, True]),
+		('irreflexive', {'is_irreflexive': True}, [True, True, False, True]),
+	])
+	def test_can_add_many(self, name, properties: dict, e_mask: list[bool]):
+		rel = BinaryRelation('can_add', space=(('a', 'b'), ), **properties)
+		candidates = [('a', 'c'), ('b', 'a'), ('c', 'c'), ('d', 'e')]
+		self.assertEqual(e_mask, list(rel.can_add_many(candidates)))
+		self.assertEqual([rel.can_add(*candidate) for candidate in candidates], list(rel.can_add_many(candidates)))
+		self.assertEqual([False, False] if properties.get('is_asymmetric') else [True, True], list(rel.can_add_many([('d', 'e'), ('e', 'd')])))
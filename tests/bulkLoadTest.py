@@ -0,0 +1,82 @@
+import os
+import tempfile
+
+from parameterized import parameterized
+
+from src.relations import BinaryRelation, RelationStorage
+from src.storage import SetStorage, ColumnarStorage
+from tests.AbstractRelationsTest import AbstractRelationsTest
+
+
+class Recorder:
+	def __init__(self):
+		self.calls = []
+
+	def _on_added(self, relation, added):
+		self.calls.append(added)
+
+
+class BulkLoadTest(AbstractRelationsTest):
+	@classmethod
+	def _get_test_name(cls) -> str:
+		return 'Bulk load'
+
+	def _write(self, suffix: str, text: str) -> str:
+		file, path = tempfile.mkstemp(suffix=suffix)
+		with os.fdopen(file, 'w') as f:
+			f.write(text)
+		self.addCleanup(os.remove, path)
+		return path
+
+	@parameterized.expand([
+		('set', lambda: SetStorage()),
+		('columnar', lambda: ColumnarStorage(2)),
+	])
+	def test_load_iterable_in_chunks(self, name, create_storage):
+		is_parent = BinaryRelation('is_parent', backend=create_storage())
+		is_parent.add(('Janina', 'Teresa'))
+		is_parent.get_all_with_value_at('Janina', 0)
+		recorder = Recorder()
+		is_parent.subscribe(recorder)
+
+		added = is_parent.bulk_load(((f'p{i % 50}', f'p{i % 50 + 1}') for i in range(120)), chunk_size=7)
+
+		self.assertEqual(50, added)
+		self.assertEqual(51, len(is_parent.set))
+		self.assertEqual(1, len(recorder.calls))
+		self.assertEqual(50, len(recorder.calls[0]))
+		self.assertEqual({('p3', 'p4')}, set(is_parent.get_all_with_value_at('p3', 0)))
+		self.assertEqual({('Janina', 'Teresa')}, set(is_parent.get_all_with_value_at('Janina', 0)))
+
+	@parameterized.expand([
+		('csv', '.csv', 'Janina,Teresa\nTeresa,Ania\nJanina,Teresa\n'),
+		('tsv', '.tsv', 'Janina\tTeresa\nTeresa\tAnia\n'),
+	])
+	def test_load_file(self, name, suffix, text):
+		is_parent = BinaryRelation('is_parent')
+		self.assertEqual(2, is_parent.bulk_load(self._write(suffix, text)))
+		self.assertEqual({('Janina', 'Teresa'), ('Teresa', 'Ania')}, is_parent.set)
+
+	def test_load_converters_and_header(self):
+		path = self._write('.csv', 'a,b\n1,2\n2,3\n')
+		is_less = BinaryRelation('is_less')
+		is_less.bulk_load(path, skip_header=True, converters=(int, int))
+		self.assertEqual({(1, 2), (2, 3)}, is_less.set)
+
+	def test_wrong_arity(self):
+		is_parent = BinaryRelation('is_parent')
+		with self.assertRaises(ValueError):
+			is_parent.bulk_load([('Janina', 'Teresa'), ('Ania', )])
+
+	def test_storage_load(self):
+		storage = RelationStorage()
+		is_parent = storage.load('is_parent', self._write('.csv', 'Janina,Teresa\nTeresa,Ania\n'))
+		is_female = storage.load('is_female', ['Janina', 'Teresa'])
+
+		self.assertEqual(2, is_parent.arity)
+		self.assertEqual(1, is_female.arity)
+		self.assertIs(is_parent, storage.get_relation('is_parent'))
+		self.assertEqual({('Janina', ), ('Teresa', ), ('Ania', )}, storage.domain.set)
+
+		storage.load('is_female', [('Ania', )])
+		self.assertEqual(3, len(is_female.set))
@@ -0,0 +1,83 @@
+from parameterized import parameterized
+
+from src.cache import ResultCache
+from src.relations import Relation, BinaryRelation, RelationStorage
+from tests.AbstractRelationsTest import AbstractRelationsTest
+
+
+class CacheTest(AbstractRelationsTest):
+	@classmethod
+	def _get_test_name(cls) -> str:
+		return 'Cache'
+
+	def setUp(self) -> None:
+		super().setUp()
+		self.storage = RelationStorage()
+		self.is_parent = BinaryRelation('is_parent', registry=self.storage, space=(('Janina', 'Teresa'), ('Teresa', 'Ania'), ('Teresa', 'Kasia')))
+		self.is_female = Relation('is_female', 1, registry=self.storage, space=('Janina', 'Teresa', 'Ania'))
+
+	@parameterized.expand([
+		('composition', lambda is_parent, is_female: is_parent * is_parent, lambda is_parent, is_female: is_parent * is_parent),
+		('renamed_correspondences', lambda is_parent, is_female: is_parent(0, -1) & is_female(-1), lambda is_parent, is_female: is_parent('A', -5) & is_female(-5)),
+		('letters', lambda is_parent, is_female: is_parent('A', 'B') & is_female('B'), lambda is_parent, is_female: is_parent(0, 1) & is_female(1)),
+		('differently_named', lambda is_parent, is_female: is_parent | ~is_parent, lambda is_parent, is_female: is_parent.__or__(~is_parent)),
+	])
+	def test_same_structure_is_equal(self, name, create_relation, create_other):
+		derived, other = create_relation(self.is_parent, self.is_female), create_other(self.is_parent, self.is_female)
+		self.assertIsNot(derived, other)
+		self.assertEqual(derived, other)
+		self.assertEqual(1, len({derived, other}))
+
+	@parameterized.expand([
+		('other_params', lambda is_parent, is_female: is_parent(0, 1) & is_female(0), lambda is_parent, is_female: is_parent(0, 1) & is_female(1)),
+		('other_operator', lambda is_parent, is_female: is_parent(0, 1) & is_female(0), lambda is_parent, is_female: is_parent(0, 1) | is_female(0)),
+		('other_relation', lambda is_parent, is_female: is_parent * is_parent, lambda is_parent, is_female: is_parent * BinaryRelation('is_parent', space=(('Janina', 'Teresa'), ))),
+	])
+	def test_other_structure_is_not_equal(self, name, create_relation, create_other):
+		self.assertNotEqual(create_relation(self.is_parent, self.is_female), create_other(self.is_parent, self.is_female))
+
+	def test_stored_relations_are_equal_only_to_themselves(self):
+		self.assertNotEqual(self.is_parent, BinaryRelation('is_parent', registry=self.storage))
+		self.assertEqual(self.is_parent, self.is_parent)
+
+	def test_shared_subexpression_is_evaluated_once(self):
+		cache = self.storage.cache
+		grandparents = (self.is_parent * self.is_parent).set
+		misses = cache.misses
+		self.assertEqual(grandparents, (self.is_parent * self.is_parent).set)
+		self.assertEqual(misses, cache.misses)
+		self.assertGreater(cache.hits, 0)
+		self.is_parent.add(('Kasia', 'Ola'))
+		self.assertIn(('Teresa', 'Ola'), (self.is_parent * self.is_parent).set)
+
+	def test_complement_follows_universe(self):
+		not_female = -self.is_female
+		self.assertEqual(set(), not_female.set)
+		is_male = Relation('is_male', 1, registry=self.storage, space=('Marek', ))
+		self.assertEqual({('Marek', )}, not_female.set)
+		is_male.add('Adam')
+		self.assertEqual({('Marek', ), ('Adam', )}, not_female.set)
+
+	def test_pinned_read_bypasses_cache(self):
+		grandparent = self.is_parent * self.is_parent
+		with self.storage.read():
+			before = grandparent.set
+			self.is_parent.add(('Kasia', 'Ola'))
+			self.assertEqual(before, grandparent.set)
+		self.assertIn(('Teresa', 'Ola'), grandparent.set)
+
+	def test_lru_eviction(self):
+		cache = ResultCache(max_entries=2, max_members=5)
+		cache.put('a', 0, frozenset({1, 2}))
+		cache.put('b', 0, frozenset({3}))
+		self.assertIsNotNone(cache.get('a', 0))
+		cache.put('c', 0, frozenset({4}))
+		self.assertIsNone(cache.get('b', 0))
+		self.assertIsNotNone(cache.get('a', 0))
+		cache.put('d', 0, frozenset({5, 6, 7}))
+		self.assertEqual(5, cache.size)
+		self.assertIsNone(cache.get('c', 0))
+		self.assertIsNone(cache.get('d', 1))
+		self.assertEqual(1, len(cache))
+		cache.put('e', 0, frozenset(range(6)))
+		self.assertIsNone(cache.get('e', 0))
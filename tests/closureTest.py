@@ -0,0 +1,44 @@
+from itertools import product
+
+from parameterized import parameterized
+
+from src.closure import TransitiveClosure
+from src.relations import BinaryRelation
+from tests.AbstractRelationsTest import AbstractRelationsTest
+
+
+class ClosureTest(AbstractRelationsTest):
+	@classmethod
+	def _get_test_name(cls) -> str:
+		return 'Closure'
+
+	@parameterized.expand([
+		('chain', [(1, 2), (2, 3), (3, 4)], []),
+		('cycle', [(1, 2), (2, 3), (3, 1), (3, 4)], []),
+		('self_loop', [(1, 1), (1, 2)], []),
+		('added_later', [(1, 2), (3, 4)], [(2, 3), (4, 1)]),
+		('diamond', [(1, 2), (1, 3), (2, 4), (3, 4)], [(4, 5)]),
+	])
+	def test_closure(self, name, edges, added):
+		all_edges = set(edges) | set(added)
+		e_closure = set(all_edges)
+		while new := {(a, d) for a, b in e_closure for c, d in e_closure if b == c} - e_closure:
+			e_closure |= new
+
+		built = TransitiveClosure(edges)
+		built.build()
+		condensed = TransitiveClosure(edges)
+		built.add(*added)
+		condensed.add(*added)
+
+		self.assertEqual(e_closure, set(built))
+		for a, c in product(range(1, 6), repeat=2):
+			self.assertEqual((a, c) in e_closure, condensed.reaches(a, c), f'{a} -> {c}')
+
+	def test_transitive_relation(self):
+		is_ancestor = BinaryRelation('is_ancestor', is_transitive=True, space=(('Janina', 'Teresa'), ('Teresa', 'Ania')))
+		self.assertTrue(is_ancestor.is_matched_by('Janina', 'Ania'))
+		self.assertFalse(is_ancestor.is_matched_by('Ania', 'Janina'))
+		is_ancestor.add(('Ania', 'Kasia'))
+		self.assertTrue(is_ancestor.is_matched_by('Janina', 'Kasia'))
+		self.assertFalse(BinaryRelation('is_parent', space=is_ancestor.members).is_matched_by('Janina', 'Kasia'))
@@ -0,0 +1,45 @@
+from parameterized import parameterized
+
+from src.relations import Relation, BinaryRelation, RelationStorage, ComplementRelation
+from tests.AbstractRelationsTest import AbstractRelationsTest
+
+
+class ComplementTest(AbstractRelationsTest):
+	@classmethod
+	def _get_test_name(cls) -> str:
+		return 'Complement'
+
+	def setUp(self) -> None:
+		super().setUp()
+		self.storage = RelationStorage()
+		self.is_female = self.storage.add_relation(Relation('is_female', 1, space=('Kasia', 'Basia')))
+		self.is_parent = self.storage.add_relation(BinaryRelation('is_parent', space=(('Kasia', 'Antek'), ('Antek', 'Basia'))))
+
+	@parameterized.expand([
+		('outside', ('Antek', ), True),
+		('inside', ('Kasia', ), False),
+		('out_of_domain', ('Zosia', ), False),
+	])
+	def test_is_matched_by(self, name, members, e_result):
+		is_not_female = self.storage.get_complement('is_female')
+		self.assertEqual(e_result, is_not_female.is_matched_by(*members))
+		self.assertEqual([e_result], list(is_not_female.match_many([members])))
+
+	def test_members_are_bounded_by_domain(self):
+		is_not_parent = self.storage.get_complement('is_parent')
+		atoms = ('Kasia', 'Basia', 'Antek')
+		e_members = {(a, b) for a in atoms for b in atoms} - self.is_parent.set
+		self.assertEqual(e_members, is_not_parent.set)
+		self.assertCountEqual([('Basia', b) for b in atoms], is_not_parent.get_all_with_value_at('Basia', 0))
+
+	def test_unrelated_relations_do_not_matter(self):
+		is_not_female = ComplementRelation('is_not_female', relation=self.is_female, domain=self.storage.domain)
+		Relation('is_city', 1, space=('Kraków', 'Gdańsk'))
+		self.assertEqual({('Antek', )}, is_not_female.set)
+
+	def test_follows_domain(self):
+		is_not_female = ComplementRelation('is_not_female', relation=self.is_female, domain=self.storage.domain, materialized=True)
+		self.is_parent.add(('Antek', 'Staś'))
+		self.assertEqual({('Antek', ), ('Staś', )}, is_not_female.set)
+		self.is_female.add('Antek')
+		self.assertEqual({('Staś', )}, is_not_female.set)
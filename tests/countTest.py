@@ -0,0 +1,98 @@
+from collections import Counter
+from unittest.mock import patch
+
+from parameterized import parameterized
+
+from src.relations import Relation, BinaryRelation, RelationStorage, DerivedRelation, IntersectionRelation, ComplementRelation
+from tests.AbstractRelationsTest import AbstractRelationsTest
+
+
+class CountTest(AbstractRelationsTest):
+	@classmethod
+	def _get_test_name(cls) -> str:
+		return 'Count'
+
+	def setUp(self) -> None:
+		super().setUp()
+		self.storage = RelationStorage()
+		self.is_parent = self.storage.add_relation(BinaryRelation('is_parent', space=(
+			('Janina', 'Teresa'), ('Janina', 'Marek'), ('Teresa', 'Ania'), ('Teresa', 'Kuba'), ('Marek', 'Zosia'), ('Ania', 'Staś'),
+		)))
+		self.is_female = self.storage.add_relation(Relation('is_female', 1, space=('Janina', 'Teresa', 'Ania', 'Zosia')))
+		self.is_male = self.storage.add_relation(Relation('is_male', 1, space=('Marek', 'Kuba', 'Staś')))
+		self.is_ancestor = self.storage.add_relation(BinaryRelation('is_ancestor', is_transitive=True, space=self.is_parent.members))
+		self.storage.add_relation(BinaryRelation('is_sibling', space=(('Ania', 'Kuba'), ('Kuba', 'Ania'), ('Teresa', 'Marek'))))
+
+	def _create(self, name: str) -> Relation:
+		p, f, m = self.is_parent, self.is_female, self.is_male
+		return {
+			'stored': lambda: p,
+			'converse': lambda: ~p,
+			'composition': lambda: p * p,
+			'chain': lambda: IntersectionRelation('chain', relations=(p, p), params=((0, 1), (1, 2))),
+			'constant': lambda: p(0, 'Teresa'),
+			'existential': lambda: IntersectionRelation('has_child', relations=(p, ), params=((0, -1), )),
+			'anonymous': lambda: p(0, '*'),
+			'repeated': lambda: IntersectionRelation('chain', relations=(p, p, f), params=((0, 1), (1, 2), (1, ))),
+			'local_existential': lambda: IntersectionRelation('grandmother', relations=(f, p, p), params=((0, ), (0, 1), (1, -1))),
+			'triangle': lambda: IntersectionRelation('triangle', relations=(p, p, p), params=((0, 1), (1, 2), (0, 2))),
+			'nested_union': lambda: IntersectionRelation('parent_of_someone', relations=(p, f | m), params=((0, 1), (1, ))),
+			'union': lambda: f | m,
+			'complement': lambda: self.storage.get_complement('is_parent'),
+			'complement_in_universe': lambda: ComplementRelation('not_parent', relation=p),
+			'complement_of_transitive': lambda: self.storage.get_complement('is_ancestor'),
+			'reordered_complement': lambda: ComplementRelation('not_child', relation=p, params=(1, 0), domain=self.storage.domain),
+		}[name]()
+
+	@parameterized.expand([
+		('stored', ),
+		('converse', ),
+		('composition', ),
+		('chain', ),
+		('constant', ),
+		('existential', ),
+		('anonymous', ),
+		('repeated', ),
+		('local_existential', ),
+		('triangle', ),
+		('nested_union', ),
+		('union', ),
+		('complement', ),
+		('complement_in_universe', ),
+		('complement_of_transitive', ),
+		('reordered_complement', ),
+	])
+	def test_counts_are_of_the_members(self, name):
+		relation = self._create(name)
+		members = set(relation.members)
+		self.assertEqual(len(members), relation.count())
+		for n in range(relation.arity):
+			e_counts = Counter(row[n] for row in members)
+			self.assertEqual(e_counts, relation.count_by(n))
+			self.assertEqual(len(e_counts), relation.distinct_count(n))
+
+	@parameterized.expand([
+		('chain', 4),
+		('constant', 1),
+		('repeated', 3),
+		('local_existential', 3),
+	])
+	def test_factorised_count_does_not_enumerate(self, name, e_count):
+		relation = self._create(name)
+		with patch.object(DerivedRelation, '_stream', side_effect=AssertionError('enumerated')):
+			self.assertEqual(e_count, relation.count())
+			self.assertEqual(len(relation.count_by(0)), relation.distinct_count(0))
+
+	def test_counts_follow_adds(self):
+		chain = self._create('chain')
+		complement = self._create('complement')
+		self.assertEqual(4, chain.count())
+		self.is_parent.add(('Staś', 'Ola'))
+		self.assertEqual({'Teresa': 2, 'Marek': 1, 'Ania': 1, 'Staś': 1}, chain.count_by(1))
+		self.assertEqual(len(set(complement.members)), complement.count())
+
+	def test_stored_counts_after_discard(self):
+		self.assertEqual(2, self.is_parent.count_by(0)['Teresa'])
+		self.is_parent._set.discard(('Ania', 'Staś'))
+		self.assertNotIn('Ania', self.is_parent.count_by(0))
+		self.assertEqual(3, self.is_parent.distinct_count(0))
@@ -0,0 +1,45 @@
+from typing import Callable
+
+from parameterized import parameterized
+
+from src.relations import Relation, BinaryRelation
+from tests.AbstractRelationsTest import AbstractRelationsTest
+
+
+class MaterializedTest(AbstractRelationsTest):
+	@classmethod
+	def _get_test_name(cls) -> str:
+		return 'Materialized'
+
+	@parameterized.expand([
+		('composition', lambda is_parent, is_female: is_parent * is_parent),
+		('converse', lambda is_parent, is_female: ~is_parent),
+		('intersection', lambda is_parent, is_female: is_parent(0, 1) & is_female(1)),
+		('union', lambda is_parent, is_female: is_parent | ~is_parent),
+		('union_with_free_position', lambda is_parent, is_female: is_parent(0, 1) | is_female(0)),
+		('nested', lambda is_parent, is_female: (is_parent * is_parent) * is_parent(1, 0)),
+		('constant', lambda is_parent, is_female: is_parent('Teresa', 0) & is_female(0)),
+	])
+	def test_follows_adds(self, name, create_relation: Callable[[Relation, Relation], Relation]):
+		is_parent = BinaryRelation('is_parent', space=(('Janina', 'Teresa'), ('Teresa', 'Ania')))
+		is_female = Relation('is_female', 1, space=('Janina', 'Teresa'))
+		materialized = create_relation(is_parent, is_female).materialize()
+		computed = create_relation(is_parent, is_female)
+
+		self.assertEqual(computed.set, materialized.set)
+		is_parent.add(('Teresa', 'Piotr'), ('Ania', 'Kasia'))
+		is_female.add('Ania', 'Kasia')
+		self.assertEqual(computed.set, materialized.set)
+		is_parent.add(('Kasia', 'Zosia'))
+		self.assertEqual(computed.set, materialized.set)
+
+	def test_version_and_notification(self):
+		is_parent = BinaryRelation('is_parent', space=(('Janina', 'Teresa'), ))
+		is_grandparent = (is_parent * is_parent).materialize()
+		version = is_grandparent.version
+		is_parent.add(('Janina', 'Teresa'))
+		self.assertEqual(version, is_grandparent.version)
+		is_parent.add(('Teresa', 'Ania'))
+		self.assertLess(version, is_grandparent.version)
+		self.assertTrue(is_grandparent.is_matched_by('Janina', 'Ania'))
+		self.assertCountEqual([('Janina', 'Ania')], is_grandparent.get_all_with_value_at('Ania', 1))
@@ -0,0 +1,110 @@
+import threading
+
+from src.relations import Relation, BinaryRelation, RelationStorage, IntersectionRelation
+from src.storage import SetStorage, VersionedStorage
+from tests.AbstractRelationsTest import AbstractRelationsTest
+
+
+class MvccTest(AbstractRelationsTest):
+	@classmethod
+	def _get_test_name(cls) -> str:
+		return 'MVCC'
+
+	def test_versions_share_layers(self):
+		storage = VersionedStorage([(i, ) for i in range(100)])
+		first = storage.get_snapshot()
+		for i in range(100, 300):
+			storage.add((i, ))
+		self.assertEqual(100, len(first))
+		self.assertEqual(300, len(storage.get_snapshot()))
+		self.assertLessEqual(len(storage.get_snapshot()._layers), 9)
+		self.assertEqual([(150, )], list(storage.get_all_with_value_at(150, 0)))
+		storage.discard((150, ))
+		self.assertNotIn((150, ), storage)
+		self.assertEqual(299, storage.get_distinct_count(0))
+
+	def test_members_are_not_affected_by_adds(self):
+		is_parent = BinaryRelation('is_parent', space=(('Janina', 'Teresa'), ))
+		members = is_parent.members
+		is_parent.add(('Teresa', 'Ania'))
+		self.assertEqual({('Janina', 'Teresa')}, set(members))
+		self.assertEqual(2, len(is_parent.members))
+
+	def test_versioning_starts_with_the_first_read(self):
+		storage = RelationStorage()
+		is_parent = storage.add_relation(BinaryRelation('is_parent', registry=storage, space=(('Janina', 'Teresa'), )))
+		self.assertIs(SetStorage, type(is_parent._set))
+		self.assertFalse(storage.is_versioned)
+		with storage.read():
+			self.assertIsInstance(is_parent._set, VersionedStorage)
+			self.assertEqual({('Janina', 'Teresa')}, is_parent.set)
+		is_female = Relation('is_female', 1, registry=storage, space=('Janina', ))
+		self.assertIsInstance(is_female._set, VersionedStorage)
+		self.assertIsInstance(storage.domain._set, VersionedStorage)
+
+	def test_read_pins_versions(self):
+		storage = RelationStorage()
+		is_parent = storage.add_relation(BinaryRelation('is_parent', registry=storage, space=(('Janina', 'Teresa'), )))
+		grandparent = (is_parent * is_parent).materialize()
+		with storage.read():
+			is_parent.add(('Teresa', 'Ania'))
+			self.assertFalse(is_parent.is_matched_by('Teresa', 'Ania'))
+			self.assertEqual(1, is_parent.count())
+			self.assertFalse(grandparent.set)
+			self.assertNotIn(('Ania', ), storage.domain.members)
+		self.assertTrue(is_parent.is_matched_by('Teresa', 'Ania'))
+		self.assertEqual({('Janina', 'Ania')}, grandparent.set)
+		self.assertIn(('Ania', ), storage.domain.members)
+
+	def test_read_while_writing(self):
+		storage = RelationStorage()
+		is_parent = storage.add_relation(BinaryRelation('is_parent', registry=storage, space=(('Janina', 'Teresa'), )))
+		seen = []
+
+		class Observer:
+			def _on_added(self, relation, added):
+				with storage.read():
+					seen.append(set(relation.members))
+
+		observer = Observer()
+		is_parent.subscribe(observer)
+		with storage.read():
+			pass
+		is_parent.add(('Teresa', 'Ania'))
+		with storage.writer:
+			with storage.read():
+				self.assertEqual(2, is_parent.count())
+		self.assertEqual([{('Janina', 'Teresa'), ('Teresa', 'Ania')}], seen)
+
+	def test_concurrent_writer_and_readers(self):
+		storage = RelationStorage()
+		is_parent = storage.add_relation(BinaryRelation('is_parent', registry=storage))
+		is_child = storage.add_relation(BinaryRelation('is_child', registry=storage))
+		both = IntersectionRelation('both', relations=(is_parent, is_child), params=((0, 1), (1, 0)))
+		errors, done = [], threading.Event()
+
+		def write():
+			for i in range(2000):
+				with storage.writer:
+					is_parent.add((i, i + 1))
+					is_child.add((i + 1, i))
+			done.set()
+
+		def read():
+			try:
+				while not done.is_set():
+					with storage.read():
+						parents, children = len(is_parent.members), len(is_child.members)
+						count = sum(1 for _ in both)
+					if not parents == children == count:
+						errors.append((parents, children, count))
+			except Exception as error:
+				errors.append(error)
+
+		threads = [threading.Thread(target=write)] + [threading.Thread(target=read) for _ in range(3)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		self.assertEqual([], errors)
+		self.assertEqual(2000, both.count())
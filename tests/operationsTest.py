@@ -1,8 +1,9 @@
+from functools import reduce
 from typing import Callable
 
 from parameterized import parameterized
 
-from src.relations import Relation, BinaryRelation
+from src.relations import Relation, BinaryRelation, IntersectionRelation
 from tests.AbstractRelationsTest import AbstractRelationsTest
 
 
@@ -159,3 +160,66 @@ class OperationsTest(AbstractRelationsTest):
 
 		filtered_not_to_match = list(derived.filter(e_not_to_matches))
 		self.assertEqual(0, len(filtered_not_to_match))
+
+	@parameterized.expand([
+		('composition', lambda is_parent_of, is_female: is_parent_of * is_parent_of,
+			[('Wiktor', 'Karol'), ('Aniela', 'Karol'), ('God', 'God')],
+		),
+		('converse', lambda is_parent_of, is_female: ~is_parent_of,
+			[('Stefan', 'Wiktor'), ('Stefan', 'Aniela'), ('Patrycja', 'Wiktor'), ('Patrycja', 'Aniela'), ('Karol', 'Stefan'), ('God', 'God')],
+		),
+		('intersection', lambda is_parent_of, is_female: is_parent_of(0, 1) & is_female(0),
+			[('Aniela', 'Stefan'), ('Aniela', 'Patrycja')],
+		),
+		('intersection_constant', lambda is_parent_of, is_female: is_parent_of('Wiktor', 0) & is_female(0),
+			[('Patrycja', )],
+		),
+		('union', lambda is_parent_of, is_female: is_parent_of(1, 0) | is_parent_of(0, 1),
+			[('Wiktor', 'Stefan'), ('Aniela', 'Stefan'), ('Wiktor', 'Patrycja'), ('Aniela', 'Patrycja'), ('Stefan', 'Karol'), ('God', 'God'),
+			 ('Stefan', 'Wiktor'), ('Stefan', 'Aniela'), ('Patrycja', 'Wiktor'), ('Patrycja', 'Aniela'), ('Karol', 'Stefan')],
+		),
+		('nested_intersection_existentials', lambda is_parent_of, is_female: IntersectionRelation('has_mother', relations=(is_parent_of, is_female), params=((-1, 0), (-1, ))) & is_parent_of(0, -1),
+			[('Stefan', )],
+		),
+	])
+	def test_set(self, name, create_relation, e_set):
+		is_parent_of = BinaryRelation('is_parent', space=(('Wiktor', 'Stefan'), ('Aniela', 'Stefan'), ('Wiktor', 'Patrycja'), ('Aniela', 'Patrycja'),
+														  ('Stefan', 'Karol'), ('God', 'God'))
+		)
+		is_female = Relation('is_female', 1, space=('Aniela', 'Patrycja'))
+		derived: Relation = create_relation(is_parent_of, is_female)
+		self.assertCountEqual(e_set, derived.set)
+
+	@parameterized.expand([
+		('union', lambda a, b: a | b, lambda sets: set().union(*sets)),
+		('intersection', lambda a, b: a & b, lambda sets: set.intersection(*sets)),
+	])
+	def test_chains_are_flattened(self, name, operator, e_members):
+		relations = [Relation(f'chain_{i}', 1, space=[(n, ) for n in range(i, i + 30)]) for i in range(20)]
+		derived = reduce(operator, relations)
+		self.assertEqual(20, len(derived._relations))
+		e_set = e_members([set(relation.members) for relation in relations])
+		self.assertEqual(e_set, derived.set)
+		candidates = list(range(60))
+		self.assertEqual([(n, ) in e_set for n in candidates], [derived.is_matched_by(n) for n in candidates])
+		self.assertEqual([(n, ) in e_set for n in candidates], list(derived.match_many(candidates)))
+
+	def test_union_with_free_position_is_not_flattened(self):
+		is_parent_of = BinaryRelation('is_parent', space=(('Wiktor', 'Stefan'), ))
+		is_female = Relation('is_female', 1, space=('Aniela', ))
+		with_free = is_parent_of(0, 1) | is_female(0)
+		self.assertIn(with_free, (with_free | is_parent_of(1, 0))._relations)
+		self.assertEqual(3, len((is_parent_of(0, 1) | is_parent_of(1, 0) | is_parent_of(0, 0))._relations))
+
+	@parameterized.expand([
+		('rejecting', lambda relations, layer: False, set()),
+		('first_letter', lambda relations, layer: all(members[0].startswith('A') for members in layer), {('Aniela', 'Stefan'), ('Aniela', 'Patrycja')}),
+	])
+	def test_custom_predicate(self, name, pred, e_set):
+		is_parent_of = BinaryRelation('is_parent', space=(('Wiktor', 'Stefan'), ('Aniela', 'Stefan'), ('Aniela', 'Patrycja')))
+		derived = IntersectionRelation('filtered', relations=(is_parent_of, ), pred=pred)
+		self.assertEqual(e_set, derived.set)
+		self.assertEqual(len(e_set), derived.count())
+		self.assertEqual({members: True for members in e_set}, {members: derived.is_matched_by(members) for members in derived.set})
+		self.assertEqual(e_set, (derived & is_parent_of).set)
+		self.assertEqual({(parent, ) for parent, _ in e_set}, derived(0, '*').set)
@@ -0,0 +1,76 @@
+from parameterized import parameterized
+
+from src.parallel import ParallelEvaluator
+from src.relations import Relation, BinaryRelation, IntersectionRelation, UnionRelation, ComplementRelation
+from tests.AbstractRelationsTest import AbstractRelationsTest
+
+
+class ParallelTest(AbstractRelationsTest):
+	@classmethod
+	def _get_test_name(cls) -> str:
+		return 'Parallel'
+
+	@classmethod
+	def _create_relations(cls) -> tuple[BinaryRelation, Relation]:
+		is_parent = BinaryRelation('is_parent', space=[(f'p{i}', f'p{i * 7 % 300}') for i in range(300)])
+		is_female = Relation('is_female', 1, space=[f'p{i}' for i in range(0, 300, 3)])
+		return is_parent, is_female
+
+	@parameterized.expand([
+		('composition', lambda p, f: p * p),
+		('converse', lambda p, f: ~(p * p)),
+		('union', lambda p, f: p | ~p),
+		('intersection', lambda p, f: p & f(0)),
+		('constant', lambda p, f: IntersectionRelation('of_p7', relations=(p, f), params=((0, 'p49'), (0, )))),
+		('nested_union', lambda p, f: UnionRelation('either', relations=(p * p, ~p))),
+		('join_with_complement', lambda p, f: p & ComplementRelation('not_child', relation=p, params=(1, 0))),
+		('letters_with_converse', lambda p, f: (~p)('A', 'B') & f('A')),
+		('letters_reordered', lambda p, f: IntersectionRelation('mother_of', relations=(p, f), params=(('B', 'A'), ('B', )))),
+	])
+	def test_same_as_in_process(self, name, create_relation):
+		relation = create_relation(*self._create_relations())
+		members = list(ParallelEvaluator(workers=2, min_size=0).evaluate(relation))
+		self.assertEqual(len(set(members)), len(members))
+		self.assertEqual(relation.set, set(members))
+
+	def test_partition_key(self):
+		is_parent, is_female = self._create_relations()
+		relation = is_parent * is_parent
+		leaves = [(leaf, params, leaf.members) for leaf, params in relation._get_leaves()]
+		self.assertEqual(-1, ParallelEvaluator(workers=2).get_partition_key(relation, leaves))
+
+	def test_small_inputs_stay_in_process(self):
+		is_parent, _ = self._create_relations()
+		evaluator = ParallelEvaluator(workers=2)
+		self.assertEqual((is_parent * is_parent).set, set(evaluator.evaluate(is_parent * is_parent)))
+
+	def test_materialize(self):
+		is_parent, is_female = self._create_relations()
+		relation = ParallelEvaluator(workers=2, min_size=0).materialize(is_parent & is_female(0))
+		expected = {members for members in is_parent.set if members[0] in {female for female, in is_female.set}}
+		self.assertEqual(expected, relation.set)
+		is_female.add('p1')
+		self.assertIn(('p1', 'p7'), relation.set)
+
+	def test_materialize_with_letters(self):
+		is_parent, is_female = self._create_relations()
+		relation = (~is_parent)('A', 'B') & is_female('A')
+		expected = relation.set
+		self.assertEqual(expected, ParallelEvaluator(workers=2, min_size=0).materialize(relation).set)
+
+	def test_materialize_small_input(self):
+		is_parent, _ = self._create_relations()
+		relation = ParallelEvaluator(workers=2).materialize(is_parent * is_parent)
+		self.assertEqual((is_parent * is_parent).set, relation.set)
+		self.assertTrue(relation.set)
+
+	@parameterized.expand([
+		('complement', lambda p, f: ComplementRelation('not_female', relation=f, domain=f | Relation('is_male', 1, space=('p1', 'p2')))),
+		('union_with_free_position', lambda p, f: UnionRelation('parent_or_female', relations=(p, f), params=((0, 1), (0, )))),
+		('union_with_anonymous', lambda p, f: UnionRelation('child_or_female', relations=(p, f), params=(('*', 1), (0, )))),
+	])
+	def test_not_partitioned(self, name, create_relation):
+		relation = create_relation(*self._create_relations())
+		evaluator = ParallelEvaluator(workers=2, min_size=0)
+		self.assertFalse(evaluator.can_partition(relation))
+		self.assertEqual(relation.set, set(evaluator.evaluate(relation)))
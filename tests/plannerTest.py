@@ -0,0 +1,133 @@
+from parameterized import parameterized
+
+from src.planner import IndexNestedLoopJoinNode, HashJoinNode, ScanNode, TrieJoinNode
+from src.relations import Relation, BinaryRelation, RelationStorage, UnionRelation, ComplementRelation
+from tests.AbstractRelationsTest import AbstractRelationsTest
+
+
+class PlannerTest(AbstractRelationsTest):
+	@classmethod
+	def _get_test_name(cls) -> str:
+		return 'Planner'
+
+	def setUp(self) -> None:
+		super().setUp()
+		self.is_parent = BinaryRelation('is_parent', space=[(f'parent{i}', f'child{3 * i + j}') for i in range(8) for j in range(3)])
+		self.is_female = Relation('is_female', 1, space=[f'child{i}' for i in range(0, 24, 2)])
+
+	def test_statistics(self):
+		statistics = self.is_parent.get_statistics()
+		self.assertEqual(24, statistics.cardinality)
+		self.assertEqual((8, 24), statistics.distinct_counts)
+
+	def test_constant_is_pushed_down_to_the_stored_relation(self):
+		plan = (self.is_parent * self.is_parent)('parent5', 1).get_plan()
+		scans = [node for node in self._walk(plan.root) if isinstance(node, ScanNode)]
+		self.assertTrue(all(scan.source.label == 'is_parent' for scan in scans))
+		self.assertIn('parent5', scans[0].source.params)
+
+	def test_most_selective_relation_is_joined_first(self):
+		plan = (self.is_parent(0, 1) & self.is_parent('parent7', 1)).get_plan()
+		first = next(node for node in self._walk(plan.root) if isinstance(node, ScanNode))
+		self.assertIn('parent7', first.source.params)
+		self.assertIsInstance(plan.root, IndexNestedLoopJoinNode | HashJoinNode)
+
+	@parameterized.expand([
+		('intersection', lambda is_parent, is_female: is_parent(0, 1) & is_female(1)),
+		('constant', lambda is_parent, is_female: is_parent('parent3', 0) & is_female(0)),
+		('composition', lambda is_parent, is_female: (is_parent * ~is_parent)(0, 'parent1')),
+		('chain', lambda is_parent, is_female: is_female(0) & is_parent(1, 0) & is_parent(1, 2)),
+		('siblings_triangle', lambda is_parent, is_female: is_parent('A', 'B') & is_parent('A', 'C') & (~is_parent * is_parent)('B', 'C')),
+		('filtered_triangle', lambda is_parent, is_female: is_parent('A', 'B') & is_parent('A', 'C') & is_parent('*', 'B') & is_female('C') & is_parent('parent2', 'B')),
+	])
+	def test_plan_keeps_result(self, name, create_relation):
+		derived = create_relation(self.is_parent, self.is_female)
+		e_set = {members for members in self._naive(derived)}
+		self.assertEqual(e_set, derived.set)
+
+	@parameterized.expand([
+		('triangle', lambda is_parent: is_parent('A', 'B') & is_parent('B', 'C') & is_parent('C', 'A'), True),
+		('square', lambda is_parent: is_parent('A', 'B') & is_parent('C', 'B') & is_parent('A', 'D') & is_parent('C', 'D'), True),
+		('path', lambda is_parent: is_parent('A', 'B') & is_parent('B', 'C') & is_parent('C', 'D'), False),
+		('star', lambda is_parent: is_parent('A', 'B') & is_parent('A', 'C') & is_parent('A', 'D'), False),
+	])
+	def test_cyclic_pattern_is_trie_joined(self, name, create_relation, e_is_cyclic: bool):
+		derived = create_relation(self.is_parent)
+		self.assertEqual(e_is_cyclic, isinstance(derived.get_plan().root, TrieJoinNode))
+		self.assertNotIsInstance(derived.get_plan(frozenset(derived.positions)).root, TrieJoinNode)
+
+	def test_trie_join_with_cycle_in_data(self):
+		knows = BinaryRelation('knows', space=[('a', 'b'), ('b', 'c'), ('c', 'a'), ('a', 'd'), ('d', 'b'), ('c', 'd')])
+		triangles = knows('A', 'B') & knows('B', 'C') & knows('C', 'A')
+		self.assertIn('TrieJoin', str(triangles.get_plan()))
+		self.assertCountEqual([('a', 'b', 'c'), ('b', 'c', 'a'), ('c', 'a', 'b'), ('b', 'c', 'd'), ('c', 'd', 'b'), ('d', 'b', 'c')], triangles.set)
+		knows.add(('b', 'a'))
+		self.assertIn(('b', 'a', 'd'), knows('A', 'B') & knows('B', 'C') & knows('C', 'A'))
+		self.assertIn(('a', 'd', 'b'), triangles.set)
+
+	@parameterized.expand([
+		('union', lambda is_parent, is_female: is_parent | ~is_parent),
+		('union_with_free_position', lambda is_parent, is_female: UnionRelation('parent_or_female', relations=(is_parent, is_female), params=((0, 1), (0, )))),
+		('complement', lambda is_parent, is_female: ComplementRelation('not_parent', relation=is_parent, domain=is_female)),
+		('reordered_complement', lambda is_parent, is_female: ComplementRelation('not_child', relation=is_parent, params=(1, 0), domain=is_female)),
+	])
+	def test_plan_execute(self, name, create_relation):
+		derived = create_relation(self.is_parent, self.is_female)
+		rows = derived.get_plan().execute({}).rows
+		self.assertCountEqual(self._naive(derived), rows)
+		bound = {0: 'child2'}
+		bindings = derived.get_plan(frozenset(bound)).execute(bound)
+		self.assertEqual((1, ), bindings.keys)
+		self.assertCountEqual([members[1:] for members in self._naive(derived) if members[0] == 'child2'], bindings.rows)
+
+	def test_complement_in_universe_plan_execute(self):
+		storage = RelationStorage()
+		is_parent = storage.add_relation(BinaryRelation('is_parent', space=self.is_parent.members))
+		storage.add_relation(BinaryRelation('is_sibling', space=(('child0', 'child1'), ('child1', 'child0'))))
+		complement = ComplementRelation('not_parent', relation=is_parent)
+		self.assertCountEqual(complement.set, complement.get_plan().execute({}).rows)
+		self.assertCountEqual([('child1', )], complement.get_plan(frozenset({0})).execute({0: 'child0'}).rows)
+
+	def test_reordered_complement_in_universe(self):
+		storage = RelationStorage()
+		is_parent = storage.add_relation(BinaryRelation('is_parent', space=(('a', 'b'), ), registry=storage))
+		storage.add_relation(BinaryRelation('is_sibling', space=(('b', 'a'), ('a', 'c')), registry=storage))
+		complement = ComplementRelation('not_child', relation=is_parent, params=(1, 0))
+		self.assertEqual({('a', 'b'), ('a', 'c')}, complement.set)
+		self.assertEqual(2, complement.count())
+		self.assertTrue(all(complement.is_matched_by(members) for members in complement.set))
+		self.assertFalse(complement.is_matched_by('b', 'a'))
+		self.assertCountEqual(complement.set, complement.get_plan().execute({}).rows)
+
+	@parameterized.expand([
+		('domain', lambda knows, people: ComplementRelation('not_knows', relation=knows, domain=people)),
+		('universe', lambda knows, people: ComplementRelation('not_knows', relation=knows)),
+	])
+	def test_complement_of_inducing_relation(self, name, create_relation):
+		storage = RelationStorage()
+		knows = storage.add_relation(BinaryRelation('knows', is_symmetric=True, space=(('a', 'b'), ('b', 'c')), registry=storage))
+		people = storage.add_relation(Relation('people', 1, space=('a', 'b', 'c'), registry=storage))
+		complement = create_relation(knows, people)
+		self.assertNotIn(('b', 'a'), complement.set)
+		self.assertEqual(len(complement.set), complement.count())
+		self.assertTrue(all(not knows.is_matched_by(members) for members in complement.set))
+		self.assertCountEqual(complement.set, complement.get_plan().execute({}).rows)
+		self.assertCountEqual([members[1:] for members in complement.set if members[0] == 'b'], complement.get_plan(frozenset({0})).execute({0: 'b'}).rows)
+
+	def test_explain(self):
+		text = str((self.is_parent(0, 1) & self.is_female(1)).get_plan())
+		self.assertIn('is_parent', text)
+		self.assertIn('is_female', text)
+
+	@classmethod
+	def _walk(cls, node):
+		yield node
+		for child in node.get_children():
+			yield from cls._walk(child)
+
+	def _naive(self, derived):
+		domain = derived._active_domain()
+		layers = [()]
+		for _ in range(derived.arity):
+			layers = [layer + (member, ) for layer in layers for member in domain]
+		return filter(derived.is_matched_by, layers)
@@ -0,0 +1,46 @@
+import gc
+import weakref
+
+from src.relations import Relation, BinaryRelation, RelationStorage
+from tests.AbstractRelationsTest import AbstractRelationsTest
+
+
+class RegistryTest(AbstractRelationsTest):
+	@classmethod
+	def _get_test_name(cls) -> str:
+		return 'Registry'
+
+	def test_derived_relations_are_collected(self):
+		storage = RelationStorage()
+		is_parent = BinaryRelation('is_parent', space=(('Janina', 'Teresa'), ('Teresa', 'Ania')), registry=storage)
+		refs = []
+		for _ in range(10):
+			derived = (is_parent * is_parent) | ~is_parent
+			self.assertTrue(derived.set)
+			refs.append(weakref.ref(derived))
+		del derived
+		gc.collect()
+
+		self.assertFalse(any(ref() is not None for ref in refs))
+		self.assertEqual([is_parent], storage.get_registered(2))
+		self.assertEqual(1, sum(ref() is not None for ref in is_parent._observers))
+
+	def test_universe_is_scoped_and_follows_adds(self):
+		storage = RelationStorage()
+		is_female = Relation('is_female', 1, space=('Kasia', ), registry=storage)
+		is_male = Relation('is_male', 1, space=('Antek', ), registry=storage)
+		Relation('is_city', 1, space=('Kraków', ))
+
+		self.assertEqual({('Antek', )}, (-is_female).set)
+		is_male.add('Staś')
+		self.assertEqual({('Antek', ), ('Staś', )}, (-is_female).set)
+
+	def test_collected_relations_leave_the_universe(self):
+		storage = RelationStorage()
+		is_female = Relation('is_female', 1, space=('Kasia', ), registry=storage)
+		is_male = Relation('is_male', 1, space=('Antek', ), registry=storage)
+		self.assertEqual({('Kasia', ), ('Antek', )}, storage.get_universe(1))
+		del is_male
+		gc.collect()
+		self.assertEqual({('Kasia', )}, storage.get_universe(1))
+		self.assertEqual(set(), (-is_female).set)
@@ -0,0 +1,127 @@
+import os
+import tempfile
+
+from parameterized import parameterized
+
+from src.relations import Relation, BinaryRelation, RelationStorage
+from src.snapshot import MappedStorage
+from tests.AbstractRelationsTest import AbstractRelationsTest
+
+
+class SnapshotTest(AbstractRelationsTest):
+	@classmethod
+	def _get_test_name(cls) -> str:
+		return 'Snapshot'
+
+	def _save_and_open(self, storage: RelationStorage) -> RelationStorage:
+		file, path = tempfile.mkstemp(suffix='.rel')
+		os.close(file)
+		self.addCleanup(os.remove, path)
+		storage.save(path)
+		return RelationStorage.open(path)
+
+	def _create_storage(self) -> RelationStorage:
+		storage = RelationStorage()
+		storage.add_relation(BinaryRelation('is_parent', is_transitive=True, space=(('Janina', 'Teresa'), ('Teresa', 'Ania'), ('Ania', 'Zosia'))))
+		storage.add_relation(Relation('is_female', 1, space=('Janina', 'Teresa', 7)))
+		storage.add_relation(Relation('born', 3, space=(('Janina', 1950, 'Wrocław'), ('Ania', 1990, ('Kraków', 'PL')))))
+		storage.add_relation(storage.get_relation('is_parent') | storage.get_relation('is_parent'))
+		return storage
+
+	def test_round_trip(self):
+		storage = self._create_storage()
+		opened = self._save_and_open(storage)
+
+		self.assertEqual({'is_parent', 'is_female', 'born'}, set(opened.relations))
+		for name, relation in opened.relations.items():
+			self.assertIsInstance(relation._set, MappedStorage)
+			self.assertEqual(storage.get_relation(name).set, relation.set)
+			self.assertEqual(storage.get_relation(name).arity, relation.arity)
+		self.assertEqual(storage.domain.set, opened.domain.set)
+
+	def test_properties(self):
+		is_parent = self._save_and_open(self._create_storage()).get_relation('is_parent')
+		self.assertIsInstance(is_parent, BinaryRelation)
+		self.assertTrue(is_parent.transitivity.is_on())
+		self.assertTrue(is_parent.symmetry.is_off())
+		self.assertTrue(is_parent.is_matched_by('Janina', 'Zosia'))
+
+	@parameterized.expand([
+		('first', 'Teresa', 0, {('Teresa', 'Ania')}),
+		('second', 'Teresa', 1, {('Janina', 'Teresa')}),
+		('missing', 'Basia', 0, set()),
+	])
+	def test_lookup_without_copy(self, name, value, n, expected):
+		is_parent = self._save_and_open(self._create_storage()).get_relation('is_parent')
+		self.assertEqual(expected, set(is_parent.get_all_with_value_at(value, n)))
+		self.assertTrue(is_parent._set.is_mapped())
+
+	def test_add_after_open(self):
+		opened = self._save_and_open(self._create_storage())
+		is_parent = opened.get_relation('is_parent')
+		is_parent.add(('Zosia', 'Ola'))
+
+		self.assertFalse(is_parent._set.is_mapped())
+		self.assertEqual(4, len(is_parent.set))
+		self.assertIn(('Ola', ), opened.domain.set)
+		self.assertEqual({('Zosia', 'Ola')}, set(is_parent.get_all_with_value_at('Zosia', 0)))
+
+	def test_not_a_snapshot(self):
+		file, path = tempfile.mkstemp()
+		with os.fdopen(file, 'wb') as f:
+			f.write(bytes(64))
+		self.addCleanup(os.remove, path)
+		with self.assertRaises(ValueError):
+			RelationStorage.open(path)
+
+	def test_lookup_does_not_decode_the_table(self):
+		is_parent = self._save_and_open(self._create_storage()).get_relation('is_parent')
+		atoms = is_parent._set._atoms
+		self.assertEqual({('Ania', 'Zosia')}, set(is_parent.get_all_with_value_at('Ania', 0)))
+		self.assertIn(('Kraków', 'PL'), atoms)
+		self.assertIn(7.0, atoms)
+		self.assertNotIn('Basia', atoms)
+		self.assertFalse(atoms._is_loaded)
+		self.assertLess(len(atoms._decoded), len(atoms))
+
+	@parameterized.expand([
+		('float', 2.5),
+		('negative', -12),
+		('bool', True),
+		('none', None),
+		('bytes', b'\x00PL'),
+		('nested', ('Kraków', (1, None), 0.0, b'')),
+	])
+	def test_atom_round_trip(self, name, atom):
+		storage = RelationStorage()
+		storage.add_relation(Relation('is_atom', 1, space=((atom, ), )))
+		is_atom = self._save_and_open(storage).get_relation('is_atom')
+		self.assertIn(atom, is_atom._set._atoms)
+		self.assertEqual({(atom, )}, set(is_atom.set))
+		self.assertEqual(type(atom), type(next(iter(is_atom.set))[0]))
+
+	def test_unsupported_atom(self):
+		storage = RelationStorage()
+		storage.add_relation(Relation('is_atom', 1, space=(frozenset({'Ania'}), )))
+		with self.assertRaises(TypeError):
+			self._save_and_open(storage)
+
+	@parameterized.expand([
+		('binary', 'is_parent', ('Teresa', 'Ania'), ('Ania', 'Teresa')),
+		('wide', 'born', ('Ania', 1990, ('Kraków', 'PL')), ('Ania', 1950, 'Wrocław')),
+	])
+	def test_membership_without_copy(self, name, relation_name, member, missing):
+		relation = self._save_and_open(self._create_storage()).get_relation(relation_name)
+		members = relation.members
+		self.assertTrue(relation.is_matched_by(member))
+		self.assertFalse(relation.is_matched_by(missing))
+		self.assertIn(member, relation._set)
+		self.assertNotIn(missing, relation._set)
+		self.assertEqual({}, relation._set._row_indexes)
+		self.assertFalse(relation._set._keys._buffer)
+		self.assertTrue(relation._set.is_mapped())
+
+		relation.add(missing)
+		self.assertIn(missing, relation.members)
+		self.assertNotIn(missing, members)
+		self.assertIn(member, members)
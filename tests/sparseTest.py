@@ -0,0 +1,41 @@
+from parameterized import parameterized
+
+from src.relations import BinaryRelation, CompositionRelation, DerivedRelation
+from src.sparse import SparseBooleanMatrix
+from src.storage import AtomTable, ColumnarStorage
+from tests.AbstractRelationsTest import AbstractRelationsTest
+
+left = {(1, 2), (2, 3), (3, 1), (3, 4)}
+right = {(2, 2), (3, 5), (4, 1), (1, 3)}
+
+
+class SparseTest(AbstractRelationsTest):
+	@classmethod
+	def _get_test_name(cls) -> str:
+		return 'Sparse'
+
+	@parameterized.expand([
+		('product', lambda a, b: a @ b, {(a, d) for a, b in left for c, d in right if b == c}),
+		('transpose', lambda a, b: a.T, {(b, a) for a, b in left}),
+		('or', lambda a, b: a | b, left | right),
+		('and', lambda a, b: a & b, left & right),
+		('closure', lambda a, b: a.closure(), {(a, b) for a in (1, 2, 3) for b in (1, 2, 3, 4)}),
+	])
+	def test_matrix_algebra(self, name, operation, e_pairs):
+		atoms = AtomTable()
+		left_matrix = SparseBooleanMatrix.from_edges(left, atoms)
+		right_matrix = SparseBooleanMatrix.from_edges(right, atoms)
+		self.assertEqual(e_pairs, set(operation(left_matrix, right_matrix).decode(atoms)))
+
+	@parameterized.expand([
+		('composition', lambda p, q: p * q),
+		('converse_of_composition', lambda p, q: ~(p * q)),
+		('composition_of_union', lambda p, q: CompositionRelation('c', relations=(p | q, ~q))),
+		('composition_of_intersection', lambda p, q: CompositionRelation('c', relations=(p & q, p))),
+	])
+	def test_fast_path_agrees_with_joins(self, name, get_relation):
+		atoms = AtomTable()
+		p = BinaryRelation('p', backend=ColumnarStorage(2, atoms), space=left)
+		q = BinaryRelation('q', space=right)
+		relation = get_relation(p, q)
+		self.assertEqual(set(DerivedRelation._compute(relation, {})), relation.set)
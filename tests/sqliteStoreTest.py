@@ -0,0 +1,82 @@
+import os
+import tempfile
+
+from parameterized import parameterized
+
+from src.relations import Relation, BinaryRelation, RelationStorage, IntersectionRelation
+from src.sqlite_store import SqliteRelationStorage, SqliteStorage
+from tests.AbstractRelationsTest import AbstractRelationsTest
+
+
+class SqliteStoreTest(AbstractRelationsTest):
+	@classmethod
+	def _get_test_name(cls) -> str:
+		return 'SQLite store'
+
+	@classmethod
+	def _fill(cls, storage: RelationStorage, is_transitive: bool = False) -> tuple[BinaryRelation, Relation]:
+		is_parent = storage.add_relation(BinaryRelation('is_parent', is_transitive=is_transitive, space=(('Janina', 'Teresa'), ('Teresa', 'Ania'), ('Ania', 'Zosia'), ('Teresa', 'Basia'))))
+		is_female = storage.add_relation(Relation('is_female', 1, space=('Janina', 'Teresa', 'Zosia')))
+		return is_parent, is_female
+
+	@parameterized.expand([
+		('composition', lambda p, f: p * p),
+		('converse', lambda p, f: ~p),
+		('converse_of_composition', lambda p, f: ~(p * p)),
+		('union', lambda p, f: p | ~p),
+		('intersection', lambda p, f: p & f(0)),
+		('constant', lambda p, f: IntersectionRelation('mother_of_ania', relations=(p, f), params=((0, 'Ania'), (0, )))),
+		('existential', lambda p, f: IntersectionRelation('mother', relations=(p, f), params=((0, -1), (0, )))),
+	])
+	def test_same_as_in_memory(self, name, create_relation):
+		expected = create_relation(*self._fill(RelationStorage()))
+		storage = SqliteRelationStorage()
+		relation = create_relation(*self._fill(storage))
+
+		self.assertIsNotNone(storage.compile(relation))
+		self.assertEqual(expected.set, relation.set)
+		self.assertEqual(set(expected.get_all_with_value_at('Teresa', 0)), set(relation.get_all_with_value_at('Teresa', 0)))
+		for members in expected.set:
+			self.assertTrue(relation.is_matched_by(*members))
+
+	def test_transitive_relation_is_a_recursive_cte(self):
+		storage = SqliteRelationStorage()
+		is_parent, is_female = self._fill(storage, is_transitive=True)
+		relation = IntersectionRelation('female_descendants', relations=(is_parent, is_female), params=((0, 1), (1, )))
+
+		query, args = storage.compile(relation)
+		self.assertTrue(query.startswith('WITH RECURSIVE'))
+		self.assertEqual({('Janina', 'Teresa'), ('Janina', 'Zosia'), ('Teresa', 'Zosia'), ('Ania', 'Zosia')}, relation.set)
+
+	def test_not_compilable_falls_back(self):
+		storage = SqliteRelationStorage()
+		is_parent, is_female = self._fill(storage)
+		not_female = storage.get_complement('is_female')
+		self.assertIsNone(storage.compile(not_female))
+		self.assertEqual({('Ania', ), ('Basia', )}, not_female.set)
+
+	def test_reopen(self):
+		file, path = tempfile.mkstemp(suffix='.db')
+		os.close(file)
+		self.addCleanup(os.remove, path)
+		storage = SqliteRelationStorage(path)
+		self._fill(storage, is_transitive=True)
+		storage.connection.close()
+
+		reopened = SqliteRelationStorage(path)
+		is_parent = reopened.get_relation('is_parent')
+		self.assertIsInstance(is_parent._set, SqliteStorage)
+		self.assertTrue(is_parent.transitivity.is_on())
+		self.assertEqual(4, len(is_parent.set))
+		self.assertIn(('Basia', ), reopened.domain.members)
+		is_parent.add(('Zosia', 'Ola'))
+		self.assertIn(('Ola', ), reopened.domain.members)
+
+	def test_snapshot_is_not_affected_by_adds(self):
+		storage = SqliteRelationStorage()
+		is_parent, _ = self._fill(storage)
+		members = is_parent.members
+		is_parent.add(('Zosia', 'Ola'))
+		self.assertEqual(4, len(members))
+		self.assertNotIn(('Zosia', 'Ola'), members)
+		self.assertIn(('Zosia', 'Ola'), is_parent.members)
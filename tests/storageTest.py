@@ -0,0 +1,90 @@
+from parameterized import parameterized
+
+from src.relations import Relation, BinaryRelation
+from src.storage import AtomTable, ColumnarStorage, PackedKeys
+from tests.AbstractRelationsTest import AbstractRelationsTest
+
+
+class StorageTest(AbstractRelationsTest):
+	@classmethod
+	def _get_test_name(cls) -> str:
+		return 'Storage'
+
+	def _get_columnar(self, name: str, arity: int, space=(), atoms: AtomTable = None) -> Relation:
+		return Relation(name, arity, space=space, backend=ColumnarStorage(arity, atoms))
+
+	def test_atoms_are_shared(self):
+		atoms = AtomTable()
+		is_parent = BinaryRelation('is_parent', backend=ColumnarStorage(2, atoms), space=(('Janina', 'Teresa'), ('Teresa', 'Ania')))
+		is_female = self._get_columnar('is_female', 1, space=('Janina', 'Teresa', 'Ania'), atoms=atoms)
+
+		self.assertEqual(3, len(atoms))
+		self.assertEqual(2, len(is_parent.members))
+		self.assertEqual(atoms.get_id('Teresa'), is_female._set.get_column(0)[1])
+
+	@parameterized.expand([
+		('existing', ('Janina', 'Teresa'), True),
+		('swapped', ('Teresa', 'Janina'), False),
+		('unknown_atom', ('Janina', 'Zbigniew'), False),
+		('wrong_arity', ('Janina', ), False),
+	])
+	def test_is_matched_by(self, name, members, e_result):
+		is_parent = self._get_columnar('is_parent', 2, space=(('Janina', 'Teresa'), ('Teresa', 'Ania')))
+		self.assertEqual(e_result, is_parent.is_matched_by(*members))
+
+	def test_add_and_set(self):
+		is_parent = self._get_columnar('is_parent', 2, space=(('Janina', 'Teresa'), ))
+		snapshot = is_parent.members
+		is_parent.add(('Teresa', 'Ania'), ('Janina', 'Teresa'))
+
+		self.assertEqual({('Janina', 'Teresa'), ('Teresa', 'Ania')}, is_parent.set)
+		self.assertEqual({('Janina', 'Teresa')}, set(snapshot))
+		self.assertEqual(2, is_parent.version)
+		self.assertEqual({('Teresa', 'Ania')}, set(is_parent.get_all_with_value_at('Ania', 1)))
+
+	def test_snapshot_does_not_see_later_changes(self):
+		storage = ColumnarStorage(2, members_layers=(('Janina', 'Teresa'), ('Teresa', 'Ania')))
+		snapshot = storage.get_snapshot()
+		storage.add(('Ania', 'Zosia'))
+		self.assertNotIn(('Ania', 'Zosia'), snapshot)
+		self.assertIn(('Teresa', 'Ania'), snapshot)
+		storage.discard(('Janina', 'Teresa'))
+		storage.add(('Marek', 'Kuba'))
+		self.assertIn(('Janina', 'Teresa'), snapshot)
+		self.assertNotIn(('Marek', 'Kuba'), snapshot)
+		self.assertEqual({('Janina', 'Teresa'), ('Teresa', 'Ania')}, set(snapshot))
+		storage.clear()
+		self.assertEqual(2, len(snapshot))
+		self.assertIn(('Teresa', 'Ania'), snapshot)
+		self.assertNotIn(('Ania', 'Zosia'), snapshot)
+
+	def test_match_many(self):
+		is_parent = self._get_columnar('is_parent', 2, space=(('Janina', 'Teresa'), ('Teresa', 'Ania')))
+		candidates = [('Janina', 'Teresa'), ('Teresa', 'Janina'), ('Janina', 'Zbigniew'), ('Teresa', ), ('Teresa', 'Ania')]
+		self.assertEqual([True, False, False, False, True], list(is_parent.match_many(candidates)))
+
+	def test_derived_operators(self):
+		space = (('Janina', 'Teresa'), ('Teresa', 'Ania'), ('Teresa', 'Kasia'))
+		is_parent = self._get_columnar('is_parent', 2, space=space)
+		is_female = self._get_columnar('is_female', 1, space=('Janina', 'Teresa', 'Ania'))
+		plain_parent = Relation('plain_is_parent', 2, space=space)
+		plain_female = Relation('plain_is_female', 1, space=('Janina', 'Teresa', 'Ania'))
+
+		is_mother = is_parent & is_female
+		plain_mother = plain_parent & plain_female
+		is_grandparent = is_parent(0, -1) & is_parent(-1, 1)
+		plain_grandparent = plain_parent(0, -1) & plain_parent(-1, 1)
+
+		self.assertEqual(plain_mother.set, is_mother.set)
+		self.assertEqual(plain_grandparent.set, is_grandparent.set)
+		self.assertTrue(is_grandparent.is_matched_by('Janina', 'Kasia'))
+		self.assertEqual(plain_parent.get_statistics(), is_parent.get_statistics())
+
+	def test_packed_keys_merge(self):
+		keys = PackedKeys(use_array=True, min_buffer_size=4)
+		for key in range(0, 40, 2):
+			keys.add(key)
+
+		self.assertEqual(20, len(keys))
+		self.assertTrue(all(key in keys for key in range(0, 40, 2)))
+		self.assertFalse(any(key in keys for key in range(1, 40, 2)))
@@ -0,0 +1,47 @@
+from parameterized import parameterized
+
+from src.relations import Relation, BinaryRelation, RelationStorage
+from tests.AbstractRelationsTest import AbstractRelationsTest
+
+
+class CountingRelation(BinaryRelation):
+	__slots__ = ('pulled', )
+
+	def get_members(self):
+		for members in self.members:
+			self.pulled += 1
+			yield members
+
+
+class StreamingTest(AbstractRelationsTest):
+	@classmethod
+	def _get_test_name(cls) -> str:
+		return 'Streaming'
+
+	def test_exists_stops_at_first_answer(self):
+		is_parent = CountingRelation('is_parent', space=[(i, i + 1) for i in range(1000)])
+		is_parent.pulled = 0
+		self.assertTrue((is_parent * is_parent).exists())
+		self.assertLess(is_parent.pulled, 10)
+
+	@parameterized.expand([
+		('base', lambda p, f, s: p),
+		('composition', lambda p, f, s: p * p),
+		('converse', lambda p, f, s: ~(p * p)),
+		('union', lambda p, f, s: p | ~p),
+		('intersection', lambda p, f, s: p & f(0)),
+		('complement', lambda p, f, s: s.get_complement('is_female')),
+		('empty', lambda p, f, s: p(0, 'nobody')),
+	])
+	def test_stream_methods(self, name, create_relation):
+		storage = RelationStorage()
+		is_parent = storage.add_relation(BinaryRelation('is_parent', space=(('Janina', 'Teresa'), ('Teresa', 'Ania'), ('Ania', 'Zosia'))))
+		is_female = storage.add_relation(Relation('is_female', 1, space=('Janina', 'Teresa')))
+		relation = create_relation(is_parent, is_female, storage)
+		members = relation.set
+
+		self.assertEqual(members, set(relation))
+		self.assertEqual(bool(members), relation.exists())
+		self.assertEqual(len(members), relation.count())
+		self.assertEqual(min(len(members), 2), len(relation.take(2)))
+		self.assertTrue(relation.first() in members if members else relation.first() is None)
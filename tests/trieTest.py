@@ -0,0 +1,58 @@
+from parameterized import parameterized
+
+from src.relations import Relation, BinaryRelation
+from src.trie import Trie, trie_join
+from tests.AbstractRelationsTest import AbstractRelationsTest
+
+
+class TrieTest(AbstractRelationsTest):
+	@classmethod
+	def _get_test_name(cls) -> str:
+		return 'Trie'
+
+	@parameterized.expand([
+		('identity', (0, 1, 2), [(1, 'a', 'x'), (1, 'b', 'x'), (2, 'a', 'y')]),
+		('reversed', (2, 1, 0), [('x', 'a', 1), ('x', 'b', 1), ('y', 'a', 2)]),
+		('projection', (1, ), [('a', ), ('b', )]),
+		('projection_reordered', (2, 0), [('x', 1), ('y', 2)]),
+	])
+	def test_column_order(self, name, order: tuple, e_rows: list):
+		trie = Trie(order, [(1, 'a', 'x'), (1, 'b', 'x'), (2, 'a', 'y'), (1, 'a', 'x')])
+		self.assertCountEqual(e_rows, list(trie))
+		self.assertEqual(len(e_rows), len(trie))
+
+	def test_relation_trie_follows_adds(self):
+		rel = Relation('trie', 3, space=[(1, 'a', 'x'), (2, 'a', 'y')])
+		trie = rel.get_trie((1, 0))
+		self.assertIs(trie, rel.get_trie((1, 0)))
+		rel.add((3, 'b', 'z'))
+		self.assertIsNot(trie, rel.get_trie((1, 0)))
+		self.assertCountEqual([('a', 1), ('a', 2), ('b', 3)], list(rel.get_trie((1, 0))))
+
+	def test_trie_join(self):
+		edges = [(1, 2), (2, 3), (3, 1), (1, 3), (3, 4)]
+		ab, bc, ac = Trie((0, 1), edges), Trie((0, 1), edges), Trie((0, 1), edges)
+		e_rows = {(a, b, c) for a, b in edges for c in range(1, 5) if (b, c) in edges and (a, c) in edges}
+		self.assertEqual(e_rows, set(trie_join([((0, 1), ab), ((1, 2), bc), ((0, 2), ac)], 3)))
+		self.assertEqual([], list(trie_join([((0, 1), ab), ((1, 2), Trie((0, 1)))], 3)))
+		with self.assertRaises(ValueError):
+			list(trie_join([((1, 0), ab)], 2))
+
+	@parameterized.expand([
+		('letters', lambda is_parent, is_female: is_parent('A', 'B') & is_female('B'), [('Wiktor', 'Patrycja'), ('Aniela', 'Patrycja')]),
+		('numbered_letters', lambda is_parent, is_female: is_parent('A1', 'B0') & is_female('A'), [('Stefan', 'Aniela'), ('Patrycja', 'Aniela')]),
+		('implicit_letter', lambda is_parent, is_female: is_parent('A', 'B0') & is_female('B0'), [('Patrycja', 'Wiktor'), ('Patrycja', 'Aniela')]),
+		('letters_and_numbers', lambda is_parent, is_female: is_parent(0, 'A') & is_female('A'), [('Wiktor', 'Patrycja'), ('Aniela', 'Patrycja')]),
+	])
+	def test_letter_correspondences(self, name, create_relation, e_set: list):
+		is_parent = BinaryRelation('is_parent', space=(('Wiktor', 'Stefan'), ('Aniela', 'Stefan'), ('Wiktor', 'Patrycja'), ('Aniela', 'Patrycja')))
+		is_female = Relation('is_female', 1, space=('Aniela', 'Patrycja'))
+		self.assertCountEqual(e_set, create_relation(is_parent, is_female).set)
+
+	@parameterized.expand([
+		('two_positions', lambda is_parent: is_parent('A0', 'B') & is_parent('A1', 'B')),
+		('same_position', lambda is_parent: is_parent('A0', 0)),
+	])
+	def test_conflicting_letter_positions(self, name, create_relation):
+		with self.assertRaises(ValueError):
+			create_relation(BinaryRelation('is_parent', space=(('Wiktor', 'Stefan'), )))